@@ -57,6 +57,7 @@ def genfiles(package, package_name, modules, dir='api'):
 modules = [
     ('__init__', 'Sasmodels package'),
     #('alignment', 'GPU data alignment [unused]'),
+    ('bench', 'Benchmark suite for the compute engines'),
     ('bumps_model', 'Bumps interface'),
     ('compare', 'Compare models on different compute engines'),
     ('compare_many', 'Batch compare models on different compute engines'),
@@ -73,12 +74,14 @@ modules = [
     ('kerneldll', 'Ctypes model evaluator'),
     ('kernelpy', 'Python model evaluator'),
     ('list_pars', 'Identify all parameters in all models'),
+    ('metrics', 'Instrumentation of the evaluation pipeline'),
     ('mixture', 'Mixture model evaluator'),
     ('model_test', 'Unit test support'),
     ('modelinfo', 'Parameter and model definitions'),
     ('product', 'Product model evaluator'),
     ('resolution', '1-D resolution functions'),
     ('resolution2d', '2-D resolution functions'),
+    ('resolution_cache', 'Shared resolution operators'),
     ('rst2html', 'Convert doc strings the web pages'),
     ('sasview_model', 'Sasview interface'),
     ('sesans', 'SESANS calculation routines'),
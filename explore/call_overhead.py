@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Measure the python overhead of setting up a kernel call.
+
+For small 1D data sets the time spent preparing the kernel arguments can
+exceed the time spent in the kernel.  This script times each stage of
+:func:`sasmodels.direct_model.call_kernel` separately: building the
+dispersity mesh, converting it to kernel arguments with
+:func:`sasmodels.details.make_kernel_args` and with a reusable
+:class:`sasmodels.details.CallPlan`, and the kernel call itself.
+
+Usage::
+
+    python explore/call_overhead.py [model] [nq] [pd_n]
+
+The defaults are the cylinder model with 10 q points and 11 point radius
+and length dispersity.
+"""
+from __future__ import print_function, division
+
+import sys
+import timeit
+
+import numpy as np
+
+from sasmodels.core import load_model_info, build_model
+from sasmodels.details import make_kernel_args, CallPlan
+from sasmodels.direct_model import get_mesh, call_kernel
+
+def time_us(fn, number):
+    """Best time per call of *fn* in microseconds, over five repeats."""
+    return 1e6*min(timeit.repeat(fn, number=number, repeat=5))/number
+
+def main():
+    """Time the stages of a kernel call for the model on the command line."""
+    name = sys.argv[1] if len(sys.argv) > 1 else "cylinder"
+    nq = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    pd_n = int(sys.argv[3]) if len(sys.argv) > 3 else 11
+    number = 2000
+    slow = max(number//100, 1)  # fewer repeats for the kernel timings
+
+    model_info = load_model_info(name)
+    model = build_model(model_info, platform="dll")
+    kernel = model.make_kernel([np.logspace(-3, -1, nq)])
+    pars = dict((p.name+"_pd_n", pd_n)
+                for p in model_info.parameters.kernel_parameters
+                if p.type == 'volume')
+    pars.update((p.name+"_pd", 0.1)
+                for p in model_info.parameters.kernel_parameters
+                if p.type == 'volume')
+    plan = CallPlan(kernel.info, kernel.dtype)
+    mesh = get_mesh(model_info, pars, dim=kernel.dim)
+
+    # Check that the plan produces the same arguments as make_kernel_args.
+    details, values, _ = make_kernel_args(kernel, mesh)
+    plan_details, plan_values, _ = plan(mesh)
+    assert np.all(values == plan_values)
+    assert np.all(details.buffer == plan_details.buffer)
+
+    print("model %s with nq=%d and pd_n=%d, times in us per call"
+          % (name, nq, pd_n))
+    print("  get_mesh          %8.1f"
+          % time_us(lambda: get_mesh(model_info, pars, dim=kernel.dim), number))
+    print("  make_kernel_args  %8.1f"
+          % time_us(lambda: make_kernel_args(kernel, mesh), number))
+    print("  CallPlan          %8.1f" % time_us(lambda: plan(mesh), number))
+    print("  kernel            %8.1f"
+          % time_us(lambda: kernel(details, values, 0., False), slow))
+    print("  call_kernel       %8.1f"
+          % time_us(lambda: call_kernel(kernel, pars), slow))
+    kernel.release()
+    model.release()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+r"""
+Compare oversampling and grid convolution for 2D pinhole resolution.
+
+:class:`sasmodels.resolution2d.Pinhole2D` evaluates the model at *nr*
+by *nphi* points around each pixel, with the number of points set by the
+accuracy, from 12 points for 'Low' to 200 for 'Xhigh'.
+:class:`sasmodels.resolution2d.GridPinhole2D` evaluates the model once
+per pixel on a padded detector grid and smears it by convolution, with
+the resolution held constant over tiles.
+
+This script prints the number of model evaluations per pixel and the
+maximum and median relative error of each method for an anisotropic
+sphere pattern, computed in numpy so that the model itself is exact.  The
+reference is :class:`Pinhole2D` with 40 by 80 points per pixel on a random
+subset of the pixels.  With *--time* it also times a polydisperse oriented
+cylinder using :class:`sasmodels.direct_model.DirectModel`.
+
+Usage::
+
+    python explore/grid_resolution.py [--time] [nq] [dq/q] [radius]
+
+The defaults are a 128 x 128 detector with $q_x$, $q_y$ from -0.3 to 0.3,
+a 5% resolution, and a sphere of radius 60.
+"""
+from __future__ import print_function, division
+
+import sys
+import time
+
+import numpy as np
+
+from sasmodels.data import empty_data2D
+from sasmodels.resolution2d import Pinhole2D, GridPinhole2D
+
+def sphere(qx, qy, radius):
+    """Sphere form factor stretched by 1.5 along qy, on a flat background."""
+    x = radius*np.sqrt(qx**2 + (1.5*qy)**2)
+    x = np.where(x == 0., 1e-10, x)
+    return 1e4*(3*(np.sin(x) - x*np.cos(x))/x**3)**2 + 0.01
+
+def reference(data, index, radius, nr=40, nphi=80):
+    """Smeared pattern from a finely oversampled Pinhole2D."""
+    res = Pinhole2D(data, index)
+    res.nr, res.nphi = nr, nphi
+    res._init_data(data, index)
+    return np.hstack([res.apply_tile(sphere(q_calc[0], q_calc[1], radius))
+                      for _, q_calc in res.tiles()])
+
+def compare(nq, dq, radius):
+    """Print evaluations and errors for each method."""
+    data = empty_data2D(np.linspace(-0.3, 0.3, nq), resolution=dq)
+    index = data.q_data > 0.02
+    sample = index & (np.random.RandomState(1).rand(nq*nq) < 2000/nq**2)
+    target = reference(data, sample, radius)
+    print("%d x %d pixels, dq/q=%g, radius=%g" % (nq, nq, dq, radius))
+    print("%-16s %10s %10s %10s"
+          % ("method", "evals/pix", "max err", "median"))
+    methods = [("Pinhole2D %s" % v, Pinhole2D(data, sample, accuracy=v))
+               for v in ('low', 'med', 'high', 'xhigh')]
+    for tolerance in (0.02, 0.05, 0.2):
+        res = GridPinhole2D(data, index, tolerance=tolerance)
+        methods.append(("Grid tol=%g" % tolerance, res))
+    for name, res in methods:
+        value = res.apply(sphere(res.q_calc[0], res.q_calc[1], radius))
+        if isinstance(res, GridPinhole2D):
+            evals = len(res.q_calc[0])/np.sum(index)
+            value = value[sample[index]]
+        else:
+            evals = len(res.q_calc[0])/np.sum(sample)
+        err = abs(value/target - 1)
+        print("%-16s %10.1f %10.2e %10.2e"
+              % (name, evals, np.max(err), np.median(err)))
+    print()
+
+def time_models(nq, dq):
+    """Time an oriented polydisperse cylinder for each accuracy."""
+    from sasmodels.core import load_model
+    from sasmodels.direct_model import DirectModel
+    model = load_model("cylinder", dtype="double", platform="dll")
+    pars = dict(radius=20, length=300, theta=30, phi=20,
+                radius_pd=0.1, radius_pd_n=15, theta_pd=10, theta_pd_n=15)
+    data = empty_data2D(np.linspace(-0.3, 0.3, nq), resolution=dq)
+    for accuracy in ('Low', 'High', 'Grid'):
+        data.accuracy = accuracy
+        calculator = DirectModel(data, model)
+        calculator(**pars)
+        start = time.time()
+        calculator(**pars)
+        print("%-5s %8d points %8.1f ms"
+              % (accuracy, len(calculator._kernel_inputs[0]),
+                 1e3*(time.time()-start)))
+
+def main():
+    """Print the comparison table, and the timing if requested."""
+    args = sys.argv[1:]
+    do_time = "--time" in args
+    args = [v for v in args if v != "--time"]
+    nq = int(args[0]) if args else 128
+    dq = float(args[1]) if len(args) > 1 else 0.05
+    radius = float(args[2]) if len(args) > 2 else 60.
+    compare(nq, dq, radius)
+    if do_time:
+        time_models(nq, dq)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+r"""
+Compare the fixed and adaptive rules for the 1D orientation average.
+
+The orientation averaged models used to integrate over $\theta$ with a
+fixed 76 point Gauss-Legendre rule.  They now use the rule sequence in
+*models/lib/adaptive_gauss.c*.  Below $qr = 4$, where $r$ is the largest
+distance from the center of the shape, a 15 point Kronrod rule is used, and
+below $qr = 70$ the 76 point rule is used.  Above that the sequence goes on
+from the 76 point rule to the 150 point rule and then to 150 point rules on
+2, 4, 8 and 16 panels, stopping when two successive rules agree.
+
+This script mirrors the rule sequence in python and prints the number of
+integrand evaluations and the relative error of both methods across $q$
+for the cylinder and ellipsoid integrands, with reference values from
+:func:`scipy.integrate.quad`.  With *--time* it also times the compiled
+cylinder, ellipsoid and parallelepiped kernels, which should be compared
+with the times for the fixed rule from an older checkout.
+
+Usage::
+
+    python explore/orient_avg.py [--time] [radius length]
+
+The defaults are a cylinder of radius 20 and length 400.
+"""
+from __future__ import print_function, division
+
+import sys
+import time
+
+import numpy as np
+from numpy.polynomial.legendre import leggauss
+from scipy.integrate import quad
+from scipy.special import j1
+
+TOLERANCE = 1e-8
+MAX_PANELS = 16
+KRONROD_QR = 4.
+FIXED_QR = 70.
+
+KRONROD_Z = np.array([
+    0.991455371120812639206854697526329,
+    0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926,
+    0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013,
+    0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245,
+    0.000000000000000000000000000000000,
+])
+KRONROD_W = np.array([
+    0.022935322010529224963732008058970,
+    0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518,
+    0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550,
+    0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649,
+    0.209482141084727828012999174891714,
+])
+K15_Z = np.hstack((-KRONROD_Z[:-1], KRONROD_Z[::-1]))
+K15_W = np.hstack((KRONROD_W[:-1], KRONROD_W[::-1]))
+G76 = leggauss(76)
+G150 = leggauss(150)
+
+def fixed(f, a, b):
+    """Integrate *f* over [a, b] with the 76 point rule."""
+    z, w = G76
+    return 0.5*(b-a)*np.dot(w, f(a + 0.5*(b-a)*(z+1))), 76
+
+def adaptive(f, a, b, qr):
+    """Integrate *f* over [a, b] with the rule sequence for *qr*, returning
+    the integral and the number of evaluations."""
+    h = 0.5*(b-a)
+    if qr < KRONROD_QR:
+        return h*np.dot(K15_W, f(a + h*(K15_Z+1))), 15
+    z, w = G76
+    previous, result = 0., h*np.dot(w, f(a + h*(z+1)))
+    evals, level, panels = 76, 1, 1
+    if qr < FIXED_QR:
+        return result, evals
+    while (result-previous)**2 > TOLERANCE*result**2 and panels < MAX_PANELS:
+        level += 1
+        z, w = G150
+        panels = 2**(level-2)
+        hp = 0.5*(b-a)/panels
+        total = sum(hp*np.dot(w, f(lo + hp*(z+1)))
+                    for lo in np.linspace(a, b, panels+1)[:-1])
+        previous, result = result, total
+        evals += len(z)*panels
+    return result, evals
+
+def cylinder(q, radius, length):
+    """Integrand for the cylinder orientation average over theta."""
+    def f(theta):
+        qab, qc = q*np.sin(theta), q*np.cos(theta)
+        x = qab*radius
+        bj = np.where(x == 0., 1., 2*j1(x)/np.where(x == 0., 1., x))
+        return (bj*np.sinc(qc*0.5*length/np.pi))**2*np.sin(theta)
+    return f, 0., np.pi/2, q*np.sqrt(radius**2 + 0.25*length**2)
+
+def ellipsoid(q, radius_polar, radius_equatorial):
+    """Integrand for the ellipsoid orientation average over u = cos(theta)."""
+    def f(u):
+        x = q*radius_equatorial*np.sqrt(1 + u*u*((radius_polar/radius_equatorial)**2-1))
+        return (3*(np.sin(x)-x*np.cos(x))/x**3)**2
+    return f, 0., 1., q*max(radius_polar, radius_equatorial)
+
+def compare(name, integrand, q, *pars):
+    """Print evaluation counts and errors for the integrand across q."""
+    print("%s %s" % (name, " ".join("%g" % p for p in pars)))
+    print("%10s %12s %8s %12s" % ("q", "fixed err", "evals", "adapt err"))
+    total = 0
+    for qk in q:
+        f, a, b, qr = integrand(qk, *pars)
+        target = quad(f, a, b, limit=2000, epsabs=0., epsrel=1e-12)[0]
+        fixed_value, _ = fixed(f, a, b)
+        value, evals = adaptive(f, a, b, qr)
+        total += evals
+        print("%10.4g %12.2e %8d %12.2e"
+              % (qk, abs(fixed_value/target-1), evals, abs(value/target-1)))
+    print("mean evaluations %.0f (fixed rule 76)" % (total/len(q)))
+    print()
+
+def time_kernels():
+    """Time the compiled kernels for 100 q values from 0.001 to 1."""
+    from sasmodels.core import load_model_info, build_model
+    from sasmodels.direct_model import call_kernel
+    q = np.logspace(-3, 0, 100)
+    for name, pars in (("cylinder", {}),
+                       ("cylinder", dict(radius=20, length=2000)),
+                       ("ellipsoid", {}),
+                       ("parallelepiped", {})):
+        model = build_model(load_model_info(name), platform="dll")
+        kernel = model.make_kernel([q])
+        call_kernel(kernel, pars)
+        number = 3 if name == "parallelepiped" else 30
+        start = time.time()
+        for _ in range(number):
+            call_kernel(kernel, pars)
+        print("%-16s %-32s %8.3f ms"
+              % (name, pars, 1e3*(time.time()-start)/number))
+        kernel.release()
+        model.release()
+
+def main():
+    """Print the comparison tables, and the kernel times if requested."""
+    args = sys.argv[1:]
+    do_time = "--time" in args
+    args = [v for v in args if v != "--time"]
+    radius = float(args[0]) if args else 20.
+    length = float(args[1]) if len(args) > 1 else 400.
+    q = np.logspace(-3, 0, 13)
+    compare("cylinder", cylinder, q, radius, length)
+    compare("ellipsoid", ellipsoid, q, radius, length)
+    if do_time:
+        time_kernels()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+r"""
+Compare the dense and quadrature SESANS transforms.
+
+:class:`sasmodels.sesans.SesansTransform` used to evaluate the model on a
+uniform grid in $q$ with steps of *q_min* up to *q_max* and sum it against
+a dense matrix of $J_0$ values.  The 'quadrature' method integrates over
+the same range with Gauss-Legendre panels, which are sized by the period
+of $J_0$ at the longest spin echo length rather than by *q_min*.
+
+This script reads the spin echo lengths and wavelengths from the example
+*.ses* files, builds both transforms, and prints the number of $q$ points,
+the build and apply times, and the largest difference in the transformed
+sphere pattern relative to the largest value, for spheres with radius
+1/20 and 1/4 of the longest spin echo length.  Differences of order
+$10^{-4}$ are errors in the dense transform, which is computed in single
+precision with a rectangle rule; the quadrature agrees with the same
+quadrature on panels eight times smaller to $10^{-14}$.
+
+Usage::
+
+    python explore/sesans_transform.py [file.ses ...]
+
+The default is every *.ses* file in the example directory.  The files are
+read with :func:`sasmodels.data.load_native`.
+"""
+from __future__ import print_function, division
+
+import sys
+import os
+import glob
+import time
+
+import numpy as np
+
+from sasmodels.data import load_native
+from sasmodels.sesans import SesansTransform
+
+def read_ses(path):
+    """Return spin echo length and wavelength in A and z acceptance."""
+    data = load_native(path, cache=False)
+    SElength, lam = data.x, data.source.wavelength
+    # acceptance angle, converted to 1/A as in direct_model
+    theta_max = data.sample.zacceptance[0]
+    zaccept = 2*np.pi/np.max(lam)*np.sin(theta_max)
+    return SElength, lam, zaccept
+
+def sphere(q, radius):
+    """Sphere form factor times volume."""
+    x = q*radius
+    return (3*(np.sin(x) - x*np.cos(x))/x**3)**2 * radius**3 * 1e-4
+
+def compare(path):
+    """Print the comparison table for one file."""
+    SElength, lam, zaccept = read_ses(path)
+    print("%s: %d points, SE %.4g to %.4g A"
+          % (os.path.basename(path), len(SElength), SElength[0], SElength[-1]))
+    print("%-11s %8s %10s %10s %12s %12s"
+          % ("method", "q points", "build ms", "apply ms", "diff R/20", "diff R/4"))
+    results = {}
+    for method in ('dense', 'quadrature'):
+        start = time.time()
+        transform = SesansTransform(SElength, SElength, lam, (zaccept,),
+                                    10000000, method=method)
+        build = time.time() - start
+        diffs = []
+        for radius in (SElength[-1]/20, SElength[-1]/4):
+            Iq = sphere(transform.q_calc, radius)
+            start = time.time()
+            P = transform.apply(Iq)
+            apply = time.time() - start
+            if method == 'dense':
+                results[radius] = P
+                diffs.append(0.)
+            else:
+                target = results[radius]
+                diffs.append(np.max(abs(P - target))/np.max(abs(target)))
+        print("%-11s %8d %10.2f %10.3f %12.2e %12.2e"
+              % (method, len(transform.q_calc), 1e3*build, 1e3*apply,
+                 diffs[0], diffs[1]))
+    print()
+
+def main():
+    """Compare the transforms for the files on the command line."""
+    paths = sys.argv[1:]
+    if not paths:
+        example = os.path.join(os.path.dirname(__file__), '..', 'example')
+        paths = sorted(glob.glob(os.path.join(example, '*.ses')))
+    for path in paths:
+        compare(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+r"""
+Compare the accuracy of the dispersity samplers against the number of points.
+
+The test integral is the polydisperse sphere form factor
+
+.. math::
+
+    I(q) = \int V(r)^2 \Phi(qr)^2 p(r) dr \big/ \int V(r) p(r) dr
+
+with $\Phi(x) = 3 (\sin x - x \cos x)/x^3$, for each distribution $p(r)$.
+The reference values are computed with adaptive quadrature on the exact
+distribution.  For each sampler the maximum relative error over a range
+of $q$ is printed for increasing *npts*, so the evenly spaced samplers
+(gaussian, lognormal, schulz) can be compared with the quadrature
+(\*_quad) and equal probability (\*_quantile) samplers.
+
+Usage::
+
+    python explore/weights_accuracy.py [radius] [width]
+
+The defaults are radius 50 and relative width 0.1.
+"""
+from __future__ import print_function, division
+
+import sys
+
+import numpy as np
+from scipy.integrate import quad
+from scipy.stats import norm, lognorm, gamma
+
+from sasmodels.weights import get_weights, MODELS
+
+NPTS = (3, 5, 7, 11, 15, 21, 35, 80)
+FAMILIES = {
+    'gaussian': ('gaussian', 'gaussian_quad', 'gaussian_quantile'),
+    'lognormal': ('lognormal', 'lognormal_quad', 'lognormal_quantile'),
+    'schulz': ('schulz', 'schulz_quad', 'schulz_quantile'),
+}
+
+def form(q, r):
+    """Unnormalized sphere form factor V^2 Phi(qr)^2, and the volume."""
+    qr = np.outer(q, r)
+    phi = 3.0*(np.sin(qr) - qr*np.cos(qr))/qr**3
+    volume = 4.0/3.0*np.pi*r**3
+    return volume**2*phi**2, volume
+
+def distribution(family, radius, width):
+    """Frozen scipy distribution matching the sasmodels disperser."""
+    sigma = radius*width
+    if family == 'gaussian':
+        return norm(loc=radius, scale=sigma)
+    elif family == 'lognormal':
+        return lognorm(s=width, scale=radius)
+    else:
+        z = (radius/sigma)**2
+        return gamma(a=z, scale=radius/z)
+
+def reference(q, dist):
+    """I(q) computed by adaptive quadrature over the distribution."""
+    lo, hi = max(dist.ppf(1e-12), 0.), dist.ppf(1.0 - 1e-12)
+    norm_v = quad(lambda r: form(q[:1], np.array([r]))[1][0]*dist.pdf(r),
+                  lo, hi, limit=200)[0]
+    values = [quad(lambda r: form([qk], np.array([r]))[0][0, 0]*dist.pdf(r),
+                   lo, hi, limit=400)[0]
+              for qk in q]
+    return np.array(values)/norm_v
+
+def sampled(q, disperser, npts, radius, width):
+    """I(q) computed from the points and weights of the disperser, using
+    the default *nsigmas* for the disperser."""
+    nsigmas = MODELS[disperser].default['nsigmas']
+    r, w = get_weights(disperser, npts, width, nsigmas, radius,
+                       (0., np.inf), True)
+    f, volume = form(q, r)
+    return np.dot(f, w)/np.dot(volume, w)
+
+def main():
+    """Print the error table for each family of distributions."""
+    radius = float(sys.argv[1]) if len(sys.argv) > 1 else 50.
+    width = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    q = np.logspace(-3, np.log10(20./radius), 25)  # qr up to 20
+    print("sphere radius %g, relative width %g, max relative error in I(q)"
+          % (radius, width))
+    for family, dispersers in sorted(FAMILIES.items()):
+        target = reference(q, distribution(family, radius, width))
+        print()
+        print("%-6s" % "npts" + "".join("%20s" % d for d in dispersers))
+        for npts in NPTS:
+            errors = [np.max(abs(sampled(q, d, npts, radius, width)
+                                 - target)/target)
+                      for d in dispersers]
+            print("%-6d" % npts + "".join("%20.2e" % e for e in errors))
+
+if __name__ == "__main__":
+    main()
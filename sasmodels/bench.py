@@ -0,0 +1,629 @@
+#!/usr/bin/env python
+r"""
+Benchmark suite for the sasmodels calculation engines.
+
+The benchmark times every model over a fixed matrix of cases:
+
+    * engine: python models with *python*, C models with *dll* and *opencl*
+    * dtype: *single* and *double* (python models are always double)
+    * dispersity: *mono*, *1-pd* (one parameter with 35 points) and
+      *3-pd* (three parameters with 11 points each)
+    * data: *1d* with 200 $q$ points from 0.001 to 0.5 |Ang^-1| and *2d*
+      with a 128 x 128 detector from -0.5 to 0.5 |Ang^-1|
+    * resolution: *none*, *pinhole* with 5% $\Delta q/q$, and *slit* with
+      slit length and width 5% and 1% of $q$ (1D data only)
+
+Each case is evaluated once to build the kernel, then repeatedly until
+*min_time* seconds have been spent or *repeat* evaluations have been done.
+The best and median times are recorded.  Cases which cannot be run on this
+machine, such as *opencl* without pyopencl or *single* for models which
+require double precision, are recorded with the reason they were skipped.
+
+Results are written as JSON along with the machine description, so that a
+run can be stored as a baseline and checked against later runs.  Slowdowns
+beyond *threshold* relative to the baseline are listed, along with cases
+which now raise an error or are no longer run.  The program exits with
+status 1 if there are any of these, so a performance regression or a
+broken model in the kernels or drivers shows up as a failure.
+
+Usage::
+
+    python -m sasmodels.bench [options] [model|kind ...]
+
+Models can be named directly, or selected by any of the kinds accepted by
+:func:`sasmodels.core.list_models` (e.g., *c+2d*).  The default is all
+models.  For example, to store a baseline for the cylinder models in
+double precision and check a later build against it::
+
+    python -m sasmodels.bench --dtype=double -o base.json cylinder ellipsoid
+    python -m sasmodels.bench --compare=base.json
+
+When comparing, the model list and the matrix default to those of the
+baseline.  Use *--load=run.json* to compare stored results without running
+the benchmark again.
+
+The full matrix takes hours for all models since the 2D pinhole cases with
+three dispersity parameters evaluate each model 260 million times.
+"""
+from __future__ import print_function, division
+
+import sys
+import os
+import json
+import platform
+import datetime
+import traceback
+from timeit import default_timer as timer
+
+import numpy as np  # type: ignore
+
+from . import __version__
+from . import core
+from .compare import get_pars, suppress_pd
+from .data import empty_data1D, empty_data2D
+from .direct_model import DirectModel
+from .kernel import QGrid
+
+# pylint: disable=unused-import
+try:
+    from typing import List, Dict, Tuple, Optional, Any, Iterator
+except ImportError:
+    pass
+else:
+    from .data import Data
+    from .kernel import KernelModel
+    from .modelinfo import ModelInfo
+# pylint: enable=unused-import
+
+#: Version of the result file format.
+FORMAT_VERSION = 1
+
+ENGINES = ('python', 'dll', 'opencl')
+DTYPES = ('single', 'double')
+#: Dispersity cases as (name, number of parameters, points per parameter).
+DISPERSITY = (('mono', 0, 0), ('1-pd', 1, 35), ('3-pd', 3, 11))
+DIMENSIONS = ('1d', '2d')
+RESOLUTIONS = ('none', 'pinhole', 'slit')
+
+#: Number of $q$ points for 1D data.
+NQ_1D = 200
+#: Number of pixels along each side of the 2D detector.
+NQ_2D = 128
+#: Relative $\Delta q/q$ for the pinhole resolution.
+PINHOLE = 0.05
+#: Slit length and width relative to $q$ for the slit resolution.
+SLIT = (0.05, 0.01)
+#: Relative width of volume dispersity, and width in degrees of orientation
+#: dispersity.
+PD_WIDTH = {'volume': 0.1, 'orientation': 10.}
+
+#: Fields identifying a case in the results.
+CASE_FIELDS = ('model', 'engine', 'dtype', 'pd', 'dim', 'resolution')
+
+_PLATFORM = {'dll': 'dll', 'opencl': 'ocl'}
+
+def make_data(dim, resolution):
+    # type: (str, str) -> Data
+    """
+    Generate the empty data set for the *dim* and *resolution* of a case.
+    """
+    if dim == '2d':
+        q = np.linspace(-0.5, 0.5, NQ_2D)
+        data = empty_data2D(q, resolution=PINHOLE if resolution == 'pinhole'
+                            else 0.0)
+    else:
+        q = np.logspace(-3, np.log10(0.5), NQ_1D)
+        data = empty_data1D(q, resolution=PINHOLE if resolution == 'pinhole'
+                            else 0.0)
+        if resolution == 'slit':
+            data.dx = None
+            data.dxl, data.dxw = SLIT[0]*q, SLIT[1]*q
+    return data
+
+def dispersity_pars(model_info, dim, npars, npoints):
+    # type: (ModelInfo, str, int, int) -> Dict[str, float]
+    """
+    Return the dispersity settings for the first *npars* polydisperse
+    parameters of the model, with volume parameters ahead of orientation.
+
+    Only volume parameters are polydisperse for 1D data.  Fewer than *npars*
+    parameters are returned if the model does not have enough of them.
+    """
+    parameters = model_info.parameters
+    active = parameters.pd_1d if dim == '1d' else parameters.pd_2d
+    candidates = [p for p in parameters.call_parameters
+                  if p.name in active and p.length == 1]
+    candidates.sort(key=lambda p: p.type != 'volume')
+    pars = {}
+    for p in candidates[:npars]:
+        pars[p.id + '_pd'] = PD_WIDTH[p.type]
+        pars[p.id + '_pd_n'] = npoints
+        pars[p.id + '_pd_nsigma'] = 3.0
+    return pars
+
+def expand_models(names):
+    # type: (List[str]) -> List[str]
+    """
+    Expand model kinds such as *c+2d* into the list of models.
+    """
+    models = []  # type: List[str]
+    for name in names:
+        if all(kind in core.KINDS for kind in name.split('+')):
+            models.extend(core.list_models(name))
+        else:
+            models.append(name)
+    return models
+
+def cases(models, engines=ENGINES, dtypes=DTYPES,
+          dispersity=tuple(v[0] for v in DISPERSITY),
+          dims=DIMENSIONS, resolutions=RESOLUTIONS):
+    # type: (List[str], ...) -> Iterator[Tuple[ModelInfo, Dict[str, Any], Optional[str]]]
+    """
+    Generate the benchmark cases for the selected part of the matrix.
+
+    Yields *(model_info, case, skip)* where *case* is a dictionary with
+    the fields in :data:`CASE_FIELDS` and *skip* is the reason the case
+    cannot be run, or None.  Combinations which are not part of the matrix,
+    such as python models on the dll engine, are not generated.
+    """
+    for name in models:
+        model_info = core.load_model_info(name)
+        is_py = callable(model_info.Iq)
+        for engine in engines:
+            if (engine == 'python') != is_py:
+                continue
+            for dtype in dtypes:
+                if is_py and dtype != 'double':
+                    continue
+                for pd in dispersity:
+                    for dim in dims:
+                        for resolution in resolutions:
+                            case = dict(zip(CASE_FIELDS, (
+                                name, engine, dtype, pd, dim, resolution)))
+                            skip = _skip_reason(model_info, case)
+                            yield model_info, case, skip
+
+def _skip_reason(model_info, case):
+    # type: (ModelInfo, Dict[str, Any]) -> Optional[str]
+    if case['resolution'] == 'slit' and case['dim'] == '2d':
+        return "slit resolution is only defined for 1D data"
+    if case['engine'] == 'opencl':
+        if not core.HAVE_OPENCL:
+            return "OpenCL is not available"
+        if not model_info.opencl:
+            return "model does not run on OpenCL"
+    if case['dtype'] == 'single' and not model_info.single:
+        return "model requires double precision"
+    npars = dict((v[0], v[1]) for v in DISPERSITY)[case['pd']]
+    if npars and not dispersity_pars(model_info, case['dim'], npars, 1):
+        return "model has no polydisperse parameters"
+    return None
+
+def count_points(calculator):
+    # type: (DirectModel) -> Optional[int]
+    """
+    Return the number of $q$ points the model is evaluated at for each
+    dispersity point, or None if it is evaluated in tiles.
+    """
+    # pylint: disable=protected-access
+    q_vectors = calculator._kernel_inputs
+    if q_vectors is None:
+        return None
+    if isinstance(q_vectors, QGrid):
+        return int(np.sum(q_vectors.index)) if q_vectors.index is not None \
+            else q_vectors.size
+    return len(q_vectors[0])
+
+def time_case(calculator, pars, min_time=0.2, repeat=10):
+    # type: (DirectModel, Dict[str, Any], float, int) -> Dict[str, Any]
+    """
+    Time the calculator for *pars*.
+
+    The first evaluation builds the kernel and is timed separately.  The
+    calculator is then evaluated until *min_time* seconds have elapsed or
+    until it has been called *repeat* times.  Times are in milliseconds.
+    """
+    start = timer()
+    calculator(**pars)
+    first = timer() - start
+    times = []  # type: List[float]
+    while not times or (len(times) < repeat and sum(times) < min_time):
+        start = timer()
+        calculator(**pars)
+        times.append(timer() - start)
+    return {
+        'first': 1e3*first,
+        'best': 1e3*min(times),
+        'median': 1e3*float(np.median(times)),
+        'evals': len(times),
+    }
+
+def run(models, min_time=0.2, repeat=10, out=None, **matrix):
+    # type: (List[str], float, int, Any, **Any) -> Dict[str, Any]
+    """
+    Run the benchmark for *models* over the matrix, returning the results.
+
+    *matrix* selects a subset of the cases with keywords *engines*,
+    *dtypes*, *dispersity*, *dims* and *resolutions*, as for :func:`cases`.
+
+    A line is printed to *out* (if given) for each case as it completes.
+    """
+    results = []  # type: List[Dict[str, Any]]
+    builds = []  # type: List[Dict[str, Any]]
+    models_built = {}  # type: Dict[Tuple[str, str, str], Any]
+    datasets = {}  # type: Dict[Tuple[str, str], Data]
+    for model_info, case, skip in cases(models, **matrix):
+        result = case.copy()
+        if skip is None:
+            try:
+                model = _build(model_info, case, models_built, builds)
+                key = case['dim'], case['resolution']
+                if key not in datasets:
+                    datasets[key] = make_data(*key)
+                npars, npoints = [v[1:] for v in DISPERSITY
+                                  if v[0] == case['pd']][0]
+                pars = suppress_pd(get_pars(model_info, use_demo=True))
+                pars.update(dispersity_pars(model_info, case['dim'],
+                                            npars, npoints))
+                calculator = DirectModel(datasets[key], model)
+                result.update(time_case(calculator, pars, min_time, repeat))
+                result['points'] = count_points(calculator)
+            except Exception as exc:
+                traceback.print_exc()
+                result['error'] = "%s: %s" % (type(exc).__name__, exc)
+        else:
+            result['skip'] = skip
+        results.append(result)
+        if out is not None:
+            print(format_result(result), file=out)
+            out.flush()
+    return {
+        'format': FORMAT_VERSION,
+        'machine': machine_info(),
+        'settings': {
+            'models': list(models),
+            'min_time': min_time,
+            'repeat': repeat,
+            'matrix': dict((k, list(v)) for k, v in matrix.items()),
+        },
+        'builds': builds,
+        'results': results,
+    }
+
+def _build(model_info, case, models_built, builds):
+    # type: (ModelInfo, Dict[str, Any], Dict[Tuple[str, str, str], Any], List[Dict[str, Any]]) -> KernelModel
+    key = case['model'], case['engine'], case['dtype']
+    if key not in models_built:
+        start = timer()
+        models_built[key] = core.build_model(
+            model_info, dtype=case['dtype'],
+            platform=_PLATFORM.get(case['engine'], 'dll'))
+        builds.append({'model': key[0], 'engine': key[1], 'dtype': key[2],
+                       'time': 1e3*(timer() - start)})
+    return models_built[key]
+
+def machine_info():
+    # type: () -> Dict[str, Any]
+    """
+    Return a description of the machine and software used for the run.
+    """
+    from . import kerneldll
+    info = {
+        'date': datetime.datetime.now().isoformat(),
+        'node': platform.node(),
+        'system': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or _cpu_model(),
+        'cpu_count': _cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sasmodels': __version__,
+        'compiler': kerneldll.COMPILER,
+        'opencl': _opencl_devices(),
+    }
+    info['environment'] = dict(
+        (k, os.environ[k]) for k in ('SAS_OPENCL', 'SAS_COMPILER', 'CC',
+                                     'OMP_NUM_THREADS', 'PYOPENCL_CTX')
+        if k in os.environ)
+    return info
+
+def _cpu_model():
+    # type: () -> str
+    try:
+        with open('/proc/cpuinfo') as fid:
+            for line in fid:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except (IOError, OSError):
+        pass
+    return ""
+
+def _cpu_count():
+    # type: () -> Optional[int]
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return None
+
+def _opencl_devices():
+    # type: () -> List[str]
+    if not core.HAVE_OPENCL:
+        return []
+    from . import kernelcl
+    try:
+        env = kernelcl.environment()
+    except Exception:
+        return []
+    return [device.name.strip()
+            for context in env.context
+            for device in context.devices]
+
+def case_key(result):
+    # type: (Dict[str, Any]) -> Tuple[str, ...]
+    """
+    Return the fields identifying the case for *result*.
+    """
+    return tuple(result[k] for k in CASE_FIELDS)
+
+def format_result(result):
+    # type: (Dict[str, Any]) -> str
+    """
+    Format a result as a line of text.
+    """
+    label = "%-20s %-6s %-6s %-4s %-2s %-7s" % case_key(result)
+    if 'skip' in result:
+        return "%s  skipped: %s" % (label, result['skip'])
+    if 'error' in result:
+        return "%s  error: %s" % (label, result['error'])
+    return ("%s %10.3f ms (median %.3f ms, first %.3f ms, %d evals)"
+            % (label, result['best'], result['median'], result['first'],
+               result['evals']))
+
+def compare_results(baseline, current, threshold=0.2, floor=0.1):
+    # type: (Dict[str, Any], Dict[str, Any], float, float) -> Dict[str, List[Any]]
+    """
+    Compare the *current* run against the *baseline* run.
+
+    A case is slower if its best time is more than *threshold* (relative)
+    and *floor* milliseconds (absolute) slower than in the baseline, and
+    faster by the same test in reverse.  The floor keeps timer noise on
+    very fast cases from being reported.
+
+    Returns a dictionary with lists of *slower* and *faster* cases as
+    *(key, baseline ms, current ms)* tuples, *missing* keys for the cases
+    timed in the baseline but not in the current run, and *failed* keys for
+    cases which raised an error in the current run.
+    """
+    old = dict((case_key(r), r) for r in baseline['results'] if 'best' in r)
+    new = dict((case_key(r), r) for r in current['results'])
+    report = {'slower': [], 'faster': [], 'missing': [], 'failed': []}
+    for key in sorted(old):
+        if key not in new or 'skip' in new[key]:
+            report['missing'].append(key)
+        elif 'error' in new[key]:
+            report['failed'].append(key)
+        else:
+            before, after = old[key]['best'], new[key]['best']
+            if after > before*(1+threshold) and after - before > floor:
+                report['slower'].append((key, before, after))
+            elif before > after*(1+threshold) and before - after > floor:
+                report['faster'].append((key, before, after))
+    return report
+
+def print_report(report, baseline, current):
+    # type: (Dict[str, List[Any]], Dict[str, Any], Dict[str, Any]) -> None
+    """
+    Print the comparison from :func:`compare_results`.
+    """
+    differs = [k for k in ('node', 'processor', 'compiler', 'opencl')
+               if baseline['machine'].get(k) != current['machine'].get(k)]
+    if differs:
+        print("warning: baseline was run on a different machine (%s)"
+              % ", ".join(differs))
+    for label in ('slower', 'faster'):
+        if report[label]:
+            print("%d cases %s than baseline:" % (len(report[label]), label))
+            for key, before, after in report[label]:
+                print("  %-20s %-6s %-6s %-4s %-2s %-7s" % key
+                      + " %10.3f -> %10.3f ms (x%.2f)"
+                      % (before, after, after/before))
+    for label in ('failed', 'missing'):
+        if report[label]:
+            print("%d cases %s:" % (len(report[label]), label))
+            for key in report[label]:
+                print(("  %-20s %-6s %-6s %-4s %-2s %-7s" % key).rstrip())
+
+def load_results(filename):
+    # type: (str) -> Dict[str, Any]
+    """
+    Load benchmark results from a JSON file.
+    """
+    with open(filename) as fid:
+        results = json.load(fid)
+    if results.get('format') != FORMAT_VERSION:
+        raise ValueError("%s is not a sasmodels benchmark file" % filename)
+    return results
+
+def save_results(results, filename):
+    # type: (Dict[str, Any], str) -> None
+    """
+    Save benchmark results to a JSON file.
+    """
+    with open(filename, 'w') as fid:
+        json.dump(results, fid, indent=1, sort_keys=True)
+
+def _split(value, choices, option):
+    # type: (str, Tuple[str, ...], str) -> List[str]
+    selected = [v.strip() for v in value.split(',') if v.strip()]
+    invalid = [v for v in selected if v not in choices]
+    if invalid:
+        raise ValueError("invalid %s %s; use %s"
+                         % (option, ", ".join(invalid), ",".join(choices)))
+    return selected
+
+def parse_args(argv):
+    # type: (List[str]) -> Any
+    """
+    Parse the command line options.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="python -m sasmodels.bench",
+        description="Time sasmodels over the benchmark matrix.",
+        )
+    parser.add_argument('models', nargs='*', help=(
+        "models or model kinds (all, py, c, 1d, 2d, ...) to benchmark"))
+    parser.add_argument('--engine', help="engines (%s)" % ",".join(ENGINES))
+    parser.add_argument('--dtype', help="precision (%s)" % ",".join(DTYPES))
+    parser.add_argument('--pd', help=(
+        "dispersity (%s)" % ",".join(v[0] for v in DISPERSITY)))
+    parser.add_argument('--dim', help="data (%s)" % ",".join(DIMENSIONS))
+    parser.add_argument('--resolution', help=(
+        "resolution (%s)" % ",".join(RESOLUTIONS)))
+    parser.add_argument('--min-time', type=float, default=None, help=(
+        "seconds to spend timing each case (default 0.2)"))
+    parser.add_argument('--repeat', type=int, default=None, help=(
+        "maximum number of timed evaluations per case (default 10)"))
+    parser.add_argument('-o', '--output', help="write results to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help=(
+        "compare results against this baseline file"))
+    parser.add_argument('--load', metavar='RESULTS', help=(
+        "compare these stored results rather than running the benchmark"))
+    parser.add_argument('--threshold', type=float, default=0.2, help=(
+        "relative slowdown to report (default 0.2)"))
+    parser.add_argument('--floor', type=float, default=0.1, help=(
+        "ignore differences below this many ms (default 0.1)"))
+    parser.add_argument('-q', '--quiet', action='store_true', help=(
+        "don't print each case as it is timed"))
+    opts = parser.parse_args(argv)
+    if opts.load and not opts.compare:
+        parser.error("--load requires --compare")
+    return opts
+
+def main(*argv):
+    # type: (*str) -> int
+    """
+    Main program.  Returns 1 if the comparison found slower, failed or
+    missing cases.
+    """
+    opts = parse_args(list(argv))
+    baseline = load_results(opts.compare) if opts.compare else None
+    if opts.load:
+        current = load_results(opts.load)
+    else:
+        # Selections not given on the command line default to the baseline.
+        settings = baseline['settings'] if baseline else {}
+        defaults = settings.get('matrix', {})
+        matrix = {}
+        for option, key, choices in (
+                ('engine', 'engines', ENGINES),
+                ('dtype', 'dtypes', DTYPES),
+                ('pd', 'dispersity', tuple(v[0] for v in DISPERSITY)),
+                ('dim', 'dims', DIMENSIONS),
+                ('resolution', 'resolutions', RESOLUTIONS)):
+            value = getattr(opts, option)
+            if value is not None:
+                matrix[key] = _split(value, choices, option)
+            elif key in defaults:
+                matrix[key] = defaults[key]
+        models = (expand_models(opts.models) if opts.models
+                  else settings.get('models', core.list_models()))
+        min_time = (opts.min_time if opts.min_time is not None
+                    else settings.get('min_time', 0.2))
+        repeat = (opts.repeat if opts.repeat is not None
+                  else settings.get('repeat', 10))
+        current = run(models, min_time=min_time, repeat=repeat,
+                      out=None if opts.quiet else sys.stdout, **matrix)
+        if opts.output:
+            save_results(current, opts.output)
+    if baseline is None:
+        return 0
+    report = compare_results(baseline, current, threshold=opts.threshold,
+                             floor=opts.floor)
+    print_report(report, baseline, current)
+    return exit_status(report)
+
+def exit_status(report):
+    # type: (Dict[str, List[Any]]) -> int
+    """
+    Return the program exit status for the comparison *report*, which is 1
+    if any case is slower, failed or missing, otherwise 0.
+    """
+    return 1 if (report['slower'] or report['failed']
+                 or report['missing']) else 0
+
+def test_bench():
+    # type: () -> None
+    """
+    Check the benchmark matrix and the comparison against a baseline.
+    """
+    matrix = dict(engines=['dll', 'opencl'], dtypes=['double'],
+                  dims=['1d', '2d'], resolutions=['none', 'slit'])
+    all_cases = list(cases(['sphere', '_spherepy'], **matrix))
+    # sphere: 3 pd x 2 dims x 2 resolutions for each engine; no python case
+    assert len(all_cases) == 24, len(all_cases)
+    skipped = [case for _, case, skip in all_cases if skip is not None]
+    assert all(c['dim'] == '2d' and c['resolution'] == 'slit'
+               or c['engine'] == 'opencl' for c in skipped)
+
+    # sphere has one polydisperse parameter in 1D
+    sphere = core.load_model_info('sphere')
+    assert list(dispersity_pars(sphere, '1d', 3, 11)) == [
+        'radius_pd', 'radius_pd_n', 'radius_pd_nsigma']
+    cylinder = core.load_model_info('cylinder')
+    pars = dispersity_pars(cylinder, '2d', 3, 11)
+    assert sorted(k for k in pars if k.endswith('_pd')) == [
+        'length_pd', 'radius_pd', 'theta_pd'], pars
+
+    results = run(['_spherepy'], min_time=0., repeat=2,
+                  dispersity=['mono', '1-pd'], dims=['1d'],
+                  resolutions=['none', 'slit'])
+    timed = [r for r in results['results'] if 'best' in r]
+    assert len(timed) == 4 and all(r['evals'] == 1 for r in timed), results
+    assert timed[0]['points'] == NQ_1D
+    assert timed[1]['points'] > NQ_1D  # slit resolution extends q
+    assert results['machine']['sasmodels'] == __version__
+
+    # A baseline twice as fast shows everything slower, but only beyond
+    # the noise floor.
+    baseline = json.loads(json.dumps(results))
+    for r in baseline['results']:
+        r['best'] /= 2
+    report = compare_results(baseline, results, floor=0.)
+    assert len(report['slower']) == 4 and not report['faster']
+    assert exit_status(report) == 1
+    report = compare_results(baseline, results, floor=1e6)
+    assert not report['slower'] and exit_status(report) == 0
+    report = compare_results(results, baseline, floor=0.)
+    assert len(report['faster']) == 4 and exit_status(report) == 0
+    # Cases which raise or are no longer run also fail the comparison,
+    # even if nothing is slower.
+    failed = json.loads(json.dumps(results))
+    failed['results'][0]['error'] = 'failed'
+    report = compare_results(results, failed, floor=1e6)
+    assert len(report['failed']) == 1 and not report['missing']
+    assert exit_status(report) == 1
+    missing = json.loads(json.dumps(results))
+    del missing['results'][1]
+    report = compare_results(results, missing, floor=1e6)
+    assert len(report['missing']) == 1 and not report['failed']
+    assert exit_status(report) == 1
+
+    # The program returns the status when comparing stored results.
+    import tempfile
+    import shutil
+    path = tempfile.mkdtemp()
+    try:
+        base, run_file = [os.path.join(path, name)
+                          for name in ('base.json', 'run.json')]
+        save_results(results, base)
+        save_results(results, run_file)
+        assert main('--compare='+base, '--load='+run_file, '--floor=1e6') == 0
+        save_results(failed, run_file)
+        assert main('--compare='+base, '--load='+run_file, '--floor=1e6') == 1
+    finally:
+        shutil.rmtree(path)
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:]))
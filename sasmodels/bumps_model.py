@@ -16,13 +16,15 @@ __all__ = ["Model", "Experiment"]
 
 import numpy as np  # type: ignore
 
+from . import metrics
 from .data import plot_theory
 from .direct_model import DataMixin
 
 # pylint: disable=unused-import
 try:
-    from typing import Dict, Union, Tuple, Any
+    from typing import Dict, Union, Tuple, Any, Optional
     from .data import Data1D, Data2D
+    from .details import PointList
     from .kernel import KernelModel
     from .modelinfo import ModelInfo
     Data = Union[Data1D, Data2D]
@@ -133,15 +135,40 @@ class Experiment(DataMixin):
     *cutoff* is the integration cutoff, which avoids computing the
     the SAS model where the polydispersity weight is low.
 
+    *pd_mesh* selects the dispersity mesh representation, such as
+    :class:`sasmodels.details.PointList`.  The default is to use the full
+    mesh.  See :func:`sasmodels.direct_model.call_kernel` for details.
+
+    *q_tolerance* is the tolerance for combining $q$ values when evaluating
+    models on 2D data.  See
+    :class:`sasmodels.direct_model.DataMixin` for details.
+
+    *resolution_tolerance* is the target relative error for 1D resolution
+    smearing.  If it is given, the model is evaluated once at the initial
+    parameter values to choose the points for the smearing.  See
+    :class:`sasmodels.direct_model.DataMixin` for details.
+
+    *sesans_direct* is True to compute SESANS data in real space for models
+    with a *sesans* function, ignoring the instrument acceptance.  See
+    :class:`sasmodels.direct_model.DataMixin` for details.
+
     The resulting model can be used directly in a Bumps FitProblem call.
     """
     _cache = None # type: Dict[str, np.ndarray]
-    def __init__(self, data, model, cutoff=1e-5, name=None):
-        # type: (Data, Model, float) -> None
+    def __init__(self, data, model, cutoff=1e-5, name=None, pd_mesh=None,
+                 q_tolerance=0.0, resolution_tolerance=None,
+                 sesans_direct=False):
+        # type: (Data, Model, float, Optional[str], Optional[PointList], Optional[float], Optional[float], bool) -> None
         # remember inputs so we can inspect from outside
         self.name = data.filename if name is None else name
         self.model = model
         self.cutoff = cutoff
+        self.pd_mesh = pd_mesh
+        self.q_tolerance = q_tolerance
+        self.resolution_tolerance = resolution_tolerance
+        self.sesans_direct = sesans_direct
+        if resolution_tolerance is not None:
+            self.resolution_probe = model.state()
         self._interpret_data(data, model.sasmodel)
         self._cache = {}
 
@@ -176,8 +203,12 @@ class Experiment(DataMixin):
         called when the parameters have changed.
         """
         if 'theory' not in self._cache:
-            pars = self.model.state()
-            self._cache['theory'] = self._calc_theory(pars, cutoff=self.cutoff)
+            with metrics.timer('bumps.theory', model=self.model.sasmodel.info.id):
+                pars = self.model.state()
+                self._cache['theory'] = self._calc_theory(pars,
+                                                          cutoff=self.cutoff)
+        else:
+            metrics.count('bumps.theory_cached')
         return self._cache['theory']
 
     def residuals(self):
@@ -235,6 +266,7 @@ class Experiment(DataMixin):
         # Can't pickle gpu functions, so instead make them lazy
         state = self.__dict__.copy()
         state['_kernel'] = None
+        state['_reduced_kernel'] = None
         return state
 
     def __setstate__(self, state):
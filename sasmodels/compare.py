@@ -89,7 +89,7 @@ Options (* for default):
     -mono*/-poly force monodisperse or allow polydisperse random parameters
     -cutoff=1e-5* cutoff value for including a point in polydispersity
     -magnetic/-nonmagnetic* suppress magnetism
-    -accuracy=Low accuracy of the resolution calculation Low, Mid, High, Xhigh
+    -accuracy=Low accuracy of the resolution calculation Low, Mid, High, Xhigh, Grid, Adaptive
     -neval=1 sets the number of evals for more accurate timing
     -ngauss=0 overrides the number of points in the 1-D gaussian quadrature
 
@@ -121,18 +121,18 @@ def _matches(name, kind):
         return True
     return False
 
-def load_model(model_name, dtype=None, platform='ocl'):
-    # type: (str, str, str) -> KernelModel
+def load_model(model_name, dtype=None, platform='ocl', tolerance=None):
+    # type: (str, str, str, Optional[float]) -> KernelModel
     """
     Load model info and build model.
 
     *model_name* is the name of the model, or perhaps a model expression
     such as sphere*hardsphere or sphere+cylinder.
 
-    *dtype* and *platform* are given by :func:`build_model`.
+    *dtype*, *platform* and *tolerance* are given by :func:`build_model`.
     """
     return build_model(load_model_info(model_name),
-                       dtype=dtype, platform=platform)
+                       dtype=dtype, platform=platform, tolerance=tolerance)
 
 def load_model_info(model_string):
     # type: (str) -> modelinfo.ModelInfo
@@ -192,8 +192,8 @@ def load_model_info(model_string):
     return model
 
 
-def build_model(model_info, dtype=None, platform="ocl"):
-    # type: (modelinfo.ModelInfo, str, str) -> KernelModel
+def build_model(model_info, dtype=None, platform="ocl", tolerance=None):
+    # type: (modelinfo.ModelInfo, str, str, Optional[float]) -> KernelModel
     """
     Prepare the model for the default execution platform.
 
@@ -210,11 +210,24 @@ def build_model(model_info, dtype=None, platform="ocl"):
 
     *platform* should be "dll" to force the dll to be used for C models,
     otherwise it uses the default "ocl".
+
+    *tolerance* controls the orientation averages in models which use the
+    adaptive rule in *models/lib/adaptive_gauss.c*, such as cylinder and
+    parallelepiped.  Where $q$ is too high for the 76 point Gauss rule to
+    be exact for the shape, the rule is refined until the squared relative
+    change between successive rules is below *tolerance*.  The default is
+    1e-8 in double precision and 1e-5 in single precision.  A looser
+    tolerance is faster for large shapes at high $q$, but the error can
+    then be as large as the square root of the tolerance.  Models built
+    with a tolerance are compiled separately rather than taken from the
+    model bundle.
     """
     composition = model_info.composition
     if composition is not None:
         composition_type, parts = composition
-        models = [build_model(p, dtype=dtype, platform=platform) for p in parts]
+        models = [build_model(p, dtype=dtype, platform=platform,
+                              tolerance=tolerance)
+                  for p in parts]
         if composition_type == 'mixture':
             return mixture.MixtureModel(model_info, models)
         elif composition_type == 'product':
@@ -229,31 +242,49 @@ def build_model(model_info, dtype=None, platform="ocl"):
 
     numpy_dtype, fast, platform = parse_dtype(model_info, dtype, platform)
 
-    source = generate.make_source(model_info)
+    if platform == "dll" and tolerance is None:
+        # Use the precompiled model bundle if it contains the model.
+        bundle = kerneldll.find_bundle(model_info, numpy_dtype)
+        if bundle is not None:
+            return kerneldll.DllModel(bundle, model_info, numpy_dtype,
+                                      bundled=True)
+
+    source = generate.make_source(model_info, tolerance=tolerance)
     if platform == "dll":
         #print("building dll", numpy_dtype)
-        return kerneldll.load_dll(source['dll'], model_info, numpy_dtype)
+        return kerneldll.load_dll(source['dll'], model_info, numpy_dtype,
+                                  tolerance=tolerance)
     else:
         #print("building ocl", numpy_dtype)
         return kernelcl.GpuModel(source, model_info, numpy_dtype, fast=fast)
 
-def precompile_dlls(path, dtype="double"):
-    # type: (str, str) -> List[str]
+def precompile_dlls(path, dtype="double", bundle=False):
+    # type: (str, str, bool) -> List[str]
     """
     Precompile the dlls for all builtin models, returning a list of dll paths.
 
     *path* is the directory in which to save the dlls.  It will be created if
     it does not already exist.
 
+    If *bundle* is True, then compile all the builtin C models into a single
+    shared library (see :func:`sasmodels.kerneldll.make_bundle`), returning
+    a list containing the path to that library.  Loading one library is
+    much faster than loading one dll per model.  Custom models are still
+    compiled into their own dlls when they are used, as are builtin models
+    whose sources have changed since the bundle was built.
+
     This can be used when build the windows distribution of sasmodels
     which may be missing the OpenCL driver and the dll compiler.
     """
     numpy_dtype = np.dtype(dtype)
     if not os.path.exists(path):
         os.makedirs(path)
+    model_infos = [load_model_info(model_name) for model_name in list_models()]
+    if bundle:
+        c_models = [info for info in model_infos if not callable(info.Iq)]
+        return [kerneldll.make_bundle(c_models, numpy_dtype, path=path)]
     compiled_dlls = []
-    for model_name in list_models():
-        model_info = load_model_info(model_name)
+    for model_info in model_infos:
         if not callable(model_info.Iq):
             source = generate.make_source(model_info)['dll']
             old_path = kerneldll.DLL_PATH
@@ -325,6 +356,28 @@ def parse_dtype(model_info, dtype=None, platform=None):
 
     return numpy_dtype, fast, platform
 
+def test_build_tolerance():
+    # type: () -> None
+    """
+    Check that the integration tolerance is applied when building a model.
+    """
+    from .direct_model import call_kernel
+
+    q = np.logspace(-3, 0, 50)
+    pars = dict(radius=20, length=4000)
+    model = load_model('cylinder', dtype='double', platform='dll')
+    loose = load_model('cylinder', dtype='double', platform='dll',
+                       tolerance=1e-4)
+    assert loose.dllpath != model.dllpath and '_tol0.0001' in loose.dllpath
+    target = call_kernel(model.make_kernel([q]), pars)
+    result = call_kernel(loose.make_kernel([q]), pars)
+    # Below q r = 70 the fixed rule is used whatever the tolerance, and
+    # above it the loose tolerance stops sooner with a larger error.
+    low = q*np.sqrt(20**2 + 2000**2) < 70
+    assert np.all(result[low] == target[low])
+    error = abs(result/target - 1)
+    assert 1e-8 < np.max(error) < 0.1
+
 def list_models_main():
     # type: () -> None
     """
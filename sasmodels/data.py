@@ -11,6 +11,9 @@ Wrappers for the sasview data loader and data manipulations:
 
     :func:`load_data` loads a sasview data file.
 
+    :func:`load_native` loads 1D and 2D ASCII and SESANS files without
+    sasview, with an optional binary cache.
+
     :func:`set_beam_stop` masks the beam stop from the data.
 
     :func:`set_half` selects the right or left half of the data, which can
@@ -32,13 +35,20 @@ objects so that models can be run without SasView on the path.  You could
 also use these for your own data loader.
 
 """
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import warnings
 import traceback
 
 import numpy as np  # type: ignore
 
 # pylint: disable=unused-import
 try:
-    from typing import Union, Dict, List, Optional
+    from typing import Union, Dict, List, Optional, Tuple, Any
 except ImportError:
     pass
 else:
@@ -49,13 +59,19 @@ def load_data(filename, index=0):
     # type: (str) -> Data
     """
     Load data using a sasview loader.
+
+    If sasview is not available, use :func:`load_native` instead.
     """
-    from sas.sascalc.dataloader.loader import Loader  # type: ignore
-    loader = Loader()
     # Allow for one part in multipart file
     if '[' in filename:
         filename, indexstr = filename[:-1].split('[')
         index = int(indexstr)
+    try:
+        from sas.sascalc.dataloader.loader import Loader  # type: ignore
+    except ImportError:
+        data = load_native(filename)
+        return data if index != 'all' else [data]
+    loader = Loader()
     datasets = loader.load(filename)
     if not datasets:  # None or []
         raise IOError("Data %r could not be loaded" % filename)
@@ -71,6 +87,352 @@ def load_data(filename, index=0):
     return datasets[index] if index != 'all' else datasets
 
 
+#: Directory for the binary cache used by :func:`load_native`.  This is set
+#: from the *SAS_DATA_CACHE* environment variable, or None for no cache.
+DATA_CACHE = os.environ.get('SAS_DATA_CACHE', None) or None
+
+_CACHE_VERSION = 1
+_CACHE_MANIFEST = 'data.json'
+_CACHE_COLUMNS = 'columns.npy'
+
+# Scale factors to A, to radians and to 1/A for SESANS units
+_LENGTH_UNITS = {'a': 1., 'ang': 1., 'nm': 10., 'um': 1e4, 'mm': 1e7,
+                 'cm': 1e8}
+_ANGLE_UNITS = {'radians': 1., 'rad': 1., 'degrees': np.pi/180, 'deg': np.pi/180}
+_INVERSE_LENGTH_UNITS = {'a^-1': 1., '\\a^-1': 1., '\\aa^-1': 1., '1/a': 1.,
+                         'nm^-1': 0.1, '1/nm': 0.1}
+
+# Column names for the SESANS files written before the BEGIN_DATA layout.
+# Files with depolarisation in the second column have the same columns as
+# the BEGIN_DATA layout followed by the polarisation; other files have the
+# polarisation in the fifth column.
+_LEGACY_DEPOLARISATION_COLUMNS = [
+    'spinecholength', 'depolarisation', 'depolarisation_error',
+    'spinecholength_error', 'wavelength', 'wavelength_error',
+    'polarisation', 'polarisation_error']
+_LEGACY_POLARISATION_COLUMNS = [
+    'spinecholength', 'spinecholength_error', 'wavelength',
+    'wavelength_error', 'polarisation', 'polarisation_error']
+
+# Label with an optional unit in brackets, such as "Thickness [mm]".
+_LABEL = re.compile(r'^(.*?)\s*(?:\[(.*)\])?$')
+
+# Lines which do not start with a number, including the preceding newline.
+# Starting with a literal lets the regex engine skip quickly between lines.
+_TEXT_LINE = re.compile(r'\n[ \t]*(?![-+]?(?:\d|\.\d|nan|inf))\S[^\n]*',
+                        re.IGNORECASE)
+
+def load_native(filename, cache=None):
+    # type: (str, Union[None, bool, str]) -> Data
+    r"""
+    Load data from *filename* without sasview.
+
+    The supported formats are column ASCII files with $q$, $I$, $\Delta I$
+    and $\Delta q$ for 1D data, NIST QxQy ASCII files with $q_x$, $q_y$,
+    $I$, $\Delta I$, $q_z$, $\Delta q_\parallel$ and $\Delta q_\perp$
+    for 2D data, and SasView *.ses* files for SESANS data.  Any header lines
+    before the columns are skipped.  SESANS spin echo lengths and wavelengths
+    are converted to A and the acceptance angle to radians.
+
+    SESANS files may use the *BEGIN_DATA* layout or the earlier layout
+    with tab separated header values and column labels, with units in
+    brackets.  For the earlier layout, the acceptance *Q_zmax* or
+    *z-acceptance* is converted to an angle using the longest wavelength,
+    and if the file gives the polarisation $P$ rather than the
+    depolarisation, it is converted to $\ln(P)/(t\lambda^2)$ in
+    A$^{-2}$ cm$^{-1}$ using the sample thickness $t$.  Spin echo lengths
+    labelled as um in these files are in nm.
+
+    The columns are parsed in one pass by numpy.  If *cache* is True the
+    columns are also saved to a sidecar directory *filename.sascache*, or
+    if *cache* is a directory name they are saved there, keyed by the hash
+    of the file contents.  Later loads of the same contents use the saved
+    columns, which are memory mapped copy-on-write, so large 2D files are
+    paged in as they are used rather than parsed and held in memory.  The
+    default cache is :data:`DATA_CACHE`.  Use *cache=False* to ignore it.
+    """
+    with open(filename, 'rb') as fid:
+        content = fid.read()
+    key = hashlib.sha1(content).hexdigest()
+    if cache is None:
+        cache = DATA_CACHE
+    if cache is None or cache is False:
+        entry = None
+    elif cache is True:
+        entry = filename + '.sascache'
+    else:
+        entry = os.path.join(cache, key)
+
+    table = _load_cache_entry(entry, key) if entry is not None else None
+    if table is None:
+        table = _parse_native(content.decode('latin-1'), filename)
+        if entry is not None:
+            _save_cache_entry(entry, key, *table)
+    return _make_native_data(filename, *table)
+
+
+def _parse_native(text, filename):
+    # type: (str, str) -> Tuple[str, Dict[str, Any], np.ndarray]
+    """
+    Return the kind of data ('1d', '2d' or 'sesans'), the header values
+    and the columns in *text*.
+    """
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    if filename.lower().endswith('.ses') and 'BEGIN_DATA' not in text:
+        return _parse_legacy_ses(text, filename)
+    if 'BEGIN_DATA' in text:
+        head, _, body = text.partition('BEGIN_DATA')
+        meta = {}  # type: Dict[str, Any]
+        for line in head.split('\n'):
+            fields = line.split(None, 1)
+            if len(fields) == 2:
+                meta[fields[0].lower()] = fields[1].strip()
+        names, _, body = body.strip().partition('\n')
+        meta['columns'] = names.lower().split()
+        _, columns = _read_columns(body, filename)
+        return 'sesans', meta, columns
+
+    header, columns = _read_columns(text, filename)
+    meta = {}
+    is_2d = (len(columns) >= 7
+             or (re.search(r'\bqx\b', header, re.IGNORECASE) is not None
+                 and re.search(r'\bqy\b', header, re.IGNORECASE) is not None))
+    if not is_2d:
+        return '1d', meta, columns
+    # NIST 2D header gives "MON CNT LAMBDA(A) DET_OFF(cm) DET_DIST(m) ..."
+    match = re.search(r'^MON CNT.*LAMBDA.*\n(.*)$', header, re.MULTILINE)
+    if match is not None:
+        values = match.group(1).split()
+        meta['wavelength'] = float(values[1])
+        meta['distance'] = float(values[3])
+    return '2d', meta, columns
+
+
+def _parse_legacy_ses(text, filename):
+    # type: (str, str) -> Tuple[str, Dict[str, Any], np.ndarray]
+    """
+    Return the SESANS table for *text* in the layout used before the
+    *BEGIN_DATA* section, with the metadata keys of the *BEGIN_DATA* layout.
+    """
+    header, columns = _read_columns(text, filename)
+    lines = [line for line in header.split('\n') if line.strip()]
+    if not lines:
+        raise ValueError("expected column labels in %r" % filename)
+    meta = {}  # type: Dict[str, Any]
+    for line in lines[:-1]:
+        fields = [v.strip() for v in re.split(r'\t|\s{2,}', line.strip())]
+        if len(fields) < 2 or not fields[1]:
+            continue
+        name, unit = _split_label(fields[0])
+        if name in ('q_zmax', 'z-acceptance'):
+            name = 'q_zmax'
+        meta[name] = fields[1].strip('"')
+        if unit is not None:
+            meta[name + '_unit'] = unit
+    labels = [_split_label(v) for v in re.split(r'\t|\s{2,}', lines[-1])
+              if v.strip()]
+    if not labels or not labels[0][0].startswith('spin echo length'):
+        raise ValueError("expected spin echo length column in %r" % filename)
+    if len(labels) > 1 and labels[1][0].startswith('depolarisation'):
+        names = _LEGACY_DEPOLARISATION_COLUMNS
+    else:
+        names = _LEGACY_POLARISATION_COLUMNS
+    names = names[:min(len(labels), len(columns))]
+    for name, (_, unit) in zip(names, labels):
+        if unit is not None and name + '_unit' not in meta:
+            # The spin echo lengths labelled as um are in nm.
+            meta[name + '_unit'] = 'nm' if unit.lower() == 'um' else unit
+    meta['columns'] = names
+    return 'sesans', meta, columns
+
+
+def _split_label(label):
+    # type: (str) -> Tuple[str, Optional[str]]
+    """
+    Return the lower case name and the unit, or None, for a label such as
+    "Thickness [mm]".
+    """
+    match = _LABEL.match(label.strip())
+    return match.group(1).lower(), match.group(2)
+
+
+def _read_columns(text, filename):
+    # type: (str, str) -> Tuple[str, np.ndarray]
+    """
+    Return the header and the columns of the largest block of numeric
+    lines in *text*, as an array with one row for each column.
+    """
+    # match against '\n'+text so that m.start() is the start of the line
+    spans = [(m.start(), m.end()-1) for m in _TEXT_LINE.finditer('\n' + text)]
+    starts = [0] + [end for _, end in spans]
+    stops = [start for start, _ in spans] + [len(text)]
+    start, stop = max(zip(starts, stops), key=lambda span: span[1] - span[0])
+    block = text[start:stop]
+    match = re.search(r'\S[^\n]*', block)
+    first = match.group(0) if match is not None else ''
+    if ',' in first:
+        block, first = block.replace(',', ' '), first.replace(',', ' ')
+    ncols = len(first.split())
+    try:
+        with warnings.catch_warnings():
+            # numpy warns rather than raising when it stops early
+            warnings.simplefilter('error', DeprecationWarning)
+            values = np.fromstring(block, sep=' ')
+    except (ValueError, DeprecationWarning):
+        values = None
+    if ncols == 0 or values is None or values.size % ncols:
+        raise ValueError("could not read columns from %r" % filename)
+    return text[:start], np.ascontiguousarray(values.reshape(-1, ncols).T)
+
+
+def _load_cache_entry(entry, key):
+    # type: (str, str) -> Optional[Tuple[str, Dict[str, Any], np.ndarray]]
+    """
+    Return the table saved in *entry* if it is for content *key*.
+    """
+    try:
+        with open(os.path.join(entry, _CACHE_MANIFEST)) as fid:
+            manifest = json.load(fid)
+        if manifest['hash'] != key or manifest['version'] != _CACHE_VERSION:
+            return None
+        columns = np.load(os.path.join(entry, _CACHE_COLUMNS), mmap_mode='c')
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+    return manifest['kind'], manifest['meta'], columns
+
+
+def _save_cache_entry(entry, key, kind, meta, columns):
+    # type: (str, str, str, Dict[str, Any], np.ndarray) -> None
+    """
+    Save the table to *entry*.  The cache is only an optimization, so
+    errors such as a read-only directory are ignored.
+    """
+    parent = os.path.dirname(os.path.abspath(entry))
+    try:
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+        # Write to a temporary directory then rename so that partially
+        # written entries are never visible.
+        tmp = tempfile.mkdtemp(prefix='.tmp', dir=parent)
+    except OSError:
+        return
+    try:
+        np.save(os.path.join(tmp, _CACHE_COLUMNS), columns)
+        manifest = {'version': _CACHE_VERSION, 'hash': key,
+                    'kind': kind, 'meta': meta}
+        with open(os.path.join(tmp, _CACHE_MANIFEST), 'w') as fid:
+            json.dump(manifest, fid)
+        if os.path.isdir(entry):
+            # stale sidecar for an earlier version of the file
+            shutil.rmtree(entry, ignore_errors=True)
+        os.rename(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _make_native_data(filename, kind, meta, columns):
+    # type: (str, str, Dict[str, Any], np.ndarray) -> Data
+    """
+    Build the data object from the table returned by :func:`_parse_native`.
+    """
+    ncols = len(columns)
+    if kind == '1d':
+        if ncols < 2:
+            raise ValueError("expected q, I columns in %r" % filename)
+        data = Data1D(x=columns[0], y=columns[1],
+                      dy=columns[2] if ncols > 2 else None,
+                      dx=columns[3] if ncols > 3 else None)
+        data.xaxis("Q", "1/A")
+        data.yaxis("Intensity", "1/cm")
+    elif kind == '2d':
+        if ncols < 3:
+            raise ValueError("expected qx, qy, I columns in %r" % filename)
+        data = Data2D(x=columns[0], y=columns[1], z=columns[2],
+                      dz=columns[3] if ncols > 3 else None,
+                      dx=columns[5] if ncols > 6 else None,
+                      dy=columns[6] if ncols > 6 else None)
+        data.x_bins, data.y_bins = _grid_bins(columns[0], columns[1])
+        if 'wavelength' in meta:
+            data.source.wavelength = meta['wavelength']
+            data.detector.append(Detector(distance=meta['distance']))
+    else:
+        names = meta['columns']
+        def column(name, scale=1.):
+            # type: (str, float) -> Optional[np.ndarray]
+            return (columns[names.index(name)]*scale if name in names
+                    else None)
+        def scale(name, units, default):
+            # type: (str, Dict[str, float], str) -> float
+            unit = meta.get(name + '_unit', default)
+            try:
+                return units[unit.lower()]
+            except KeyError:
+                raise ValueError("unknown unit %r for %s in %r"
+                                 % (unit, name, filename))
+        length = scale('spinecholength', _LENGTH_UNITS, 'A')
+        lam = column('wavelength', scale('wavelength', _LENGTH_UNITS, 'A'))
+        if lam is None:
+            raise ValueError("expected wavelength column in %r" % filename)
+        y, dy = column('depolarisation'), column('depolarisation_error')
+        y_unit = meta.get('depolarisation_unit', '')
+        if y is None and 'polarisation' in names:
+            # ln(P)/(t lambda^2) in 1/(A^2 cm), as in the BEGIN_DATA layout
+            if 'thickness' not in meta:
+                raise ValueError("expected sample thickness in %r" % filename)
+            thickness = (float(meta['thickness'])
+                         * scale('thickness', _LENGTH_UNITS, 'cm')
+                         / _LENGTH_UNITS['cm'])
+            polarisation = column('polarisation')
+            y = np.log(polarisation)/(thickness*lam**2)
+            if 'polarisation_error' in names:
+                dy = (column('polarisation_error')
+                      / (polarisation*thickness*lam**2))
+            y_unit = 'A-2 cm-1'
+        data = SesansData(x=column('spinecholength', length),
+                          y=y,
+                          dx=column('spinecholength_error', length),
+                          dy=dy)
+        data.isSesans = True
+        data.lam = lam
+        data.xaxis("SpinEchoLength", "A")
+        data.yaxis("Depolarisation", y_unit)
+        data.source = Source()
+        data.source.wavelength = data.lam
+        data.source.wavelength_unit = "A"
+        data.sample = Sample()
+        if 'thickness' in meta:
+            data.sample.thickness = float(meta['thickness'])
+            data.sample.thickness_unit = meta.get('thickness_unit', 'cm')
+        if 'theta_zmax' in meta:
+            theta = (float(meta['theta_zmax'])
+                     * scale('theta_zmax', _ANGLE_UNITS, 'radians'))
+        elif 'q_zmax' in meta:
+            # q_max = 2 pi sin(theta_max)/lambda, as in direct_model
+            q_max = (float(meta['q_zmax'])
+                     * scale('q_zmax', _INVERSE_LENGTH_UNITS, '1/A'))
+            theta = np.arcsin(q_max*np.max(lam)/(2*np.pi))
+        else:
+            raise ValueError("expected Theta_zmax acceptance in %r"
+                             % filename)
+        data.sample.zacceptance = (float(theta), "radians")
+    data.filename = os.path.basename(filename)
+    return data
+
+
+def _grid_bins(qx, qy):
+    # type: (np.ndarray, np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]
+    """
+    Return the *qx* values along the first detector row and the *qy* value
+    for each row, or None if the pixels are not a complete grid in row order.
+    """
+    restart = np.nonzero(np.diff(qx) < 0)[0]
+    nx = restart[0] + 1 if len(restart) else len(qx)
+    if nx == 0 or len(qx) % nx:
+        return None, None
+    return np.array(qx[:nx]), np.array(qy[::nx])
+
+
 def set_beam_stop(data, radius, outer=None):
     # type: (Data, float, Optional[float]) -> None
     """
@@ -290,6 +652,18 @@ class Detector(object):
         self.pixel_size = Vector(*pixel_size)
         self.distance = distance
 
+class Sample(object):
+    """
+    Sample attributes.
+
+    *zacceptance* is the SESANS acceptance angle as *(value, unit)*.
+    """
+    def __init__(self):
+        # type: () -> None
+        self.thickness = np.NaN
+        self.thickness_unit = "cm"
+        self.zacceptance = None  # type: Optional[Tuple[float, str]]
+
 class Source(object):
     """
     Beam attributes.
@@ -317,18 +691,23 @@ def empty_data1D(q, resolution=0.0):
     return data
 
 
-def empty_data2D(qx, qy=None, resolution=0.0):
-    # type: (np.ndarray, Optional[np.ndarray], float) -> Data2D
+def empty_data2D(qx, qy=None, resolution=0.0, dtype='d'):
+    # type: (np.ndarray, Optional[np.ndarray], float, np.dtype) -> Data2D
     """
     Create empty 2D data using the given mesh.
 
     If *qy* is missing, create a square mesh with *qy=qx*.
 
     *resolution* dq/q defaults to 5%.
+
+    *dtype* is the type used to store the pixel values.  Use 'float32' to
+    halve the memory needed for very large detectors.  The grid is kept
+    in *x_bins*, *y_bins*, so models are evaluated from the two axes rather
+    than from the pixel values.
     """
     if qy is None:
         qy = qx
-    qx, qy = np.asarray(qx), np.asarray(qy)
+    qx, qy = np.asarray(qx, dtype), np.asarray(qy, dtype)
     # 5% dQ/Q resolution
     Qx, Qy = np.meshgrid(qx, qy)
     Qx, Qy = Qx.flatten(), Qy.flatten()
@@ -713,6 +1092,100 @@ def _plot_2d_signal(data,       # type: Data2D
     plt.ylabel("$q_y$/A$^{-1}$")
     return vmin, vmax
 
+def test_load_native():
+    # type: () -> None
+    """
+    Check the native loaders and the binary cache on small files.
+    """
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'data1d.txt')
+        with open(path, 'w') as fid:
+            fid.write("<X> <Y> <dY>\n0.01 100 1\n0.02 50 0.5\n0.03,20,0.2\n")
+        # commas are only allowed if the first data line has them
+        assert_raises = False
+        try:
+            load_native(path, cache=False)
+        except ValueError:
+            assert_raises = True
+        assert assert_raises
+        with open(path, 'w') as fid:
+            fid.write("<X> <Y> <dY>\n0.01 100 1\n0.02 50 0.5\n0.03 20 0.2\n"
+                      "END\n")
+        data = load_native(path, cache=False)
+        assert np.allclose(data.x, [0.01, 0.02, 0.03])
+        assert np.allclose(data.dy, [1, 0.5, 0.2]) and data.dx is None
+
+        path = os.path.join(root, 'data2d.dat')
+        qx, qy = np.meshgrid(np.linspace(-0.1, 0.1, 4), np.linspace(-0.2, 0.2, 3))
+        table = np.vstack([qx.flat, qy.flat, np.arange(12.), np.ones(12),
+                           np.zeros(12), 0.01*np.ones(12), 0.02*np.ones(12)])
+        header = ("MON CNT   LAMBDA (A)  DET_OFF(cm)   DET_DIST(m)\n"
+                  "1e+08  6  15  14.5\nThe 2D data\nQx - Qy - I(Qx,Qy) ...\n")
+        np.savetxt(path, table.T, header=header.strip(), comments='')
+        for cache in (True, os.path.join(root, 'cache'), True):
+            data = load_native(path, cache=cache)
+            assert np.allclose(data.qx_data, qx.flat)
+            assert np.allclose(data.err_data, 1) and np.allclose(data.dqy_data, 0.02)
+            assert np.allclose(data.x_bins, qx[0]) and np.allclose(data.y_bins, qy[:, 0])
+            assert data.source.wavelength == 6. and data.detector[0].distance == 14.5
+        assert isinstance(data.data, np.memmap)
+        # copy-on-write, so the cache is unchanged
+        data.data[0] = 100.
+        assert load_native(path, cache=True).data[0] == 0.
+
+        path = os.path.join(root, 'data.ses')
+        with open(path, 'w') as fid:
+            fid.write("FileFormatVersion 1.0\nThickness 2\nThickness_unit mm\n"
+                      "Theta_zmax 0.05\nTheta_zmax_unit radians\n"
+                      "SpinEchoLength_unit nm\nWavelength_unit A\n\nBEGIN_DATA\n"
+                      "SpinEchoLength Depolarisation Depolarisation_error "
+                      "SpinEchoLength_error Wavelength Wavelength_error\n"
+                      "100 -0.1 0.01 1 2 0.1\n200 -0.2 0.01 1 2 0.1\n")
+        data = load_native(path)
+        assert data.isSesans and data._xunit == "A"
+        assert np.allclose(data.x, [1000, 2000]) and np.allclose(data.dx, 10)
+        assert np.allclose(data.source.wavelength, 2)
+        assert data.sample.zacceptance == (0.05, "radians")
+        assert data.sample.thickness == 2 and data.sample.thickness_unit == "mm"
+
+        # The acceptance is needed for the SESANS transform.
+        with open(path, 'w') as fid:
+            fid.write("FileFormatVersion 1.0\nBEGIN_DATA\n"
+                      "SpinEchoLength Depolarisation Wavelength\n"
+                      "100 -0.1 2\n200 -0.2 2\n")
+        assert_raises = False
+        try:
+            load_native(path, cache=False)
+        except ValueError:
+            assert_raises = True
+        assert assert_raises
+    finally:
+        shutil.rmtree(root)
+
+    # The legacy layout of se008731_01_40pcorr.ses holds the same data as
+    # the BEGIN_DATA layout of spheres2micron.ses.
+    example = os.path.join(os.path.dirname(__file__), '..', 'example')
+    data = load_native(os.path.join(example, 'spheres2micron.ses'), cache=False)
+    legacy = load_native(os.path.join(example, 'se008731_01_40pcorr.ses'),
+                         cache=False)
+    assert legacy.isSesans and legacy.sample.thickness_unit == "cm"
+    for attr in ('x', 'y', 'dx', 'dy', 'lam'):
+        assert np.allclose(getattr(legacy, attr), getattr(data, attr)), attr
+    assert abs(legacy.sample.zacceptance[0] - data.sample.zacceptance[0]) < 1e-4
+
+    # Legacy files with polarisation are converted to depolarisation.
+    data = load_native(os.path.join(example, 'se008724_01.ses'), cache=False)
+    assert np.allclose(data.x[:2], [497.78, 630.41])
+    assert np.allclose(data.lam, 2.11)
+    assert np.allclose(data.y[0], np.log(0.99782)/(0.2*2.11**2))
+    assert np.allclose(data.dy[0], 0.0044367/(0.99782*0.2*2.11**2))
+    for name in ('SiO2_100pc_H2O_0pc_D2O.ses', 'core_shell.ses', 'sphere.ses'):
+        data = load_native(os.path.join(example, name), cache=False)
+        assert data.isSesans and len(data.x) == len(data.y) > 0, name
+        assert data.sample.zacceptance[0] > 0, name
+
+
 def demo():
     # type: () -> None
     """
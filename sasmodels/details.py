@@ -9,6 +9,18 @@ weight distribution, and which parameter is the "theta" parameter for
 polar coordinate integration.  The :class:`CallDetails` object maintains
 this data.  Use :func:`build_details` to build a *details* object which
 can be passed to one of the computational kernels.
+
+For repeated evaluation of the same kernel, such as during a fit, use
+a :class:`CallPlan` instead of :func:`make_kernel_args`.  The plan keeps
+the values buffer and the *details* object between calls, refilling the
+buffer in place and only rebuilding the details when the number of points
+in one of the dispersity distributions changes.
+
+Rather than looping over the full tensor product of the dispersity
+distributions, the kernels can also loop over a list of mesh points.  Use
+:class:`PointList` to select the points of the mesh which contribute
+significantly to the integral, or :func:`make_point_kernel_args` to supply
+an arbitrary set of points with their weights.
 """
 
 from __future__ import print_function
@@ -62,6 +74,13 @@ class CallDetails(object):
     vector is the latitude parameter, or -1 if there is no latitude
     parameter in the model.  In practice, the normalization term cancels
     if the latitude is not a polydisperse parameter.
+
+    If *point_list* is set, then the mesh is not a tensor product but
+    a list of points (see :func:`make_point_details`).  The first level
+    of the loop steps through the points, and the values of the remaining
+    active parameters are stored with one value for each point.  The
+    retained indices into the individual dispersity vectors, if any,
+    are in *point_index*, and the combined weights are in *point_weight*.
     """
     parts = None  # type: List["CallDetails"]
     def __init__(self, model_info):
@@ -78,7 +97,8 @@ class CallDetails(object):
         #   num_weights        total length of the weight vector
         #   num_active         number of pd params
         #   theta_par          parameter number for theta parameter
-        self.buffer = np.empty(4*max_pd + 4, 'i4')
+        #   point_list         true if the mesh is a list of points
+        self.buffer = np.empty(4*max_pd + 5, 'i4')
 
         # generate views on different parts of the array
         self._pd_par = self.buffer[0 * max_pd:1 * max_pd]
@@ -88,6 +108,9 @@ class CallDetails(object):
 
         # theta_par is fixed
         self.theta_par = parameters.theta_offset
+        self.point_list = 0
+        self.point_index = None  # type: np.ndarray
+        self.point_weight = None  # type: np.ndarray
 
         # offset and length are for all parameters, not just pd parameters
         # They are not sent to the kernel function, though they could be.
@@ -123,48 +146,59 @@ class CallDetails(object):
     @property
     def num_eval(self):
         """Total size of the pd mesh"""
-        return self.buffer[-4]
+        return self.buffer[-5]
 
     @num_eval.setter
     def num_eval(self, v):
         """Total size of the pd mesh"""
-        self.buffer[-4] = v
+        self.buffer[-5] = v
 
     @property
     def num_weights(self):
         """Total length of all the weight vectors"""
-        return self.buffer[-3]
+        return self.buffer[-4]
 
     @num_weights.setter
     def num_weights(self, v):
         """Total length of all the weight vectors"""
-        self.buffer[-3] = v
+        self.buffer[-4] = v
 
     @property
     def num_active(self):
         """Number of active polydispersity loops"""
-        return self.buffer[-2]
+        return self.buffer[-3]
 
     @num_active.setter
     def num_active(self, v):
         """Number of active polydispersity loops"""
-        self.buffer[-2] = v
+        self.buffer[-3] = v
 
     @property
     def theta_par(self):
         """Location of the theta parameter in the parameter vector"""
-        return self.buffer[-1]
+        return self.buffer[-2]
 
     @theta_par.setter
     def theta_par(self, v):
         """Location of the theta parameter in the parameter vector"""
+        self.buffer[-2] = v
+
+    @property
+    def point_list(self):
+        """True if the dispersity mesh is a list of points"""
+        return self.buffer[-1]
+
+    @point_list.setter
+    def point_list(self, v):
+        """True if the dispersity mesh is a list of points"""
         self.buffer[-1] = v
 
     def show(self, values=None):
         """Print the polydispersity call details to the console"""
         print("===== %s details ===="%self.info.name)
-        print("num_active:%d  num_eval:%d  num_weights:%d  theta=%d"
-              % (self.num_active, self.num_eval, self.num_weights, self.theta_par))
+        print("num_active:%d  num_eval:%d  num_weights:%d  theta=%d  list=%d"
+              % (self.num_active, self.num_eval, self.num_weights,
+                 self.theta_par, self.point_list))
         if self.pd_par.size:
             print("pd_par", self.pd_par)
             print("pd_length", self.pd_length)
@@ -251,6 +285,238 @@ def make_kernel_args(kernel, # type: Kernel
     #call_details.show()
     return call_details, data, is_magnetic
 
+def make_point_details(model_info, pd_par, num_points, inactive_length):
+    # type: (ModelInfo, Sequence[int], int, Sequence[int]) -> CallDetails
+    """
+    Return a :class:`CallDetails` object for a dispersity mesh given as a
+    list of *num_points* points.
+
+    *pd_par* lists the indices of the dispersity parameters, starting with
+    the active parameters and followed by the inactive parameters used to
+    fill the remaining loop levels.  The value vector for each active
+    parameter has one value per point, and the weight vector for the
+    first parameter holds the combined weight of each point.  The weight
+    vectors for the remaining active parameters are all 1.0.
+    *inactive_length* gives the length of the value vector for each
+    inactive parameter, which should be 1.
+    """
+    max_pd = model_info.parameters.max_pd
+    num_active = len(pd_par) - len(inactive_length)
+    if num_active > max_pd:
+        raise ValueError("Too many polydisperse parameters")
+    length = np.array([num_points]*num_active + list(inactive_length), 'i')
+    offset = np.cumsum(np.hstack((0, length)))
+
+    call_details = CallDetails(model_info)
+    call_details.pd_par[:max_pd] = pd_par[:max_pd]
+    call_details.pd_length[:max_pd] = 1
+    call_details.pd_length[0] = num_points
+    call_details.pd_offset[:max_pd] = offset[:max_pd]
+    call_details.pd_stride[:max_pd] = num_points
+    call_details.pd_stride[0] = 1
+    call_details.num_eval = num_points
+    call_details.num_weights = offset[-1]
+    call_details.num_active = num_active
+    call_details.point_list = 1
+    return call_details
+
+
+def make_point_kernel_args(kernel, mesh, pd_par, pd_values, pd_weight):
+    # type: (Kernel, List[Tuple[float, np.ndarray, np.ndarray]], Sequence[int], Sequence[np.ndarray], np.ndarray) -> Tuple[CallDetails, np.ndarray, bool]
+    """
+    Converts a list of dispersity points into kernel pars.
+
+    *mesh* is the list of (value, dispersity, weight) for each parameter,
+    as for :func:`make_kernel_args`.  Only the values are used for the
+    active parameters, and the dispersity for the remaining parameters.
+
+    *pd_par* are the indices of the active parameters, not including
+    scale and background, *pd_values* is the list of values for each active
+    parameter at each point, and *pd_weight* is the combined weight of
+    each point.
+
+    Returns a CallDetails object with *point_list* set, the values for the
+    kernel and the magnetic flag, as for :func:`make_kernel_args`.
+    """
+    parameters = kernel.info.parameters
+    npars, nvalues = parameters.npars, parameters.nvalues
+    max_pd = parameters.max_pd
+    scalars = [value for value, _dispersity, _weight in mesh]
+    dispersity = [d for _value, d, _weight in mesh[2:npars+2]]
+    active = set(pd_par)
+    inactive = [k for k in range(npars) if k not in active]
+    inactive = inactive[:max(max_pd - len(pd_par), 0)]
+    num_points = len(pd_weight)
+    call_details = make_point_details(
+        kernel.info, list(pd_par) + inactive, num_points,
+        [len(dispersity[k]) for k in inactive])
+    num_weights = call_details.num_weights
+    weight = np.ones(num_weights)
+    weight[:num_points] = pd_weight
+    # Pad value array to a 32 value boundary
+    data_len = nvalues + 2*num_weights
+    extra = (32 - data_len%32)%32
+    data = np.hstack((scalars,) + tuple(pd_values)
+                     + tuple(dispersity[k] for k in inactive)
+                     + (weight, ZEROS[:extra]))
+    data = data.astype(kernel.dtype)
+    is_magnetic = convert_magnetism(parameters, data)
+    call_details.point_weight = np.asarray(pd_weight)
+    return call_details, data, is_magnetic
+
+
+class PointList(object):
+    """
+    Evaluate the dispersity mesh as a list of the retained points.
+
+    The kernel tests the weight of each point of the full tensor product
+    mesh against *cutoff*, so the dispersity loop still steps through every
+    point.  With a point list, the weights are computed ahead of time and
+    only the points with weight above the cutoff are sent to the kernel.
+
+    If *sort* is True, the points are ordered by decreasing weight.
+
+    If *tolerance* is greater than zero, the lightest points are discarded
+    for as long as their total weight stays below *tolerance* times the
+    total weight of the mesh.  This bounds the error in the normalized
+    weights used for the integral.  The weight that was dropped is stored
+    as *discarded* after each call.
+
+    Composite models, and meshes without any dispersity, are evaluated on
+    the full mesh.
+
+    Use this as *pd_mesh* for :func:`sasmodels.direct_model.call_kernel`.
+    Other integration schemes, such as those in :mod:`sasmodels.pd_mesh`,
+    provide the same :meth:`integrate` method.
+    """
+    def __init__(self, sort=False, tolerance=0.):
+        # type: (bool, float) -> None
+        self.sort = sort
+        self.tolerance = tolerance
+        self.discarded = 0.
+
+    def __call__(self, kernel, mesh, cutoff=0.):
+        # type: (Kernel, List[Tuple[float, np.ndarray, np.ndarray]], float) -> Tuple[CallDetails, np.ndarray, bool]
+        self.discarded = 0.
+        npars = kernel.info.parameters.npars
+        weights = [w for _value, _dispersity, w in mesh[2:npars+2]]
+        active = [k for k, w in enumerate(weights) if len(w) > 1]
+        if (kernel.info.composition is not None or not active
+                or any(len(w) == 0 for w in weights)):
+            return make_kernel_args(kernel, mesh)
+
+        index, weight = self.select(
+            [np.asarray(weights[k]) for k in active], cutoff)
+        values = [np.asarray(mesh[k+2][1])[idx]
+                  for k, idx in zip(active, index)]
+        call_details, data, is_magnetic = make_point_kernel_args(
+            kernel, mesh, active, values, weight)
+        call_details.point_index = index.T
+        return call_details, data, is_magnetic
+
+    def integrate(self, kernel, mesh, cutoff=0.):
+        # type: (Kernel, List[Tuple[float, np.ndarray, np.ndarray]], float) -> np.ndarray
+        """
+        Evaluate *kernel* over the retained points of *mesh*.
+        """
+        call_details, values, is_magnetic = self(kernel, mesh, cutoff)
+        return kernel(call_details, values, cutoff, is_magnetic)
+
+    def select(self, weights, cutoff=0.):
+        # type: (List[np.ndarray], float) -> Tuple[np.ndarray, np.ndarray]
+        """
+        Return the indices and the weights of the retained points from the
+        tensor product of *weights*.
+
+        The index array has one row for each dispersity vector and one
+        column for each point.
+        """
+        shape = [len(w) for w in weights]
+        index = np.indices(shape).reshape(len(shape), -1)
+        weight = np.prod([w[k] for w, k in zip(weights, index)], axis=0)
+        total = np.sum(weight)
+        keep = weight > cutoff
+        if self.tolerance > 0.:
+            order = np.argsort(weight, kind='mergesort')
+            dropped = np.cumsum(weight[order]) <= self.tolerance*total
+            keep[order[dropped]] = False
+        points = np.nonzero(keep)[0]
+        if points.size == 0:
+            # Keep one point with zero weight so the kernel still runs and
+            # returns background, as it would for the full mesh.
+            points = np.argmax(weight)[None]
+            weight = np.zeros_like(weight)
+        if self.sort:
+            points = points[np.argsort(-weight[points], kind='mergesort')]
+        self.discarded = total - np.sum(weight[points])
+        return index[:, points], weight[points]
+
+
+class CallPlan(object):
+    """
+    Reusable kernel arguments for repeated calls to the same kernel.
+
+    *model_info* and *dtype* are the model definition and the precision of
+    the kernel, as given by *kernel.info* and *kernel.dtype*.
+
+    Calling the plan with a dispersity *mesh* returns the same tuple as
+    :func:`make_kernel_args`, *(call_details, values, is_magnetic)*.  The
+    *values* buffer is updated in place, so it is only valid until the next
+    call to the plan.  The *call_details* object is reused for as long as
+    the lengths of the dispersity distributions stay the same.
+    """
+    def __init__(self, model_info, dtype):
+        # type: (ModelInfo, np.dtype) -> None
+        self.info = model_info
+        self.dtype = np.dtype(dtype)
+        self.call_details = None  # type: CallDetails
+        self.values = None  # type: np.ndarray
+        self._length = None  # type: Tuple[int, ...]
+        self._weight_slice = None  # type: slice
+
+    def __call__(self, mesh):
+        # type: (List[Tuple[float, np.ndarray, np.ndarray]]) -> Tuple[CallDetails, np.ndarray, bool]
+        parameters = self.info.parameters
+        npars, nvalues = parameters.npars, parameters.nvalues
+        # skipping scale and background when building values and weights
+        _values, dispersity, weights = zip(*mesh[2:npars+2]) if npars else ((), (), ())
+        length = tuple(len(w) for w in weights)
+        if length != self._length:
+            self._build(length)
+        values = self.values
+        values[:nvalues] = [value for value, _dispersity, _weight in mesh]
+        if npars:
+            np.concatenate(dispersity + weights, out=values[self._weight_slice])
+        is_magnetic = convert_magnetism(parameters, values)
+        return self.call_details, values, is_magnetic
+
+    def _build(self, length):
+        # type: (Tuple[int, ...]) -> None
+        nvalues = self.info.parameters.nvalues
+        length = np.array(length, dtype='i')
+        offset = np.cumsum(np.hstack((0, length)))
+        num_weights = offset[-1]
+        self.call_details = make_details(self.info, length, offset[:-1],
+                                         num_weights)
+        # Pad value array to a 32 value boundary; the padding stays zero.
+        data_len = nvalues + 2*num_weights
+        extra = (32 - data_len%32)%32
+        self.values = np.zeros(data_len + extra, dtype=self.dtype)
+        self._weight_slice = slice(nvalues, data_len)
+        self._length = tuple(length)
+
+
+def get_call_plan(kernel):
+    # type: (Kernel) -> CallPlan
+    """
+    Return the :class:`CallPlan` attached to *kernel*, creating it if needed.
+    """
+    plan = kernel.call_plan
+    if plan is None:
+        plan = kernel.call_plan = CallPlan(kernel.info, kernel.dtype)
+    return plan
+
+
 def correct_theta_weights(parameters, # type: ParameterTable
                           dispersity, # type: Sequence[np.ndarray]
                           weights     # type: Sequence[np.ndarray]
@@ -342,3 +608,26 @@ def dispersion_mesh(model_info, mesh):
             offset += n
         dispersity = pars
     return dispersity, weight
+
+
+def test_point_list():
+    """
+    Check that the point list reproduces the full dispersity mesh.
+    """
+    from .core import load_model
+    from .data import empty_data1D
+    from .direct_model import DirectModel
+
+    model = load_model('_spherepy')
+    data = empty_data1D(np.logspace(-3, -1, 10))
+    pars = dict(radius=50., radius_pd=0.2, radius_pd_n=10)
+    full = DirectModel(data, model, cutoff=1e-3)(**pars)
+    points = DirectModel(data, model, cutoff=1e-3,
+                         pd_mesh=PointList(sort=True))(**pars)
+    assert np.allclose(points, full, rtol=1e-12, atol=0)
+
+    mesh = PointList(tolerance=0.05)
+    index, weight = mesh.select([np.array([0.5, 0.3, 0.02]),
+                                 np.array([0.9, 0.1])])
+    assert index.shape == (2, len(weight))
+    assert 0 < mesh.discarded <= 0.05*np.sum([0.5, 0.3, 0.02])
@@ -29,21 +29,27 @@ from . import sesans  # type: ignore
 from . import weights
 from . import resolution
 from . import resolution2d
-from .details import make_kernel_args, dispersion_mesh
+from . import metrics
+from .generate import model_xy_mode
+from .resolution_cache import RESOLUTION_OPERATORS, digest
+from .details import get_call_plan, dispersion_mesh
+from .kernel import QGrid
 
 # pylint: disable=unused-import
 try:
-    from typing import Optional, Dict, Tuple
+    from typing import Any, Callable, Optional, Dict, List, Tuple, Iterator
 except ImportError:
     pass
 else:
     from .data import Data
+    from .details import PointList
     from .kernel import Kernel, KernelModel
-    from .modelinfo import Parameter, ParameterSet
+    from .modelinfo import ModelInfo, Parameter, ParameterSet
+    from .resolution_cache import ResolutionCache
 # pylint: enable=unused-import
 
-def call_kernel(calculator, pars, cutoff=0., mono=False):
-    # type: (Kernel, ParameterSet, float, bool) -> np.ndarray
+def call_kernel(calculator, pars, cutoff=0., mono=False, pd_mesh=None):
+    # type: (Kernel, ParameterSet, float, bool, Optional[PointList]) -> np.ndarray
     """
     Call *kernel* returned from *model.make_kernel* with parameters *pars*.
 
@@ -55,10 +61,25 @@ def call_kernel(calculator, pars, cutoff=0., mono=False):
     uncertainty.
 
     *mono* is True if polydispersity should be set to none on all parameters.
+
+    *pd_mesh* controls how the dispersity mesh is sent to the kernel.  If it
+    is None, the kernel loops over the full tensor product mesh, with the
+    kernel arguments managed by the call plan attached to the kernel (see
+    :class:`sasmodels.details.CallPlan`) so that repeated calls with the
+    same dispersity structure reuse the same buffers.  Otherwise the result
+    is computed by *pd_mesh.integrate(kernel, mesh, cutoff)*.  Use
+    :class:`sasmodels.details.PointList` to loop over only the mesh points
+    that contribute to the integral, or one of the sparse integration
+    schemes in :mod:`sasmodels.pd_mesh` for models with several
+    polydisperse parameters.
     """
-    mesh = get_mesh(calculator.info, pars, dim=calculator.dim, mono=mono)
+    with metrics.timer('mesh'):
+        mesh = get_mesh(calculator.info, pars, dim=calculator.dim, mono=mono)
     #print("pars", list(zip(*mesh))[0])
-    call_details, values, is_magnetic = make_kernel_args(calculator, mesh)
+    if pd_mesh is not None:
+        return pd_mesh.integrate(calculator, mesh, cutoff)
+    with metrics.timer('kernel_args'):
+        call_details, values, is_magnetic = get_call_plan(calculator)(mesh)
     #print("values:", values)
     return calculator(call_details, values, cutoff, is_magnetic)
 
@@ -149,6 +170,9 @@ def _get_par_weights(parameter, values, active=True):
 
     Uses "name", "name_pd", "name_pd_type", "name_pd_n", "name_pd_sigma"
     from the *pars* dictionary for parameter value and parameter dispersion.
+
+    Distributions come from the weight cache in :mod:`sasmodels.weights`,
+    so the returned vectors are read-only.
     """
     value = float(values.get(parameter.name, parameter.default))
     npts = values.get(parameter.name+'_pd_n', 0)
@@ -178,10 +202,20 @@ def _vol_pars(model_info, values):
     return dispersity, weight
 
 
-def _make_sesans_transform(data):
-    from sas.sascalc.data_util.nxsunit import Converter
+def _sesans_geometry(data):
+    # type: (Data) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Tuple[float], float]
+    """
+    Return the arguments to :class:`sesans.SesansTransform` for *data*.
+    """
+    try:
+        from sas.sascalc.data_util.nxsunit import Converter
+    except ImportError:
+        # data from data.load_native is already in A and radians
+        if (data._xunit != "A" or data.source.wavelength_unit != "A"
+                or data.sample.zacceptance[1] != "radians"):
+            raise
+        Converter = _IdentityConverter
 
-    # Pre-compute the Hankel matrix (H)
     SElength = Converter(data._xunit)(data.x, "A")
 
     theta_max = Converter("radians")(data.sample.zacceptance)[0]
@@ -189,10 +223,325 @@ def _make_sesans_transform(data):
     zaccept = Converter("1/A")(q_max, "1/" + data.source.wavelength_unit),
 
     Rmax = 10000000
-    hankel = sesans.SesansTransform(data.x, SElength,
-                                    data.source.wavelength,
-                                    zaccept, Rmax)
-    return hankel
+    return data.x, SElength, data.source.wavelength, zaccept, Rmax
+
+class _IdentityConverter(object):
+    """
+    Stand-in for the sasview unit converter when no conversion is needed.
+    """
+    def __init__(self, units):
+        # type: (str) -> None
+        pass
+    def __call__(self, value, units=None):
+        # type: (Any, Optional[str]) -> Any
+        return value
+
+def _has_sesans(model):
+    # type: (KernelModel) -> bool
+    """
+    Return True if *model* can compute SESANS data in real space.
+    """
+    info = model.info
+    # C models need sesans in C and python models need it in python
+    return (info.composition is None and info.sesans is not None
+            and callable(info.sesans) == callable(info.Iq))
+
+#: Theory shared by SESANS data sets with the same transform, as used by
+#: :class:`DataMixin`.
+SESANS_THEORY = weights.WeightCache(size=8, name='sesans_theory')
+
+
+def _is_magnetic(model_info, pars):
+    # type: (ModelInfo, ParameterSet) -> bool
+    """
+    Return True if any of the magnetic sld parameters is nonzero.
+    """
+    parameters = model_info.parameters
+    for k in parameters.magnetism_index:
+        p = parameters.call_parameters[k]
+        if pars.get(p.name, p.default):
+            return True
+    return False
+
+
+class RadialQ(object):
+    r"""
+    Distinct $|q|$ values for the points *(qx, qy)*.
+
+    Models without orientation parameters or an *Iqxy* function only depend
+    on $|q| = \sqrt{q_x^2 + q_y^2}$, and on a detector many pixels share the
+    same $|q|$.  *q_calc* is the sorted array of distinct $|q|$, and
+    :meth:`expand` copies the model evaluated at *q_calc* back to the
+    points.
+
+    If *tolerance* is greater than zero, then $|q|$ values which differ by
+    less than *tolerance* relative to each other share a single evaluation
+    point, and the model is linearly interpolated between the evaluation
+    points.  Since the interpolation error is second order in the spacing
+    this is usually well below the resolution of the measurement even for
+    a tolerance of 1e-3.  The first and last $|q|$ are always evaluation
+    points.
+
+    *qx* and *qy* may instead broadcast to the points, such as the axes
+    *x_bins[None, :]* and *y_bins[:, None]* of a detector grid, with the
+    boolean mask *index* selecting the points in the flattened array.
+    """
+    def __init__(self, qx, qy, tolerance=0.0, index=None):
+        # type: (np.ndarray, np.ndarray, float, Optional[np.ndarray]) -> None
+        q = np.sqrt(qx**2 + qy**2).ravel()
+        if index is not None:
+            q = q[index]
+        q_unique, inverse = np.unique(q, return_inverse=True)
+        if tolerance > 0 and len(q_unique) > 2:
+            # Number the q values by log bins of width tolerance and keep
+            # the first value in each bin, plus the endpoints.  q=0 gets a
+            # bin of its own.
+            positive = q_unique[q_unique > 0]
+            bins = np.floor(np.log(positive/positive[0])/np.log1p(tolerance))
+            _, first = np.unique(bins, return_index=True)
+            nodes = positive[first]
+            if nodes[-1] != positive[-1]:
+                nodes = np.hstack((nodes, positive[-1]))
+            if q_unique[0] == 0.:
+                nodes = np.hstack((0., nodes))
+            # Linear interpolation weights from the nodes to the distinct q.
+            upper = np.clip(np.searchsorted(nodes, q_unique), 1, len(nodes)-1)
+            lower = upper - 1
+            fraction = (q_unique - nodes[lower])/(nodes[upper] - nodes[lower])
+            self.q_calc = nodes
+            self._interp = lower, upper, fraction
+        else:
+            self.q_calc = q_unique
+            self._interp = None
+        self._inverse = inverse
+
+    def expand(self, Iq):
+        # type: (np.ndarray) -> np.ndarray
+        """
+        Return the values of *Iq*, computed at *q_calc*, for each point.
+        """
+        if self._interp is not None:
+            lower, upper, fraction = self._interp
+            Iq = Iq[lower] + fraction*(Iq[upper] - Iq[lower])
+        return Iq[self._inverse]
+
+
+class SymmetricQ(object):
+    r"""
+    Half of the points *(qx, qy)* for a centrosymmetric pattern.
+
+    Without magnetism the scattering satisfies
+    $I(q_x, q_y) = I(-q_x, -q_y)$ even for oriented models, so a detector
+    centered on the beam computes most values twice.  Points in the half
+    plane $q_x < 0$ or $q_x = 0, q_y < 0$ are inverted through the origin,
+    and points which then coincide are evaluated once.  *q_calc = [qx, qy]*
+    holds the points to evaluate, all in the half plane $q_x \ge 0$.
+    :meth:`expand` copies the model evaluated at *q_calc* back to the
+    points.
+
+    Points coincide if they are within *tolerance* times the largest
+    $|q|$ of each other.  A tolerance of 1e-10 is used if *tolerance* is
+    zero, which allows for rounding errors in the pixel coordinates.  A
+    larger tolerance pairs up the pixels of a detector whose beam center
+    is not exactly on a pixel boundary.
+
+    *reduction* is the fraction of points removed.
+    """
+    def __init__(self, qx, qy, tolerance=0.0):
+        # type: (np.ndarray, np.ndarray, float) -> None
+        from scipy.spatial import cKDTree  # type: ignore
+
+        flip = (qx < 0) | ((qx == 0) & (qy < 0))
+        half = np.column_stack((np.where(flip, -qx, qx), np.where(flip, -qy, qy)))
+        n = len(half)
+        index = np.arange(n)
+        if n > 1:
+            # Map each point to its nearest neighbour if that has a lower
+            # number, then follow the chain of maps to the representative.
+            step = max(tolerance, 1e-10)*np.sqrt(np.max(qx**2 + qy**2))
+            tree = cKDTree(half, balanced_tree=False)
+            distance, nearest = tree.query(half, k=2, distance_upper_bound=step)
+            nearest[~np.isfinite(distance)] = n
+            index = np.minimum(index, np.min(nearest, axis=1))
+            while True:
+                chained = index[index]
+                if (chained == index).all():
+                    break
+                index = chained
+        points, inverse = np.unique(index, return_inverse=True)
+        self.q_calc = [half[points, 0], half[points, 1]]
+        self.reduction = 1.0 - len(points)/n if n else 0.0
+        self._inverse = inverse
+
+    def expand(self, Iq):
+        # type: (np.ndarray) -> np.ndarray
+        """
+        Return the values of *Iq*, computed at *q_calc*, for each point.
+        """
+        return Iq[self._inverse]
+
+
+class SymmetricGrid(object):
+    r"""
+    Half of the rows of a centrosymmetric detector grid.
+
+    This is :class:`SymmetricQ` for a :class:`sasmodels.kernel.QGrid`
+    *grid*.  If the axes of the grid are symmetric about zero to within
+    *tolerance* times the largest $|q|$ then pixel *(i, j)* mirrors to
+    pixel *(nx-1-i, ny-1-j)*, so the rows with $q_y \ge 0$ hold every
+    value.  *q_calc* is a :class:`sasmodels.kernel.QGrid` over those rows,
+    masked to the pixels which are selected in *grid* or which mirror a
+    selected pixel, so the kernel still receives only the axes.
+    :meth:`expand` copies the model evaluated at *q_calc* back to the
+    selected pixels.
+
+    If the axes are not symmetric then *q_calc* is *grid* and *reduction*
+    is zero.
+    """
+    def __init__(self, grid, tolerance=0.0):
+        # type: (QGrid, float) -> None
+        x, y = grid.x_bins, grid.y_bins
+        nx, ny = len(x), len(y)
+        mask = (np.ones((ny, nx), 'bool') if grid.index is None
+                else grid.index.reshape(ny, nx))
+        n = np.sum(mask)
+        step = max(tolerance, 1e-10)*np.hypot(abs(x).max(), abs(y).max())
+        if (n == 0 or not np.allclose(x, -x[::-1], rtol=0., atol=step)
+                or not np.allclose(y, -y[::-1], rtol=0., atol=step)):
+            self.q_calc = grid
+            self.reduction = 0.0
+            self._inverse = None
+            return
+
+        # Keep the upper rows, which include the middle row if ny is odd.
+        start = ny//2
+        keep = mask[start:] | mask[:ny-start][::-1, ::-1]
+        self.q_calc = QGrid(x, y[start:], None if keep.all() else keep.ravel())
+        self.reduction = 1.0 - np.sum(keep)/n
+
+        # Position in the result of the kept pixel for each grid pixel.
+        position = np.cumsum(keep.ravel()) - 1
+        j, i = np.indices((ny, nx))
+        flip = j < start
+        j = np.where(flip, ny-1-j, j) - start
+        i = np.where(flip, nx-1-i, i)
+        self._inverse = position[j*nx + i][mask]
+
+    def expand(self, Iq):
+        # type: (np.ndarray) -> np.ndarray
+        """
+        Return the values of *Iq*, computed at *q_calc*, for each point.
+        """
+        return Iq if self._inverse is None else Iq[self._inverse]
+
+
+#: Memory allowed for the q values and results of one kernel, in bytes.
+#: :class:`DataMixin` evaluates larger sets of q values in chunks using
+#: :class:`ChunkedKernel`.
+STREAM_BUDGET = 2**28
+## Bytes for each point in the kernel q input and results, for (qx, qy)
+## pairs in double precision
+STREAM_POINT_BYTES = 24
+
+def q_chunks(q_vectors, size):
+    # type: (List[np.ndarray], int) -> Iterator[Tuple[slice, List[np.ndarray]]]
+    """
+    Split *q_vectors* into chunks of at most *size* points.
+
+    Yields *(points, q_chunk)* where *points* is the slice of the kernel
+    results which comes from *q_chunk*.  A :class:`sasmodels.kernel.QGrid`
+    is split into blocks of whole rows, skipping blocks whose pixels are
+    all masked.
+    """
+    if isinstance(q_vectors, QGrid):
+        x, y, index = q_vectors.x_bins, q_vectors.y_bins, q_vectors.index
+        nx, ny = len(x), len(y)
+        rows = max(1, size//nx)
+        start = 0
+        for row in range(0, ny, rows):
+            pixels = slice(row*nx, min(row+rows, ny)*nx)
+            chunk = QGrid(x, y[row:row+rows],
+                          None if index is None else index[pixels])
+            count = chunk.size if index is None else int(np.sum(chunk.index))
+            if count:
+                yield slice(start, start+count), chunk
+                start += count
+    else:
+        n = q_vectors[0].size
+        for start in range(0, n, size):
+            points = slice(start, min(start+size, n))
+            yield points, [v[points] for v in q_vectors]
+
+def _reuse_kernel(model, kernel, q_vectors):
+    # type: (KernelModel, Optional[Kernel], List[np.ndarray]) -> Kernel
+    """
+    Return *kernel* moved to *q_vectors*, or a new kernel for *q_vectors*
+    if *kernel* is None or cannot be moved.
+    """
+    if kernel is not None:
+        try:
+            kernel.update_q(q_vectors)
+            return kernel
+        except (NotImplementedError, ValueError):
+            kernel.release()
+    return model.make_kernel(q_vectors)
+
+class ChunkedKernel(object):
+    """
+    Evaluate *model* at *q_vectors* a chunk at a time.
+
+    The q values are split by :func:`q_chunks` so that the kernel input and
+    results for each chunk fit in *memory* bytes, which defaults to
+    :data:`STREAM_BUDGET`.  One kernel is created for the first chunk and
+    moved to the others with :meth:`sasmodels.kernel.Kernel.update_q`, so
+    its buffers are allocated once.  Kernels which cannot be moved, such
+    as those for pure python models, are rebuilt for each chunk.
+
+    Calling the object with the parameters returns the model values for
+    all the points, gathered into *out* if it is given, or into a new
+    vector.  :meth:`stream` yields the values for each chunk as it is
+    computed, for consumers which show progress or update a plot as they
+    go.  Call :meth:`release` when done.
+    """
+    def __init__(self, model, q_vectors, memory=None):
+        # type: (KernelModel, List[np.ndarray], Optional[int]) -> None
+        memory = STREAM_BUDGET if memory is None else memory
+        self.model = model
+        self.chunks = list(q_chunks(q_vectors, max(1, memory//STREAM_POINT_BYTES)))
+        #: total number of values returned
+        self.size = self.chunks[-1][0].stop if self.chunks else 0
+        self._kernel = None  # type: Optional[Kernel]
+        self._current = None  # type: Optional[int]
+
+    def stream(self, pars, cutoff=0., pd_mesh=None):
+        # type: (ParameterSet, float, Optional[PointList]) -> Iterator[Tuple[slice, np.ndarray]]
+        """
+        Yield *(points, Iq)* for each chunk, where *points* is the slice of
+        the full result filled by *Iq*.
+        """
+        for k, (points, q_chunk) in enumerate(self.chunks):
+            if self._current != k:
+                self._kernel = _reuse_kernel(self.model, self._kernel, q_chunk)
+                self._current = k
+            yield points, call_kernel(self._kernel, pars, cutoff=cutoff,
+                                      pd_mesh=pd_mesh)
+
+    def __call__(self, pars, cutoff=0., pd_mesh=None, out=None):
+        # type: (ParameterSet, float, Optional[PointList], Optional[np.ndarray]) -> np.ndarray
+        if out is None:
+            out = np.empty(self.size)
+        for points, Iq in self.stream(pars, cutoff=cutoff, pd_mesh=pd_mesh):
+            out[points] = Iq
+        return out
+
+    def release(self):
+        # type: () -> None
+        """
+        Release the kernel.
+        """
+        if self._kernel is not None:
+            self._kernel.release()
+        self._kernel = self._current = None
 
 
 class DataMixin(object):
@@ -215,7 +564,84 @@ class DataMixin(object):
     :meth:`_set_data` sets the intensity data in the data object,
     possibly with random noise added.  This is useful for simulating a
     dataset with the results from :meth:`_calc_theory`.
+
+    *pd_mesh* is the dispersity mesh representation passed to
+    :func:`call_kernel`, or None for the full mesh.
+
+    *q_tolerance* controls the evaluation of models on 2D data.  Models
+    whose 2D kernel calls *Iq* only depend on $|q|$, so they are evaluated
+    once for each distinct $|q|$ and the result is copied to the detector
+    pixels, as described in :class:`RadialQ`.  Oriented and magnetic
+    models are evaluated on half of a centrosymmetric set of pixels and
+    the result is mirrored to the other half, as described in
+    :class:`SymmetricQ`.  Models which define their own *Iqxy* need not be
+    radial or centrosymmetric, so they are evaluated at every pixel.  Use 0
+    for exact matches, a tolerance to combine $q$ values which are closer
+    than that, or None to evaluate every model at every pixel.  The full 2D
+    kernel is still used if the model has magnetic parameters with nonzero
+    magnetization.
+
+    The *accuracy* attribute of 2D data selects the resolution calculation.
+    'Low', 'Med', 'High' and 'Xhigh' oversample each pixel using
+    :class:`sasmodels.resolution2d.Pinhole2D`.  'Grid' evaluates the model
+    once per pixel and smears it by convolution using
+    :class:`sasmodels.resolution2d.GridPinhole2D`, which requires data on a
+    regular detector grid.  'Adaptive' oversamples each pixel only as much
+    as needed for its smeared value to settle to within
+    *resolution_tolerance*, or
+    :data:`sasmodels.resolution2d.ADAPTIVE_TOLERANCE` if that is not set.
+    The number of points at which the model was evaluated for the last
+    theory is kept in *evaluated_points*.
+
+    Pinhole2D keeps the oversampled $q$ values in memory only if they fit
+    in :data:`sasmodels.resolution2d.MEMORY_BUDGET` bytes.  Larger data
+    sets are evaluated and smeared in tiles, with the kernel moved from
+    tile to tile, so the budget also limits the size of the kernel inputs
+    and outputs.  Other $q$ values which need more than *stream_memory*
+    bytes of kernel input and results, such as the pixels of a very large
+    detector, are evaluated in chunks by :class:`ChunkedKernel` and
+    gathered into the full theory.  The default is :data:`STREAM_BUDGET`.
+
+    *resolution_cache* holds the resolution operators, which are shared
+    between data sets with the same q values, resolution and mask.  The
+    default is :data:`sasmodels.resolution_cache.RESOLUTION_OPERATORS`.
+    Set it to None to always build a new operator.  SESANS transforms are
+    shared between data sets with the same spin echo lengths, wavelengths
+    and acceptance in the same way.
+
+    If *sesans_direct* is True, SESANS data is computed directly in real
+    space from the *sesans* function of the model, if it has one, rather
+    than by transforming $I(q)$.  This is faster, but the instrument
+    acceptance is not applied, so it is only suitable when the acceptance
+    is large enough not to cut off the scattering.  The default is False.
+    See :class:`sasmodels.sesans.SesansDirect`.
+
+    *theory_cache* holds the recent model evaluations for SESANS data.
+    Data sets which share a transform also share its *q_calc*, so when they
+    are fitted together with the same model the model is evaluated once for
+    each set of parameter values rather than once for each data set.  The
+    default is :data:`SESANS_THEORY`.  Set it to None to always evaluate the
+    model.
+
+    *resolution_tolerance* is the target relative error for 1D pinhole and
+    slit smearing, and for adaptive 2D smearing.  If it is set, the points at which the model is
+    evaluated are chosen for that error by
+    :func:`sasmodels.resolution.pinhole_adaptive_q` or
+    :func:`sasmodels.resolution.slit_adaptive_q` rather than by extending
+    the data $q$.  If *resolution_probe* is also set to a dictionary of
+    parameter values, then the model is evaluated once at those values to
+    refine the points.  Use None for the default points.
     """
+    pd_mesh = None  # type: Optional[PointList]
+    q_tolerance = 0.0  # type: Optional[float]
+    resolution_cache = RESOLUTION_OPERATORS  # type: Optional[ResolutionCache]
+    theory_cache = SESANS_THEORY  # type: Optional[weights.WeightCache]
+    sesans_direct = False  # type: bool
+    resolution_tolerance = None  # type: Optional[float]
+    resolution_probe = None  # type: Optional[Dict[str, float]]
+    evaluated_points = 0  # type: int
+    stream_memory = STREAM_BUDGET  # type: int
+
     def _interpret_data(self, data, model):
         # type: (Data, KernelModel) -> None
         # pylint: disable=attribute-defined-outside-init
@@ -233,8 +659,14 @@ class DataMixin(object):
         else:
             self.data_type = 'Iq'
 
+        reduced_q = None
         if self.data_type == 'sesans':
-            res = _make_sesans_transform(data)
+            geometry = _sesans_geometry(data)
+            if self.sesans_direct and _has_sesans(model):
+                res = sesans.SesansDirect(geometry[0], geometry[1])
+            else:
+                res = self._cached(sesans.transform_key(*geometry),
+                                   lambda: sesans.SesansTransform(*geometry))
             index = slice(None, None)
             if data.y is not None:
                 Iq, dIq = data.y, data.dy
@@ -256,10 +688,53 @@ class DataMixin(object):
                 dIq = data.err_data[index]
             else:
                 Iq, dIq = None, None
-            res = resolution2d.Pinhole2D(data=data, index=index,
-                                         nsigma=3.0, accuracy=accuracy)
+            if accuracy.lower() == resolution2d.GRID_ACCURACY:
+                key = digest('GridPinhole2D', data.qx_data, data.qy_data,
+                             getattr(data, 'dqx_data', None),
+                             getattr(data, 'dqy_data', None),
+                             index, 3.0)
+                res = self._cached(key, lambda: resolution2d.GridPinhole2D(
+                    data=data, index=index, nsigma=3.0))
+            else:
+                tolerance = (self.resolution_tolerance
+                             if accuracy.lower() == resolution2d.ADAPTIVE_ACCURACY
+                             else None)
+                key = digest('Pinhole2D', data.qx_data, data.qy_data,
+                             getattr(data, 'dqx_data', None),
+                             getattr(data, 'dqy_data', None),
+                             index, 3.0, accuracy.lower(),
+                             resolution2d.MEMORY_BUDGET, tolerance)
+                res = self._cached(key, lambda: resolution2d.Pinhole2D(
+                    data=data, index=index, nsigma=3.0, accuracy=accuracy,
+                    tolerance=tolerance))
             #self._theory = np.zeros_like(self.Iq)
             q_vectors = res.q_calc
+            if self.q_tolerance is None or q_vectors is None:
+                pass
+            elif model_xy_mode(model.info) == 'qxy':
+                # Iqxy need not depend on |q| only, or be centrosymmetric.
+                pass
+            elif not model.info.parameters.has_2d:
+                # Form |q| from the axes of a grid rather than its pixels.
+                if isinstance(q_vectors, QGrid):
+                    qx, qy = q_vectors.x_bins[None, :], q_vectors.y_bins[:, None]
+                else:
+                    qx, qy = q_vectors
+                reduced_q = self._cached(
+                    digest(key, 'RadialQ', self.q_tolerance),
+                    lambda: RadialQ(qx, qy, tolerance=self.q_tolerance,
+                                    index=getattr(q_vectors, 'index', None)))
+            else:
+                # A grid stays a grid so the kernel only needs the axes.
+                reduced_q = self._cached(
+                    digest(key, 'SymmetricQ', self.q_tolerance),
+                    lambda: (SymmetricGrid(q_vectors, tolerance=self.q_tolerance)
+                             if isinstance(q_vectors, QGrid)
+                             else SymmetricQ(q_vectors[0], q_vectors[1],
+                                             tolerance=self.q_tolerance)))
+                # Not worth the gather step if few points are paired.
+                if reduced_q.reduction < 0.1:
+                    reduced_q = None
         elif self.data_type == 'Iq':
             index = (data.x >= data.qmin) & (data.x <= data.qmax)
             if data.y is not None:
@@ -268,17 +743,25 @@ class DataMixin(object):
                 dIq = data.dy[index]
             else:
                 Iq, dIq = None, None
+            tolerance = self.resolution_tolerance
+            probe, probe_key = self._resolution_probe(model)
             if getattr(data, 'dx', None) is not None:
                 q, dq = data.x[index], data.dx[index]
                 if (dq > 0).any():
-                    res = resolution.Pinhole1D(q, dq)
+                    res = self._cached(
+                        digest('Pinhole1D', q, dq, tolerance, probe_key),
+                        lambda: resolution.Pinhole1D(
+                            q, dq, tolerance=tolerance, probe=probe))
                 else:
                     res = resolution.Perfect1D(q)
             elif (getattr(data, 'dxl', None) is not None
                   and getattr(data, 'dxw', None) is not None):
-                res = resolution.Slit1D(data.x[index],
-                                        qx_width=data.dxl[index],
-                                        qy_width=data.dxw[index])
+                q, dxl, dxw = data.x[index], data.dxl[index], data.dxw[index]
+                res = self._cached(
+                    digest('Slit1D', q, dxl, dxw, tolerance, probe_key),
+                    lambda: resolution.Slit1D(
+                        q, qx_width=dxl, qy_width=dxw,
+                        tolerance=tolerance, probe=probe))
             else:
                 res = resolution.Perfect1D(data.x[index])
 
@@ -296,9 +779,10 @@ class DataMixin(object):
                     or getattr(data, 'dxw', None) is None):
                 raise ValueError("oriented sample with 1D data needs slit resolution")
 
-            res = resolution2d.Slit2D(data.x[index],
-                                      qx_width=data.dxw[index],
-                                      qy_width=data.dxl[index])
+            q, dxw, dxl = data.x[index], data.dxw[index], data.dxl[index]
+            res = self._cached(digest('Slit2D', q, dxw, dxl),
+                               lambda: resolution2d.Slit2D(
+                                   q, qx_width=dxw, qy_width=dxl))
             q_vectors = res.q_calc
         else:
             raise ValueError("Unknown data type") # never gets here
@@ -307,9 +791,42 @@ class DataMixin(object):
         # so we can save/restore state
         self._kernel_inputs = q_vectors
         self._kernel = None
+        self._reduced_q = reduced_q
+        self._reduced_kernel = None
         self.Iq, self.dIq, self.index = Iq, dIq, index
         self.resolution = res
 
+    def _resolution_probe(self, model):
+        # type: (KernelModel) -> Tuple[Optional[Callable[[np.ndarray], np.ndarray]], Optional[str]]
+        """
+        Return a function to evaluate *model* at *resolution_probe* for
+        choosing the resolution points, and a key identifying the probe,
+        or *(None, None)* if there is no probe.
+        """
+        pars = self.resolution_probe
+        if pars is None or self.resolution_tolerance is None:
+            return None, None
+        def probe(q):
+            # type: (np.ndarray) -> np.ndarray
+            kernel = model.make_kernel([q])
+            try:
+                return call_kernel(kernel, pars)
+            finally:
+                kernel.release()
+        items = [v for item in sorted(pars.items()) for v in item]
+        return probe, digest(model.info.id, *items)
+
+    def _cached(self, key, build):
+        # type: (str, Callable[[], Any]) -> Any
+        """
+        Return the resolution operator for *key* from the resolution cache,
+        calling *build()* to create it if needed.
+        """
+        with metrics.timer('resolution.setup'):
+            if self.resolution_cache is None:
+                return build()
+            return self.resolution_cache.lookup(key, build)
+
     def _set_data(self, Iq, noise=None):
         # type: (np.ndarray, Optional[float]) -> None
         # pylint: disable=attribute-defined-outside-init
@@ -341,16 +858,30 @@ class DataMixin(object):
 
     def _calc_theory(self, pars, cutoff=0.0):
         # type: (ParameterSet, float) -> np.ndarray
-        if self._kernel is None:
-            self._kernel = self._model.make_kernel(self._kernel_inputs)
-
-        Iq_calc = call_kernel(self._kernel, pars, cutoff=cutoff)
+        if self._kernel_inputs is None:
+            return self._calc_tiles(pars, cutoff=cutoff)
+        reduced_q = self._reduced_q
+        if reduced_q is not None and not _is_magnetic(self._model.info, pars):
+            if self._reduced_kernel is None:
+                q_calc = reduced_q.q_calc
+                self._reduced_kernel = self._model.make_kernel(
+                    q_calc if isinstance(q_calc, (list, QGrid)) else [q_calc])
+            Iq_calc = call_kernel(self._reduced_kernel, pars, cutoff=cutoff,
+                                  pd_mesh=self.pd_mesh)
+            self.evaluated_points = len(Iq_calc)
+            Iq_calc = reduced_q.expand(Iq_calc)
+        elif self.data_type == 'sesans' and self.theory_cache is not None:
+            Iq_calc = self._shared_theory(pars, cutoff)
+        else:
+            Iq_calc = self._call_kernel(pars, cutoff)
         # Storing the calculated Iq values so that they can be plotted.
         # Only applies to oriented USANS data for now.
         # TODO: extend plotting of calculate Iq to other measurement types
         # TODO: refactor so we don't store the result in the model
         self.Iq_calc = Iq_calc
-        result = self.resolution.apply(Iq_calc)
+        with metrics.timer('sesans' if self.data_type == 'sesans'
+                           else 'resolution'):
+            result = self.resolution.apply(Iq_calc)
         if hasattr(self.resolution, 'nx'):
             self.Iq_calc = (
                 self.resolution.qx_calc, self.resolution.qy_calc,
@@ -358,6 +889,67 @@ class DataMixin(object):
             )
         return result
 
+    def _call_kernel(self, pars, cutoff):
+        # type: (ParameterSet, float) -> np.ndarray
+        if self._kernel is None:
+            q_vectors = self._kernel_inputs
+            npoints = (q_vectors.size if isinstance(q_vectors, QGrid)
+                       else len(q_vectors[0]))
+            if isinstance(self.resolution, sesans.SesansDirect):
+                self._kernel = self._model.make_sesans_kernel(q_vectors[0])
+            elif npoints*STREAM_POINT_BYTES > self.stream_memory:
+                self._kernel = ChunkedKernel(self._model, q_vectors,
+                                             memory=self.stream_memory)
+            else:
+                self._kernel = self._model.make_kernel(q_vectors)
+        if isinstance(self._kernel, ChunkedKernel):
+            Iq_calc = self._kernel(pars, cutoff=cutoff, pd_mesh=self.pd_mesh)
+        else:
+            Iq_calc = call_kernel(self._kernel, pars, cutoff=cutoff,
+                                  pd_mesh=self.pd_mesh)
+        self.evaluated_points = len(Iq_calc)
+        return Iq_calc
+
+    def _shared_theory(self, pars, cutoff):
+        # type: (ParameterSet, float) -> np.ndarray
+        """
+        Return the theory at *q_calc* from *theory_cache*, evaluating the
+        model if no data set with the same transform has done so yet.
+        """
+        self.evaluated_points = 0
+        items = [v for item in sorted(pars.items()) for v in item]
+        # The entry holds the model and mesh so that their ids stay unique
+        # for as long as it is in the cache.
+        key = digest(self.resolution.key, id(self._model), id(self.pd_mesh),
+                     cutoff, *items)
+        entry = self.theory_cache.lookup(key, lambda: (
+            self._model, self.pd_mesh, self._call_kernel(pars, cutoff)))
+        return entry[2]
+
+    def _calc_tiles(self, pars, cutoff=0.0):
+        # type: (ParameterSet, float) -> np.ndarray
+        """
+        Evaluate and smear the theory through the resolution operator, for
+        operators which choose the points as they go or whose *q_calc* is
+        too large to keep.  The kernel is moved from one set of points to
+        the next if they fit in its buffers.
+        """
+        kernel = [None]  # type: List[Optional[Kernel]]
+        def evaluate(q_calc):
+            # type: (List[np.ndarray]) -> np.ndarray
+            kernel[0] = _reuse_kernel(self._model, kernel[0], q_calc)
+            return call_kernel(kernel[0], pars, cutoff=cutoff,
+                               pd_mesh=self.pd_mesh)
+        try:
+            with metrics.timer('resolution'):
+                result, self.evaluated_points = self.resolution.calculate(
+                    evaluate)
+        finally:
+            if kernel[0] is not None:
+                kernel[0].release()
+        self.Iq_calc = None
+        return result
+
 
 class DirectModel(DataMixin):
     """
@@ -368,17 +960,36 @@ class DirectModel(DataMixin):
     *model* is a model calculator return from :func:`generate.load_model`
 
     *cutoff* is the polydispersity weight cutoff.
+
+    *pd_mesh* selects the dispersity mesh representation, as described in
+    :func:`call_kernel`.
+
+    *q_tolerance* is the tolerance for combining $q$ values when evaluating
+    models on 2D data, as described in :class:`DataMixin`.
+
+    *resolution_tolerance* is the target relative error for choosing the
+    points for 1D resolution smearing, as described in :class:`DataMixin`.
+
+    *sesans_direct* is True to compute SESANS data in real space for models
+    with a *sesans* function, as described in :class:`DataMixin`.
     """
-    def __init__(self, data, model, cutoff=1e-5):
-        # type: (Data, KernelModel, float) -> None
+    def __init__(self, data, model, cutoff=1e-5, pd_mesh=None,
+                 q_tolerance=0.0, resolution_tolerance=None,
+                 sesans_direct=False):
+        # type: (Data, KernelModel, float, Optional[PointList], Optional[float], Optional[float], bool) -> None
         self.model = model
         self.cutoff = cutoff
+        self.pd_mesh = pd_mesh
+        self.q_tolerance = q_tolerance
+        self.resolution_tolerance = resolution_tolerance
+        self.sesans_direct = sesans_direct
         # Note: _interpret_data defines the model attributes
         self._interpret_data(data, model)
 
     def __call__(self, **pars):
         # type: (**float) -> np.ndarray
-        return self._calc_theory(pars, cutoff=self.cutoff)
+        with metrics.timer('theory', model=self._model.info.id):
+            return self._calc_theory(pars, cutoff=self.cutoff)
 
     def simulate_data(self, noise=None, **pars):
         # type: (Optional[float], **float) -> None
@@ -395,6 +1006,203 @@ class DirectModel(DataMixin):
         """
         return call_profile(self.model.info, **pars)
 
+def test_radial_q():
+    # type: () -> None
+    """
+    Check that evaluating at distinct |q| reproduces the values at each point.
+    """
+    qx, qy = np.meshgrid(np.linspace(-0.1, 0.1, 21), np.linspace(-0.1, 0.1, 21))
+    qx, qy = qx.flatten(), qy.flatten()
+    q = np.sqrt(qx**2 + qy**2)
+    fn = lambda q: np.exp(-(50*q)**2)
+
+    radial_q = RadialQ(qx, qy)
+    assert len(radial_q.q_calc) < len(q)//4
+    assert np.all(radial_q.expand(fn(radial_q.q_calc)) == fn(q))
+
+    radial_q = RadialQ(qx, qy, tolerance=0.05)
+    assert len(radial_q.q_calc) < 50
+    assert radial_q.q_calc[0] == 0. and radial_q.q_calc[-1] == q.max()
+    assert np.allclose(radial_q.expand(fn(radial_q.q_calc)), fn(q), atol=1e-2)
+
+def test_iqxy_not_radial():
+    # type: () -> None
+    """
+    Check that a model with its own Iqxy is evaluated at every pixel.
+    """
+    from .core import load_model, load_model_info
+    from .data import empty_data2D
+    assert model_xy_mode(load_model_info('sphere')) == 'qa'
+    assert model_xy_mode(load_model_info('_spherepy')) == 'qa'
+    assert model_xy_mode(load_model_info('cylinder')) == 'qac'
+    assert model_xy_mode(load_model_info('line')) == 'qxy'
+
+    data = empty_data2D(np.linspace(-0.1, 0.1, 11))
+    model = load_model('line')
+    pars = dict(intercept=1., slope=1.)
+    target = DirectModel(data, model, q_tolerance=None)(**pars)
+    calculator = DirectModel(data, model)
+    assert calculator._reduced_q is None
+    assert np.allclose(calculator(**pars), target, rtol=1e-12)
+
+def test_sesans_direct():
+    # type: () -> None
+    """
+    Check the real space SESANS kernels against the Hankel transform.
+    """
+    from .core import load_model
+
+    z = np.arange(10., 4001., 10.)
+    direct = sesans.SesansDirect(z, z)
+    transform = sesans.SesansTransform(z, z, np.full(len(z), 0.01),
+                                       (np.pi/2,), 1e7)
+    cases = [
+        ('sphere', dict(radius=500., sld=3., sld_solvent=1.)),
+        ('_spherepy', dict(radius=500., sld=3., sld_solvent=1.)),
+        ('core_shell_sphere', dict(radius=400., thickness=150., sld_core=1.,
+                                   sld_shell=4., sld_solvent=2.)),
+    ]
+    for name, pars in cases:
+        pars.update(background=0., radius_pd=0.1, radius_pd_n=10)
+        model = load_model(name, dtype='double', platform='dll')
+        kernel = model.make_sesans_kernel(direct.q_calc)
+        G = direct.apply(call_kernel(kernel, pars))
+        kernel = model.make_kernel([transform.q_calc])
+        target = transform.apply(call_kernel(kernel, pars))
+        assert np.max(abs(G - target)) < 1e-4*np.max(abs(target)), name
+
+    # The real space calculation ignores the acceptance, so it is opt-in.
+    import os
+    from .data import load_native
+    path = os.path.join(os.path.dirname(__file__), '..', 'example',
+                        'spheres2micron.ses')
+    data = load_native(path)
+    model = load_model('sphere', dtype='double', platform='dll')
+    assert isinstance(DirectModel(data, model).resolution,
+                      sesans.SesansTransform)
+    assert isinstance(DirectModel(data, model, sesans_direct=True).resolution,
+                      sesans.SesansDirect)
+
+def test_symmetric_q():
+    # type: () -> None
+    """
+    Check that mirroring the half detector reproduces the full detector.
+    """
+    qx, qy = np.meshgrid(np.linspace(-0.1, 0.1, 20), np.linspace(-0.1, 0.1, 21))
+    qx, qy = qx.flatten(), qy.flatten()
+    fn = lambda qx, qy: np.exp(-(30*qx)**2 - (80*qy)**2 - 1000*qx*qy)
+
+    symmetric_q = SymmetricQ(qx, qy)
+    assert len(symmetric_q.q_calc[0]) == len(qx)//2
+    assert (symmetric_q.q_calc[0] >= 0).all()
+    assert np.allclose(symmetric_q.expand(fn(*symmetric_q.q_calc)), fn(qx, qy),
+                       rtol=1e-8)
+
+    # An offset beam center only pairs pixels within the tolerance.
+    assert SymmetricQ(qx+1e-6, qy).reduction == 0.
+    assert SymmetricQ(qx+1e-6, qy, tolerance=1e-4).reduction == 0.5
+
+    # A masked grid keeps the upper rows, including the mirrors of selected
+    # pixels in the lower rows.
+    from .kernel import QGrid
+    x, y = np.linspace(-0.1, 0.1, 20), np.linspace(-0.1, 0.1, 21)
+    index = (fn(qx, qy) < 0.5) & (qx + 2*qy < 0.1)
+    symmetric_q = SymmetricGrid(QGrid(x, y, index), tolerance=0.)
+    q_calc = symmetric_q.q_calc
+    assert isinstance(q_calc, QGrid) and len(q_calc.y_bins) == 11
+    assert 0.25 < symmetric_q.reduction < 0.5
+    assert np.allclose(symmetric_q.expand(fn(*q_calc)),
+                       fn(qx[index], qy[index]), rtol=1e-8)
+    assert SymmetricGrid(QGrid(x+1e-6, y)).reduction == 0.
+    assert SymmetricGrid(QGrid(x+1e-6, y), tolerance=1e-4).reduction > 0.4
+
+def test_grid_q():
+    # type: () -> None
+    """
+    Check that kernels on a detector grid match the kernels on the pixels.
+    """
+    from .core import load_model
+    from .data import empty_data2D
+    from .kernel import QGrid
+
+    data = empty_data2D(np.linspace(-0.2, 0.2, 31), np.linspace(-0.1, 0.3, 20))
+    index = data.q_data > 0.05
+    grid = resolution2d.detector_q(data, index)
+    assert isinstance(grid, QGrid) and grid.size == len(data.qx_data)
+    assert (grid[0] == data.qx_data[index]).all()
+    assert (grid[1] == data.qy_data[index]).all()
+    # Mostly masked detectors are sent as pixels.
+    assert not isinstance(resolution2d.detector_q(data, data.q_data < 0.05),
+                          QGrid)
+
+    pars = dict(radius=20., length=200., theta=30., phi=20., theta_pd=10.,
+                theta_pd_n=5)
+    magnetic = dict(pars, **{'M0:sld': 1., 'up:frac_i': 0.3})
+    cases = [('cylinder', pars), ('cylinder', magnetic), ('_spherepy', pars)]
+    for name, p in cases:
+        model = load_model(name, dtype='double', platform='dll')
+        kernel = model.make_kernel(grid)
+        Iq_grid = call_kernel(kernel, p)
+        kernel = model.make_kernel([grid[0], grid[1]])
+        Iq_pixels = call_kernel(kernel, p)
+        assert len(Iq_grid) == np.sum(index), name
+        assert np.allclose(Iq_grid, Iq_pixels, rtol=1e-14, atol=0.), name
+    # The magnetic parameters select the magnetic cylinder kernel.
+    model = load_model('cylinder', dtype='double', platform='dll')
+    kernel = model.make_kernel(grid)
+    assert get_call_plan(kernel)(get_mesh(model.info, magnetic, dim='2d'))[2]
+    assert not np.allclose(call_kernel(kernel, magnetic),
+                           call_kernel(kernel, pars))
+
+    # The symmetry and |q| reductions keep the grid on a full detector.
+    data = empty_data2D(np.linspace(-0.2, 0.2, 30))
+    for name in ('cylinder', 'sphere'):
+        model = load_model(name, dtype='double', platform='dll')
+        target = DirectModel(data, model, q_tolerance=None)(**pars)
+        calculator = DirectModel(data, model)
+        assert isinstance(calculator._kernel_inputs, QGrid), name
+        assert calculator._reduced_q is not None, name
+        assert np.allclose(calculator(**pars), target, rtol=1e-12), name
+        assert calculator.evaluated_points <= data.qx_data.size//2, name
+        if name == 'cylinder':
+            assert isinstance(calculator._reduced_q.q_calc, QGrid)
+        else:
+            assert isinstance(calculator._reduced_q, RadialQ)
+
+def test_chunked_kernel():
+    # type: () -> None
+    """
+    Check that evaluating in chunks matches evaluating all points at once.
+    """
+    from .core import load_model
+    from .data import empty_data2D
+
+    data = empty_data2D(np.linspace(-0.2, 0.2, 41))
+    data.mask = data.q_data < 0.02
+    pars = dict(radius=20., length=200., theta=30., phi=20., theta_pd=10.,
+                theta_pd_n=5, volfraction=0.2)
+    for name in ('cylinder', '_spherepy', 'cylinder@hardsphere'):
+        model = load_model(name, dtype='double', platform='dll')
+        target = DirectModel(data, model, q_tolerance=None)
+        chunked = DirectModel(data, model, q_tolerance=None)
+        chunked.stream_memory = 100*STREAM_POINT_BYTES
+        Iq = chunked(**pars)
+        assert isinstance(chunked._kernel, ChunkedKernel), name
+        assert len(chunked._kernel.chunks) > 10, name
+        assert np.allclose(Iq, target(**pars), rtol=1e-14, atol=0.), name
+        # Same again, with the kernel moved back to the first chunk.
+        assert np.allclose(chunked(**pars), Iq, rtol=1e-14, atol=0.), name
+
+    q = np.logspace(-3, -1, 1000)
+    model = load_model('sphere', dtype='double', platform='dll')
+    stream = ChunkedKernel(model, [q], memory=150*STREAM_POINT_BYTES)
+    parts = list(stream.stream(dict(radius=200.)))
+    assert len(parts) == 7 and parts[-1][0] == slice(900, 1000)
+    kernel = model.make_kernel([q])
+    assert np.allclose(np.hstack([Iq for _, Iq in parts]),
+                       call_kernel(kernel, dict(radius=200.)),
+                       rtol=1e-14, atol=0.)
+
 def main():
     # type: () -> None
     """
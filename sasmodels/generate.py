@@ -23,6 +23,10 @@ Small angle scattering models are defined by a set of kernel functions:
     *form_volume(p1, p2, ...)* returns the volume of the form with particular
     dimension, or 1.0 if no volume normalization is required.
 
+    *sesans(z, p1, p2, ...)* returns the SESANS correlation function at
+    spin echo length z, which is the Hankel transform of *Iq*.  This is
+    optional, and is used for fitting SESANS data in real space.
+
     *ER(p1, p2, ...)* returns the effective radius of the form with
     particular dimensions.
 
@@ -182,7 +186,7 @@ from .custom import load_custom_kernel_module
 
 # pylint: disable=unused-import
 try:
-    from typing import Tuple, Sequence, Iterator, Dict
+    from typing import Tuple, Sequence, Iterator, Dict, List, Optional
     from .modelinfo import ModelInfo
 except ImportError:
     pass
@@ -600,11 +604,24 @@ def kernel_name(model_info, variant):
     """
     Name of the exported kernel symbol.
 
-    *variant* is "Iq", "Iqxy" or "Imagnetic".
+    *variant* is "Iq", "Iqxy", "Imagnetic" or "sesans".
     """
     return model_info.name + "_" + variant
 
 
+def kernel_variants(model_info):
+    # type: (ModelInfo) -> List[str]
+    """
+    Variants of the kernel generated for the model, as used in
+    :func:`kernel_name`.  The "sesans" kernel is only generated if the
+    model defines *sesans* in C.
+    """
+    variants = ["Iq", "Iqxy", "Imagnetic"]
+    if isinstance(model_info.sesans, str):
+        variants.append("sesans")
+    return variants
+
+
 def indent(s, depth):
     # type: (str, int) -> str
     """
@@ -698,6 +715,35 @@ def find_xy_mode(source):
     return 'qa'
 
 
+def model_xy_mode(model_info):
+    # type: (ModelInfo) -> str
+    """
+    Return the function used by the 2D kernel of the model: qa if it calls
+    *Iq* at $|q|$, qac or qabc for oriented shapes, or qxy if the model
+    defines *Iqxy*.  Compositions are qxy if any part is, and qa only if
+    all parts are.
+    """
+    if model_info.composition is not None:
+        modes = [model_xy_mode(part) for part in model_info.composition[1]]
+        return ('qxy' if 'qxy' in modes
+                else 'qa' if all(mode == 'qa' for mode in modes)
+                else [mode for mode in modes if mode != 'qa'][0])
+    Iqxy = model_info.Iqxy
+    if callable(model_info.Iq):
+        # kernelpy replaces a missing Iqxy with one which calls Iq(|q|)
+        return 'qa' if Iqxy is None or getattr(Iqxy, 'radial', False) else 'qxy'
+    if isinstance(Iqxy, str):
+        return 'qxy'
+    if isinstance(model_info.Iqabc, str):
+        return 'qabc'
+    if isinstance(model_info.Iqac, str):
+        return 'qac'
+    source = [open(f).read() for f in model_sources(model_info)]
+    if model_info.c_code:
+        source.append(model_info.c_code)
+    return find_xy_mode(source)
+
+
 def _add_source(source, code, path, lineno=1):
     """
     Add a file to the list of source code chunks, tagged with path and line.
@@ -706,13 +752,16 @@ def _add_source(source, code, path, lineno=1):
     source.append('#line %d "%s"' % (lineno, path))
     source.append(code)
 
-def make_source(model_info):
-    # type: (ModelInfo) -> Dict[str, str]
+def make_source(model_info, tolerance=None):
+    # type: (ModelInfo, Optional[float]) -> Dict[str, str]
     """
     Generate the OpenCL/ctypes kernel from the module info.
 
     Uses source files found in the given search path.  Returns None if this
     is a pure python model, with no C source components.
+
+    If *tolerance* is given, it replaces the default AG_TOLERANCE for the
+    adaptive orientation averages.
     """
     if callable(model_info.Iq):
         raise ValueError("can't compile python model")
@@ -737,6 +786,8 @@ def make_source(model_info):
     # Build initial sources
     source = []
     _add_source(source, *kernel_header)
+    if tolerance is not None:
+        source.append("#define AG_TOLERANCE %r" % float(tolerance))
     for path, code in user_code:
         _add_source(source, code, path)
 
@@ -745,8 +796,8 @@ def make_source(model_info):
                     lineno=model_info.lineno.get('c_code', 1))
 
     # Make parameters for q, qx, qy so that we can use them in declarations
-    q, qx, qy, qab, qa, qb, qc \
-        = [Parameter(name=v) for v in 'q qx qy qab qa qb qc'.split()]
+    q, qx, qy, qab, qa, qb, qc, z \
+        = [Parameter(name=v) for v in 'q qx qy qab qa qb qc z'.split()]
     # Generate form_volume function, etc. from body only
     if isinstance(model_info.form_volume, str):
         pars = partable.form_volume_parameters
@@ -763,6 +814,9 @@ def make_source(model_info):
     if isinstance(model_info.Iqabc, str):
         pars = [qa, qb, qc] + partable.iq_parameters
         source.append(_gen_fn(model_info, 'Iqabc', pars))
+    if isinstance(model_info.sesans, str):
+        pars = [z] + partable.iq_parameters
+        source.append(_gen_fn(model_info, 'sesans', pars))
 
     # What kind of 2D model do we need?  Is it consistent with the parameters?
     xy_mode = find_xy_mode(source)
@@ -800,6 +854,11 @@ def make_source(model_info):
     model_refs = _call_pars("_v.", partable.iq_parameters)
     pars = ",".join(["_q"] + model_refs)
     call_iq = "#define CALL_IQ(_q, _v) Iq(%s)" % pars
+    # The real space SESANS kernel is the 1D kernel with sesans for Iq.
+    if isinstance(model_info.sesans, str):
+        call_sesans = "#define CALL_IQ(_q, _v) sesans(%s)" % pars
+    else:
+        call_sesans = None
     if xy_mode == 'qabc':
         pars = ",".join(["_qa", "_qb", "_qc"] + model_refs)
         call_iqxy = "#define CALL_IQ_ABC(_qa,_qb,_qc,_v) Iqabc(%s)" % pars
@@ -838,18 +897,20 @@ def make_source(model_info):
 
     # TODO: allow mixed python/opencl kernels?
 
-    ocl = _kernels(kernel_code, call_iq, call_iqxy, clear_iqxy, model_info.name)
-    dll = _kernels(kernel_code, call_iq, call_iqxy, clear_iqxy, model_info.name)
+    ocl = _kernels(kernel_code, call_iq, call_iqxy, clear_iqxy,
+                   model_info.name, call_sesans)
+    dll = _kernels(kernel_code, call_iq, call_iqxy, clear_iqxy,
+                   model_info.name, call_sesans)
     result = {
-        'dll': '\n'.join(source+dll[0]+dll[1]+dll[2]),
-        'opencl': '\n'.join(source+ocl[0]+ocl[1]+ocl[2]),
+        'dll': '\n'.join(source+sum(dll, [])),
+        'opencl': '\n'.join(source+sum(ocl, [])),
     }
 
     return result
 
 
-def _kernels(kernel, call_iq, call_iqxy, clear_iqxy, name):
-    # type: ([str,str], str, str, str) -> List[str]
+def _kernels(kernel, call_iq, call_iqxy, clear_iqxy, name, call_sesans=None):
+    # type: ([str,str], str, str, str, str, Optional[str]) -> List[List[str]]
     code = kernel[0]
     path = kernel[1].replace('\\', '\\\\')
     iq = [
@@ -884,7 +945,20 @@ def _kernels(kernel, call_iq, call_iqxy, clear_iqxy, name):
         "#undef KERNEL_NAME",
     ]
 
-    return iq, iqxy, imagnetic
+    if call_sesans is None:
+        return [iq, iqxy, imagnetic]
+
+    sesans = [
+        # define the real space SESANS kernel
+        "#define KERNEL_NAME %s_sesans" % name,
+        call_sesans,
+        '#line 1 "%s sesans"' % path,
+        code,
+        "#undef CALL_IQ",
+        "#undef KERNEL_NAME",
+    ]
+
+    return [iq, iqxy, imagnetic, sesans]
 
 
 def load_kernel_module(model_name):
@@ -7,21 +7,97 @@ In particular, each model should provide a :meth:`KernelModel.make_kernel`
 call which returns an executable kernel, :class:`Kernel`, that operates
 on the given set of *q_vector* inputs.  On completion of the computation,
 the kernel should be released, which also releases the inputs.
+
+For data on a regular detector grid, the *q_vectors* can be a
+:class:`QGrid` rather than a list of $q_x$, $q_y$ pixel values.
 """
 
 from __future__ import division, print_function
 
+import numpy as np  # type: ignore
+
 # pylint: disable=unused-import
 try:
-    from typing import List
+    from typing import List, Optional, Tuple
 except ImportError:
     pass
 else:
-    import numpy as np
-    from .details import CallDetails
+    from .details import CallDetails, CallPlan
     from .modelinfo import ModelInfo
 # pylint: enable=unused-import
 
+class QGrid(object):
+    """
+    Detector pixels on a regular grid, for use as the *q_vectors* argument
+    to :meth:`KernelModel.make_kernel`.
+
+    *x_bins* are the $q_x$ values along a detector row and *y_bins* are the
+    $q_y$ values of the rows, so that pixel *k = j*len(x_bins) + i* is at
+    $(q_x, q_y)$ = *(x_bins[i], y_bins[j])*, the order used by
+    :func:`sasmodels.data.empty_data2D`.  *index* is a boolean mask
+    selecting the pixels for which the kernel returns values, or None for
+    all of them.
+
+    The kernels receive the two axes and form the pixel values as they go,
+    so the $q$ input is *nx + ny* values rather than *2 nx ny*.  All pixels
+    are evaluated, with the masked ones dropped from the result.  The object
+    also acts as the usual *[qx, qy]* list of selected pixel values, which
+    are expanded when requested.
+    """
+    def __init__(self, x_bins, y_bins, index=None):
+        # type: (np.ndarray, np.ndarray, Optional[np.ndarray]) -> None
+        self.x_bins = np.asarray(x_bins)
+        self.y_bins = np.asarray(y_bins)
+        self.index = None if index is None else np.asarray(index, 'bool')
+        #: number of pixels in the grid, including masked pixels
+        self.size = len(self.x_bins)*len(self.y_bins)
+
+    def __len__(self):
+        # type: () -> int
+        return 2
+
+    def __getitem__(self, k):
+        # type: (int) -> np.ndarray
+        if k in (0, -2):
+            values = np.tile(self.x_bins, len(self.y_bins))
+        elif k in (1, -1):
+            values = np.repeat(self.y_bins, len(self.x_bins))
+        else:
+            raise IndexError("QGrid index out of range")
+        return values if self.index is None else values[self.index]
+
+    def __iter__(self):
+        return iter((self[0], self[1]))
+
+def fill_q_input(q, q_vectors, capacity):
+    # type: (np.ndarray, List[np.ndarray], int) -> Tuple[int, int, Optional[np.ndarray]]
+    """
+    Copy *q_vectors* to the start of the kernel input buffer *q*, which has
+    results for at most *capacity* points.
+
+    For *[q]* the buffer is a vector, for *[qx, qy]* it has a row for each
+    point, and for a :class:`QGrid` it is a vector holding the $q_x$ axis
+    followed by the $q_y$ axis.  Returns the number of points to evaluate,
+    the grid row length (0 if not a grid) and the grid pixel mask.  Raises
+    ValueError if the values do not fit in the buffer.
+    """
+    if isinstance(q_vectors, QGrid):
+        nx, ny = len(q_vectors.x_bins), len(q_vectors.y_bins)
+        if q.ndim != 1 or nx + ny > len(q) or q_vectors.size > capacity:
+            raise ValueError("q grid does not fit in the kernel input")
+        q[:nx] = q_vectors.x_bins
+        q[nx:nx+ny] = q_vectors.y_bins
+        return q_vectors.size, nx, q_vectors.index
+    nq = q_vectors[0].size
+    if q.ndim != len(q_vectors) or nq > min(len(q), capacity):
+        raise ValueError("q values do not fit in the kernel input")
+    if q.ndim == 2:
+        q[:nq, 0] = q_vectors[0]
+        q[:nq, 1] = q_vectors[1]
+    else:
+        q[:nq] = q_vectors[0]
+    return nq, 0, None
+
 class KernelModel(object):
     info = None  # type: ModelInfo
     dtype = None # type: np.dtype
@@ -29,6 +105,14 @@ class KernelModel(object):
         # type: (List[np.ndarray]) -> "Kernel"
         raise NotImplementedError("need to implement make_kernel")
 
+    def make_sesans_kernel(self, z):
+        # type: (np.ndarray) -> "Kernel"
+        """
+        Return a kernel which computes the SESANS correlation function at
+        spin echo lengths *z* using the model *sesans* function.
+        """
+        raise NotImplementedError("no SESANS kernel for %s" % self.info.id)
+
     def release(self):
         # type: () -> None
         pass
@@ -39,11 +123,25 @@ class Kernel(object):
     info = None  # type: ModelInfo
     results = None # type: List[np.ndarray]
     dtype = None  # type: np.dtype
+    #: reusable kernel arguments, from :func:`sasmodels.details.get_call_plan`
+    call_plan = None  # type: CallPlan
 
     def __call__(self, call_details, values, cutoff, magnetic):
         # type: (CallDetails, np.ndarray, np.ndarray, float, bool) -> np.ndarray
         raise NotImplementedError("need to implement __call__")
 
+    def update_q(self, q_vectors):
+        # type: (List[np.ndarray]) -> None
+        """
+        Evaluate the kernel at *q_vectors* from now on, reusing its input
+        and result buffers.  The new vectors must be of the same kind as
+        those used to create the kernel, with no more points.
+
+        Raises NotImplementedError if the kernel cannot be reused, or
+        ValueError if the new vectors do not fit.
+        """
+        raise NotImplementedError("kernel cannot be reused for new q values")
+
     def release(self):
         # type: () -> None
         pass
@@ -50,6 +50,7 @@ typedef struct {
     int32_t num_weights;        // total length of the weights vector
     int32_t num_active;         // number of non-trivial pd loops
     int32_t theta_par;          // id of first orientation variable
+    int32_t point_list;         // true if the mesh is a list of points
 } ProblemDetails;
 
 // Intel HD 4000 needs private arrays to be a multiple of 4 long
@@ -269,7 +270,10 @@ void KERNEL_NAME(
     global const double *values,
     global const double *q, // nq q values, with padding to boundary
     global double *result,  // nq+1 return values, again with padding
-    const double cutoff     // cutoff in the dispersity weight product
+    const double cutoff,    // cutoff in the dispersity weight product
+    const int32_t grid_nx   // for 2D, 0 if q holds (qx, qy) pairs, or the
+                            // number of qx values if q holds the qx values
+                            // followed by the qy values of a detector grid
     )
 {
 #ifdef USE_OPENCL
@@ -418,6 +422,12 @@ After expansion, the loop struction will look like the following:
   }
   i4 = 0; // reset loop counter even though no more rounds through the loop
 
+If point_list is set in the problem details then the mesh is given as a list
+of points rather than as a tensor product.  Level 0 steps through the points,
+with the combined weight for each point stored in w0, and the remaining
+active levels have length 1 and weight 1.0.  The values for the remaining
+active levels are stored in v1, v2, ... with one value per point, and are
+fetched by PD_FETCH after PD_OPEN(0,1) has selected the point.
 */
 
 
@@ -429,6 +439,15 @@ After expansion, the loop struction will look like the following:
 // is easier to read. The code below both declares variables for the
 // inner loop and defines the macros that use them.
 
+// 2D data is either (qx, qy) pairs or the axes of a detector grid, with
+// point q_index at qx[q_index % nx], qy[q_index / nx].
+#define FETCH_QXY() do { \
+    if (grid_nx > 0) { \
+      qx = q[q_index % grid_nx]; qy = q[grid_nx + q_index / grid_nx]; \
+    } else { \
+      qx = q[2*q_index]; qy = q[2*q_index+1]; \
+    } } while (0)
+
 #if defined(CALL_IQ)
   // unoriented 1D
   double qk;
@@ -440,7 +459,7 @@ After expansion, the loop struction will look like the following:
 #elif defined(CALL_IQ_A)
   // unoriented 2D
   double qx, qy;
-  #define FETCH_Q() do { qx = q[2*q_index]; qy = q[2*q_index+1]; } while (0)
+  #define FETCH_Q() FETCH_QXY()
   #define BUILD_ROTATION() do {} while(0)
   #define APPLY_ROTATION() do {} while(0)
   #define CALL_KERNEL() CALL_IQ_A(sqrt(qx*qx+qy*qy), local_values.table)
@@ -448,7 +467,7 @@ After expansion, the loop struction will look like the following:
 #elif defined(CALL_IQ_AC)
   // oriented symmetric 2D
   double qx, qy;
-  #define FETCH_Q() do { qx = q[2*q_index]; qy = q[2*q_index+1]; } while (0)
+  #define FETCH_Q() FETCH_QXY()
   double qa, qc;
   QACRotation rotation;
   // theta, phi, dtheta, dphi are defined below in projection to avoid repeated code.
@@ -459,7 +478,7 @@ After expansion, the loop struction will look like the following:
 #elif defined(CALL_IQ_ABC)
   // oriented asymmetric 2D
   double qx, qy;
-  #define FETCH_Q() do { qx = q[2*q_index]; qy = q[2*q_index+1]; } while (0)
+  #define FETCH_Q() FETCH_QXY()
   double qa, qb, qc;
   QABCRotation rotation;
   // theta, phi, dtheta, dphi are defined below in projection to avoid repeated code.
@@ -472,7 +491,7 @@ After expansion, the loop struction will look like the following:
 #elif defined(CALL_IQ_XY)
   // direct call to qx,qy calculator
   double qx, qy;
-  #define FETCH_Q() do { qx = q[2*q_index]; qy = q[2*q_index+1]; } while (0)
+  #define FETCH_Q() FETCH_QXY()
   #define BUILD_ROTATION() do {} while(0)
   #define APPLY_ROTATION() do {} while(0)
   #define CALL_KERNEL() CALL_IQ_XY(qx, qy, local_values.table)
@@ -559,6 +578,10 @@ After expansion, the loop struction will look like the following:
     local_values.vector[p##_LOOP] = v##_LOOP[i##_LOOP]; \
     const double weight##_LOOP = w##_LOOP[i##_LOOP] * weight##_OUTER;
 
+// Fetch the value for an active level from the point list
+#define PD_FETCH(_LOOP) \
+  if (_LOOP < details->num_active) local_values.vector[p##_LOOP] = v##_LOOP[i0];
+
 // create the variable "weight#=1.0" where # is the outermost level+1 (=MAX_PD).
 #define _PD_OUTERMOST_WEIGHT(_n) const double weight##_n = 1.0;
 #define PD_OUTERMOST_WEIGHT(_n) _PD_OUTERMOST_WEIGHT(_n)
@@ -619,6 +642,20 @@ PD_OUTERMOST_WEIGHT(MAX_PD)
 #if MAX_PD>0
   PD_OPEN(0,1)
 #endif
+#if MAX_PD>1
+  if (details->point_list) {
+    PD_FETCH(1)
+    #if MAX_PD>2
+      PD_FETCH(2)
+    #endif
+    #if MAX_PD>3
+      PD_FETCH(3)
+    #endif
+    #if MAX_PD>4
+      PD_FETCH(4)
+    #endif
+  }
+#endif
 
 //if (q_index==0) {printf("step:%d of %d, pars:",step,pd_stop); for (int i=0; i < NUM_PARS; i++) printf("p%d=%g ",i, local_values.vector[i]); printf("\n");}
 
@@ -722,8 +759,10 @@ PD_OUTERMOST_WEIGHT(MAX_PD)
 // ** clear the macros in preparation for the next kernel **
 #undef PD_INIT
 #undef PD_OPEN
+#undef PD_FETCH
 #undef PD_CLOSE
 #undef FETCH_Q
+#undef FETCH_QXY
 #undef APPLY_PROJECTION
 #undef BUILD_ROTATION
 #undef APPLY_ROTATION
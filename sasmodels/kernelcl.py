@@ -71,7 +71,8 @@ from pyopencl import mem_flags as mf
 from pyopencl.characterize import get_fast_inaccurate_build_options
 
 from . import generate
-from .kernel import KernelModel, Kernel
+from . import metrics
+from .kernel import KernelModel, Kernel, QGrid, fill_q_input
 
 # pylint: disable=unused-import
 try:
@@ -305,9 +306,12 @@ class GpuEnvironment(object):
             context = self.get_context(dtype)
             logging.info("building %s for OpenCL %s", key,
                          context.devices[0].name.strip())
-            program = compile_model(self.get_context(dtype),
-                                    str(source), dtype, fast)
+            with metrics.timer('compile.opencl', model=name):
+                program = compile_model(self.get_context(dtype),
+                                        str(source), dtype, fast)
             self.compiled[key] = (program, timestamp)
+        else:
+            metrics.count('compile.opencl.cached')
         return program
 
 def _get_default_context():
@@ -402,6 +406,24 @@ class GpuModel(KernelModel):
 
     def make_kernel(self, q_vectors):
         # type: (List[np.ndarray]) -> "GpuKernel"
+        self._prepare_program()
+        is_2d = len(q_vectors) == 2
+        if is_2d:
+            kernel = [self._kernels['Iqxy'], self._kernels['Imagnetic']]
+        else:
+            kernel = [self._kernels['Iq']]*2
+        return GpuKernel(kernel, self.dtype, self.info, q_vectors)
+
+    def make_sesans_kernel(self, z):
+        # type: (np.ndarray) -> "GpuKernel"
+        self._prepare_program()
+        if 'sesans' not in self._kernels:
+            raise NotImplementedError("no SESANS kernel for %s" % self.info.id)
+        kernel = [self._kernels['sesans']]*2
+        return GpuKernel(kernel, self.dtype, self.info, [z])
+
+    def _prepare_program(self):
+        # type: () -> None
         if self.program is None:
             compile_program = environment().compile_program
             timestamp = generate.ocl_timestamp(self.info)
@@ -411,16 +433,10 @@ class GpuModel(KernelModel):
                 self.dtype,
                 self.fast,
                 timestamp)
-            variants = ['Iq', 'Iqxy', 'Imagnetic']
+            variants = generate.kernel_variants(self.info)
             names = [generate.kernel_name(self.info, k) for k in variants]
             kernels = [getattr(self.program, k) for k in names]
             self._kernels = dict((k, v) for k, v in zip(variants, kernels))
-        is_2d = len(q_vectors) == 2
-        if is_2d:
-            kernel = [self._kernels['Iqxy'], self._kernels['Imagnetic']]
-        else:
-            kernel = [self._kernels['Iq']]*2
-        return GpuKernel(kernel, self.dtype, self.info, q_vectors)
 
     def release(self):
         # type: () -> None
@@ -445,6 +461,14 @@ class GpuInput(object):
     stretching the array to better match the memory architecture.  Additional
     points will be evaluated with *q=1e-3*.
 
+    If *q_vectors* is a :class:`sasmodels.kernel.QGrid`, then only the $q_x$
+    and $q_y$ axes are sent to the device, with *grid_nx* giving the number
+    of $q_x$ values, and *nq* counts every pixel on the grid.  The kernel
+    result is reduced to the selected pixels using :meth:`select`.
+
+    Use :meth:`update` to reuse the buffer for a different set of points
+    of the same kind, which is no larger than the original.
+
     *dtype* is the data type for the q vectors. The data type should be
     set to match that of the kernel, which is an attribute of
     :class:`GpuProgram`.  Note that not all kernels support double
@@ -458,29 +482,65 @@ class GpuInput(object):
         # type: (List[np.ndarray], np.dtype) -> None
         # TODO: do we ever need double precision q?
         env = environment()
-        self.nq = q_vectors[0].size
         self.dtype = np.dtype(dtype)
         self.is_2d = (len(q_vectors) == 2)
+        self.is_grid = isinstance(q_vectors, QGrid)
         # TODO: stretch input based on get_warp()
         # not doing it now since warp depends on kernel, which is not known
         # at this point, so instead using 32, which is good on the set of
         # architectures tested so far.
-        if self.is_2d:
-            # Note: 16 rather than 15 because result is 1 longer than input.
-            width = ((self.nq+16)//16)*16
-            self.q = np.empty((width, 2), dtype=dtype)
-            self.q[:self.nq, 0] = q_vectors[0]
-            self.q[:self.nq, 1] = q_vectors[1]
+        if self.is_grid:
+            size = len(q_vectors.x_bins) + len(q_vectors.y_bins)
+            self.capacity = q_vectors.size
+            self.q = np.zeros(size, dtype=dtype)
+        elif self.is_2d:
+            self.capacity = q_vectors[0].size
+            self.q = np.empty((self._width(self.capacity), 2), dtype=dtype)
         else:
-            # Note: 32 rather than 31 because result is 1 longer than input.
-            width = ((self.nq+32)//32)*32
-            self.q = np.empty(width, dtype=dtype)
-            self.q[:self.nq] = q_vectors[0]
-        self.global_size = [self.q.shape[0]]
+            self.capacity = q_vectors[0].size
+            self.q = np.empty(self._width(self.capacity), dtype=dtype)
+        self.nq, self.grid_nx, self.index = fill_q_input(
+            self.q, q_vectors, self.capacity)
+        self.global_size = [self._width(self.nq)]
+        self.max_size = self.global_size[0]
         context = env.get_context(self.dtype)
         #print("creating inputs of size", self.global_size)
-        self.q_b = cl.Buffer(context, mf.READ_ONLY | mf.COPY_HOST_PTR,
-                             hostbuf=self.q)
+        metrics.count('bytes.to_device', self.q.nbytes)
+        with metrics.timer('transfer.opencl'):
+            self.q_b = cl.Buffer(context, mf.READ_ONLY | mf.COPY_HOST_PTR,
+                                 hostbuf=self.q)
+
+    def _width(self, nq):
+        # type: (int) -> int
+        """Padded number of work items for *nq* points."""
+        # Note: nq+step rather than nq+step-1 because result is 1 longer
+        # than input.
+        step = 16 if self.is_2d else 32
+        return ((nq+step)//step)*step
+
+    def update(self, q_vectors):
+        # type: (List[np.ndarray]) -> None
+        """
+        Replace the q values with *q_vectors*, raising ValueError if they
+        do not fit in the buffers.
+        """
+        if ((len(q_vectors) == 2) != self.is_2d
+                or isinstance(q_vectors, QGrid) != self.is_grid):
+            raise ValueError("q values differ in kind from the kernel input")
+        self.nq, self.grid_nx, self.index = fill_q_input(
+            self.q, q_vectors, self.capacity)
+        self.global_size = [self._width(self.nq)]
+        queue = environment().get_queue(self.dtype)
+        metrics.count('bytes.to_device', self.q.nbytes)
+        with metrics.timer('transfer.opencl'):
+            cl.enqueue_copy(queue, self.q_b, self.q)
+
+    def select(self, result):
+        # type: (np.ndarray) -> np.ndarray
+        """
+        Return the values in *result* for the selected grid pixels.
+        """
+        return result if self.index is None else result[self.index]
 
     def release(self):
         # type: () -> None
@@ -523,7 +583,7 @@ class GpuKernel(Kernel):
         self.dtype = dtype
         self.dim = '2d' if q_input.is_2d else '1d'
         # plus three for the normalization values
-        self.result = np.empty(q_input.nq+1, dtype)
+        self.result = np.empty(q_input.capacity+1, dtype)
 
         # Inputs and outputs for each kernel call
         # Note: res may be shorter than res_b if global_size != nq
@@ -531,7 +591,7 @@ class GpuKernel(Kernel):
         self.queue = env.get_queue(dtype)
 
         self.result_b = cl.Buffer(self.queue.context, mf.READ_WRITE,
-                                  q_input.global_size[0] * dtype.itemsize)
+                                  q_input.max_size * dtype.itemsize)
         self.q_input = q_input # allocated by GpuInput above
 
         self._need_release = [self.result_b, self.q_input]
@@ -544,37 +604,47 @@ class GpuKernel(Kernel):
         # type: (CallDetails, np.ndarray, np.ndarray, float, bool) -> np.ndarray
         context = self.queue.context
         # Arrange data transfer to card
-        details_b = cl.Buffer(context, mf.READ_ONLY | mf.COPY_HOST_PTR,
-                              hostbuf=call_details.buffer)
-        values_b = cl.Buffer(context, mf.READ_ONLY | mf.COPY_HOST_PTR,
-                             hostbuf=values)
+        metrics.count('bytes.to_device',
+                      call_details.buffer.nbytes + values.nbytes)
+        with metrics.timer('transfer.opencl'):
+            details_b = cl.Buffer(context, mf.READ_ONLY | mf.COPY_HOST_PTR,
+                                  hostbuf=call_details.buffer)
+            values_b = cl.Buffer(context, mf.READ_ONLY | mf.COPY_HOST_PTR,
+                                 hostbuf=values)
 
         kernel = self.kernel[1 if magnetic else 0]
         args = [
             np.uint32(self.q_input.nq), None, None,
             details_b, values_b, self.q_input.q_b, self.result_b,
-            self.real(cutoff),
+            self.real(cutoff), np.int32(self.q_input.grid_nx),
         ]
         #print("Calling OpenCL")
         #call_details.show(values)
         # Call kernel and retrieve results
-        wait_for = None
-        last_nap = time.clock()
-        step = 1000000//self.q_input.nq + 1
-        for start in range(0, call_details.num_eval, step):
-            stop = min(start + step, call_details.num_eval)
-            #print("queuing",start,stop)
-            args[1:3] = [np.int32(start), np.int32(stop)]
-            wait_for = [kernel(self.queue, self.q_input.global_size, None,
-                               *args, wait_for=wait_for)]
-            if stop < call_details.num_eval:
-                # Allow other processes to run
-                wait_for[0].wait()
-                current_time = time.clock()
-                if current_time - last_nap > 0.5:
-                    time.sleep(0.05)
-                    last_nap = current_time
-        cl.enqueue_copy(self.queue, self.result, self.result_b)
+        metrics.count('kernel.calls')
+        metrics.count('kernel.q_points', self.q_input.nq)
+        metrics.count('mesh.points', call_details.num_eval)
+        metrics.count('bytes.from_device', self.result.nbytes)
+        # The kernels run asynchronously, so the time includes the copy of
+        # the result from the device, which waits for them to finish.
+        with metrics.timer('kernel.opencl', model=self.info.id):
+            wait_for = None
+            last_nap = time.clock()
+            step = 1000000//self.q_input.nq + 1
+            for start in range(0, call_details.num_eval, step):
+                stop = min(start + step, call_details.num_eval)
+                #print("queuing",start,stop)
+                args[1:3] = [np.int32(start), np.int32(stop)]
+                wait_for = [kernel(self.queue, self.q_input.global_size, None,
+                                   *args, wait_for=wait_for)]
+                if stop < call_details.num_eval:
+                    # Allow other processes to run
+                    wait_for[0].wait()
+                    current_time = time.clock()
+                    if current_time - last_nap > 0.5:
+                        time.sleep(0.05)
+                        last_nap = current_time
+            cl.enqueue_copy(self.queue, self.result, self.result_b)
         #print("result", self.result)
 
         # Free buffers
@@ -586,8 +656,12 @@ class GpuKernel(Kernel):
         scale = values[0]/(pd_norm if pd_norm != 0.0 else 1.0)
         background = values[1]
         #print("scale",scale,values[0],self.result[self.q_input.nq],background)
-        return scale*self.result[:self.q_input.nq] + background
-        # return self.result[:self.q_input.nq]
+        return self.q_input.select(scale*self.result[:self.q_input.nq]
+                                   + background)
+
+    def update_q(self, q_vectors):
+        # type: (List[np.ndarray]) -> None
+        self.q_input.update(q_vectors)
 
     def release(self):
         # type: () -> None
@@ -62,6 +62,16 @@ and the name of the output file and returns a compile command that can be
 evaluated in the shell.  For even more control, replace the entire
 *compile(source,output)* function.
 
+With the unix compiler, the builtin models can also be compiled into a
+single shared library using :func:`make_bundle` (see also
+:func:`sasmodels.core.precompile_dlls`).  Each model is compiled to its own
+object file, and all symbols other than the model kernels are made local to
+that object so that the shared helper functions from *models/lib* do not
+collide when the objects are linked together.  The bundle is opened once,
+and the kernel symbols for each model are resolved the first time the
+model is used.  Models which are not in the bundle, such as custom models,
+continue to use a dll per model.
+
 The global attribute *ALLOW_SINGLE_PRECISION_DLLS* should be set to *False* if
 you wish to prevent single precision floating point evaluation for the compiled
 models, otherwise set it defaults to *True*.
@@ -73,6 +83,7 @@ import os
 from os.path import join as joinpath, splitext
 import subprocess
 import tempfile
+import shutil
 import ctypes as ct  # type: ignore
 import _ctypes as _ct
 import logging
@@ -85,6 +96,7 @@ except ImportError:
     tinycc = None
 
 from . import generate
+from . import metrics
 from .kernel import KernelModel, Kernel
 from .kernelpy import PyInput
 from .exception import annotate_exception
@@ -92,7 +104,7 @@ from .generate import F16, F32, F64
 
 # pylint: disable=unused-import
 try:
-    from typing import Tuple, Callable, Any
+    from typing import Tuple, Callable, Any, Dict, List, Optional, Set
     from .modelinfo import ModelInfo
     from .details import CallDetails
 except ImportError:
@@ -126,6 +138,23 @@ if COMPILER == "unix":
     def compile_command(source, output):
         """unix compiler command"""
         return CC + [source, "-o", output, "-lm"]
+    def object_command(source, output):
+        """unix compiler command for a relocatable model object"""
+        return [p for p in CC if p != "-shared"] + ["-c", source, "-o", output]
+    if sys.platform == "darwin":
+        def export_command(source, symbols, output):
+            """keep *symbols* global in the object, making the rest local"""
+            exports = [arg for name in symbols
+                       for arg in ("-exported_symbol", "_" + name)]
+            return ["ld", "-r", source, "-o", output] + exports
+    else:
+        def export_command(source, symbols, output):
+            """keep *symbols* global in the object, making the rest local"""
+            exports = ["--keep-global-symbol=" + name for name in symbols]
+            return ["objcopy"] + exports + [source, output]
+    def link_command(objects, output):
+        """unix linker command for the model bundle"""
+        return CC + list(objects) + ["-o", output, "-lm"]
 elif COMPILER == "msvc":
     # Call vcvarsall.bat before compiling to set path, headers, libs, etc.
     # MSVC compiler is available, so use it.  OpenMP requires a copy of
@@ -157,6 +186,10 @@ elif COMPILER == "mingw":
         """mingw compiler command"""
         return CC + [source, "-o", output, "-lm"]
 
+if COMPILER != "unix":
+    # Model bundles are only supported for the unix compiler.
+    object_command = export_command = link_command = None
+
 # Windows-specific solution
 if os.name == 'nt':
     # Assume the default location of module DLLs is in .sasmodels/compiled_models.
@@ -176,7 +209,14 @@ def compile(source, output):
 
     Raises RuntimeError if the compile failed or the output wasn't produced.
     """
-    command = compile_command(source=source, output=output)
+    _run(compile_command(source=source, output=output), output, source)
+
+def _run(command, output, source):
+    # type: (List[str], str, str) -> None
+    """
+    Run a compiler *command* which is expected to produce *output* from
+    *source*.
+    """
     command_str = " ".join('"%s"'%p if ' ' in p else p for p in command)
     logging.info(command_str)
     try:
@@ -189,14 +229,18 @@ def compile(source, output):
     if not os.path.exists(output):
         raise RuntimeError("compile failed.  File is in %r"%source)
 
-def dll_name(model_info, dtype):
-    # type: (ModelInfo, np.dtype) ->  str
+def dll_name(model_info, dtype, tolerance=None):
+    # type: (ModelInfo, np.dtype, Optional[float]) ->  str
     """
     Name of the dll containing the model.  This is the base file name without
-    any path or extension, with a form such as 'sas_sphere32'.
+    any path or extension, with a form such as 'sas_sphere32'.  Models built
+    with an integration *tolerance* have it in the name, such as
+    'sas64_cylinder_tol0.0001'.
     """
     bits = 8*dtype.itemsize
     basename = "sas%d_%s"%(bits, model_info.id)
+    if tolerance is not None:
+        basename += "_tol%g"%tolerance
     basename += ARCH + ".so"
 
     # Hack to find precompiled dlls
@@ -207,17 +251,178 @@ def dll_name(model_info, dtype):
     return joinpath(DLL_PATH, basename)
 
 
-def dll_path(model_info, dtype):
-    # type: (ModelInfo, np.dtype) -> str
+def dll_path(model_info, dtype, tolerance=None):
+    # type: (ModelInfo, np.dtype, Optional[float]) -> str
     """
     Complete path to the dll for the model.  Note that the dll may not
     exist yet if it hasn't been compiled.
     """
-    return os.path.join(DLL_PATH, dll_name(model_info, dtype))
+    return os.path.join(DLL_PATH, dll_name(model_info, dtype, tolerance))
+
+
+def bundle_name(dtype):
+    # type: (np.dtype) -> str
+    """
+    Name of the shared library containing all bundled models, with a form
+    such as 'sas64_models.so'.
+    """
+    bits = 8*dtype.itemsize
+    return "sas%d_models%s.so"%(bits, ARCH)
+
+
+def _bundle_manifest(bundle):
+    # type: (str) -> str
+    """
+    Name of the file listing the model ids contained in *bundle*.
+    """
+    return splitext(bundle)[0] + ".txt"
+
+
+def _bundle_version():
+    # type: () -> str
+    """
+    Version string recorded in the bundle manifest.  Bundles built by a
+    different version of sasmodels are not used.
+    """
+    from . import __version__
+    return "sasmodels %s" % __version__
+
+
+def _read_manifest(manifest):
+    # type: (str) -> Dict[str, float]
+    """
+    Return a map from model id to source timestamp for the models listed
+    in *manifest*.  The map is empty if the manifest was written by a
+    different version of sasmodels or is not in the expected format.
+    """
+    with open(manifest) as fid:
+        lines = fid.read().splitlines()
+    if not lines or lines[0] != "# " + _bundle_version():
+        return {}
+    contents = {}
+    for line in lines[1:]:
+        fields = line.split()
+        if len(fields) != 2:
+            return {}
+        try:
+            contents[fields[0]] = float(fields[1])
+        except ValueError:
+            return {}
+    return contents
+
+
+def _is_builtin(model_info):
+    # type: (ModelInfo) -> bool
+    """
+    Return True if the model is defined in :mod:`sasmodels.models`.
+    """
+    from . import models
+    if model_info.filename is None:
+        return False
+    model_dir = os.path.dirname(os.path.abspath(models.__file__))
+    return os.path.dirname(model_info.filename) == model_dir
 
 
-def make_dll(source, model_info, dtype=F64):
-    # type: (str, ModelInfo, np.dtype) -> str
+_BUNDLE_CONTENTS = {}  # type: Dict[str, Tuple[float, Dict[str, float]]]
+def find_bundle(model_info, dtype=F64):
+    # type: (ModelInfo, np.dtype) -> Optional[str]
+    """
+    Return the path to the shared library bundle containing *model_info*,
+    or None if the model is not available in a bundle.
+
+    Only builtin models are looked up.  The bundle is searched for in the
+    precompiled *compiled_models* directory, then in *DLL_PATH*.  The
+    manifest for the bundle records the sasmodels version and, for each
+    model, the source timestamp from :func:`sasmodels.generate.dll_timestamp`
+    at the time the bundle was built.  The bundle is skipped if it was built
+    by a different version of sasmodels, or if the model sources, the model
+    libraries or the kernel templates have changed since then, in which case
+    the model falls back to its own dll from :func:`make_dll`.
+    """
+    if dtype == F32 and not ALLOW_SINGLE_PRECISION_DLLS:
+        dtype = F64
+    if not _is_builtin(model_info):
+        return None
+    basename = bundle_name(dtype)
+    for path in (joinpath(generate.DATA_PATH, '..', 'compiled_models'),
+                 DLL_PATH):
+        bundle = joinpath(path, basename)
+        manifest = _bundle_manifest(bundle)
+        if not (os.path.exists(bundle) and os.path.exists(manifest)):
+            continue
+        mtime = os.path.getmtime(manifest)
+        cached = _BUNDLE_CONTENTS.get(manifest, None)
+        if cached is None or cached[0] != mtime:
+            cached = mtime, _read_manifest(manifest)
+            _BUNDLE_CONTENTS[manifest] = cached
+        build_time = cached[1].get(model_info.id, None)
+        if build_time is None:
+            continue
+        if build_time < generate.dll_timestamp(model_info):
+            logging.info("model bundle %s is stale for %s; using its own dll",
+                         bundle, model_info.id)
+            metrics.count('compile.dll.stale_bundle')
+            continue
+        return bundle
+    return None
+
+
+def make_bundle(model_infos, dtype=F64, path=None):
+    # type: (List[ModelInfo], np.dtype, Optional[str]) -> str
+    """
+    Compile the C models in *model_infos* into a single shared library,
+    returning the path to the library.
+
+    The library is written to *path*, or to *DLL_PATH* if *path* is not
+    given, along with a manifest listing the model ids it contains and the
+    timestamps of their sources (see :func:`find_bundle`).  The
+    kernel symbols in the bundle are the usual kernel names, which are
+    already prefixed by the model name.  All other symbols are kept local
+    to each model.
+
+    Raises RuntimeError if the compiler does not support bundles.
+    """
+    if object_command is None:
+        raise RuntimeError("model bundles are not supported for compiler %r"
+                           % COMPILER)
+    if dtype == F16:
+        raise ValueError("16 bit floats not supported")
+    if dtype == F32 and not ALLOW_SINGLE_PRECISION_DLLS:
+        dtype = F64  # Force 64-bit dll
+    bundle = joinpath(path if path is not None else DLL_PATH,
+                      bundle_name(dtype))
+    # Record the source times before building so that sources which change
+    # during the build make the bundle stale.
+    timestamps = [float(generate.dll_timestamp(model_info))
+                  for model_info in model_infos]
+    build_dir = tempfile.mkdtemp(prefix="sasmodels_bundle_")
+    try:
+        objects = []
+        for model_info in model_infos:
+            source = generate.make_source(model_info)['dll']
+            source = generate.convert_type(source, dtype)
+            filename = joinpath(build_dir, model_info.id + ".c")
+            with open(filename, "w") as file_handle:
+                file_handle.write(source)
+            obj = joinpath(build_dir, model_info.id + ".o")
+            _run(object_command(filename, obj), obj, filename)
+            symbols = [generate.kernel_name(model_info, variant)
+                       for variant in generate.kernel_variants(model_info)]
+            exported = joinpath(build_dir, model_info.id + "_kernels.o")
+            _run(export_command(obj, symbols, exported), exported, obj)
+            objects.append(exported)
+        _run(link_command(objects, bundle), bundle, build_dir)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    with open(_bundle_manifest(bundle), "w") as fid:
+        fid.write("# %s\n" % _bundle_version())
+        for model_info, timestamp in zip(model_infos, timestamps):
+            fid.write("%s %r\n" % (model_info.id, timestamp))
+    return bundle
+
+
+def make_dll(source, model_info, dtype=F64, tolerance=None):
+    # type: (str, ModelInfo, np.dtype, Optional[float]) -> str
     """
     Returns the path to the compiled model defined by *kernel_module*.
 
@@ -234,6 +439,9 @@ def make_dll(source, model_info, dtype=F64):
 
     Set *sasmodels.kerneldll.DLL_PATH* to the compiled dll output path.
     The default is the system temporary directory.
+
+    *tolerance* is the integration tolerance that *source* was generated
+    with, if any, which keeps the dll separate from the default build.
     """
     if dtype == F16:
         raise ValueError("16 bit floats not supported")
@@ -241,7 +449,7 @@ def make_dll(source, model_info, dtype=F64):
         dtype = F64  # Force 64-bit dll
     # Note: dtype may be F128 for long double precision
 
-    dll = dll_path(model_info, dtype)
+    dll = dll_path(model_info, dtype, tolerance)
 
     if not os.path.exists(dll):
         need_recompile = True
@@ -255,28 +463,43 @@ def make_dll(source, model_info, dtype=F64):
         source = generate.convert_type(source, dtype)
         with os.fdopen(system_fd, "w") as file_handle:
             file_handle.write(source)
-        compile(source=filename, output=dll)
+        with metrics.timer('compile.dll', model=model_info.id):
+            compile(source=filename, output=dll)
         # comment the following to keep the generated c file
         # Note: if there is a syntax error then compile raises an error
         # and the source file will not be deleted.
         os.unlink(filename)
         #print("saving compiled file in %r"%filename)
+    else:
+        metrics.count('compile.dll.cached')
     return dll
 
 
-def load_dll(source, model_info, dtype=F64):
-    # type: (str, ModelInfo, np.dtype) -> "DllModel"
+def load_dll(source, model_info, dtype=F64, tolerance=None):
+    # type: (str, ModelInfo, np.dtype, Optional[float]) -> "DllModel"
     """
     Create and load a dll corresponding to the source, info pair returned
     from :func:`sasmodels.generate.make` compiled for the target precision.
 
-    See :func:`make_dll` for details on controlling the dll path and the
-    allowed floating point precision.
+    See :func:`make_dll` for details on controlling the dll path, the
+    allowed floating point precision and the integration tolerance.
     """
-    filename = make_dll(source, model_info, dtype=dtype)
+    filename = make_dll(source, model_info, dtype=dtype, tolerance=tolerance)
     return DllModel(filename, model_info, dtype=dtype)
 
 
+_BUNDLE_HANDLES = {}  # type: Dict[str, ct.CDLL]
+def _open_bundle(path):
+    # type: (str) -> ct.CDLL
+    """
+    Open the model bundle at *path*, sharing the handle between models.
+    """
+    handle = _BUNDLE_HANDLES.get(path, None)
+    if handle is None:
+        handle = _BUNDLE_HANDLES[path] = ct.CDLL(path)
+    return handle
+
+
 class DllModel(KernelModel):
     """
     ctypes wrapper for a single model.
@@ -289,12 +512,17 @@ class DllModel(KernelModel):
     for single and 'd', 'float64' or 'double' for double.  Double precision
     is an optional extension which may not be available on all devices.
 
+    If *bundled* is True, then *dllpath* is a library shared by many models
+    as returned by :func:`find_bundle`.  The library is opened once for all
+    models, and is not closed when the model is released.
+
     Call :meth:`release` when done with the kernel.
     """
-    def __init__(self, dllpath, model_info, dtype=generate.F32):
-        # type: (str, ModelInfo, np.dtype) -> None
+    def __init__(self, dllpath, model_info, dtype=generate.F32, bundled=False):
+        # type: (str, ModelInfo, np.dtype, bool) -> None
         self.info = model_info
         self.dllpath = dllpath
+        self.bundled = bundled
         self._dll = None  # type: ct.CDLL
         self._kernels = None # type: List[Callable, Callable]
         self.dtype = np.dtype(dtype)
@@ -302,7 +530,10 @@ class DllModel(KernelModel):
     def _load_dll(self):
         # type: () -> None
         try:
-            self._dll = ct.CDLL(self.dllpath)
+            if self.bundled:
+                self._dll = _open_bundle(self.dllpath)
+            else:
+                self._dll = ct.CDLL(self.dllpath)
         except:
             annotate_exception("while loading "+self.dllpath)
             raise
@@ -311,21 +542,29 @@ class DllModel(KernelModel):
                       else ct.c_double if self.dtype == generate.F64
                       else ct.c_longdouble)
 
-        # int, int, int, int*, double*, double*, double*, double*, double
-        argtypes = [ct.c_int32]*3 + [ct.c_void_p]*4 + [float_type]
+        # int, int, int, int*, double*, double*, double*, double*, double, int
+        argtypes = [ct.c_int32]*3 + [ct.c_void_p]*4 + [float_type, ct.c_int32]
         names = [generate.kernel_name(self.info, variant)
                  for variant in ("Iq", "Iqxy", "Imagnetic")]
         self._kernels = [self._dll[name] for name in names]
+        if "sesans" in generate.kernel_variants(self.info):
+            # A bundle built before the model defined sesans will not
+            # have the kernel, so only fail if it is used.
+            try:
+                self._kernels.append(
+                    self._dll[generate.kernel_name(self.info, "sesans")])
+            except AttributeError:
+                pass
         for k in self._kernels:
             k.argtypes = argtypes
 
     def __getstate__(self):
-        # type: () -> Tuple[ModelInfo, str]
-        return self.info, self.dllpath
+        # type: () -> Tuple[ModelInfo, str, bool]
+        return self.info, self.dllpath, self.bundled
 
     def __setstate__(self, state):
-        # type: (Tuple[ModelInfo, str]) -> None
-        self.info, self.dllpath = state
+        # type: (Tuple[ModelInfo, str, bool]) -> None
+        self.info, self.dllpath, self.bundled = state
         self._dll = None
 
     def make_kernel(self, q_vectors):
@@ -338,11 +577,25 @@ class DllModel(KernelModel):
         kernel = self._kernels[1:3] if is_2d else [self._kernels[0]]*2
         return DllKernel(kernel, self.info, q_input)
 
+    def make_sesans_kernel(self, z):
+        # type: (np.ndarray) -> DllKernel
+        q_input = PyInput([z], self.dtype)
+        if self._dll is None:
+            self._load_dll()
+        if len(self._kernels) < 4:
+            raise NotImplementedError("no SESANS kernel for %s in %s"
+                                      % (self.info.id, self.dllpath))
+        return DllKernel([self._kernels[3]]*2, self.info, q_input)
+
     def release(self):
         # type: () -> None
         """
         Release any resources associated with the model.
         """
+        if self.bundled:
+            # The bundle is shared with other models, so leave it open.
+            self._dll = self._kernels = None
+            return
         dll_handle = self._dll._handle
         if os.name == 'nt':
             ct.windll.kernel32.FreeLibrary(dll_handle)
@@ -377,7 +630,7 @@ class DllKernel(Kernel):
         self.q_input = q_input
         self.dtype = q_input.dtype
         self.dim = '2d' if q_input.is_2d else '1d'
-        self.result = np.empty(q_input.nq+1, q_input.dtype)
+        self.result = np.empty(q_input.capacity+1, q_input.dtype)
         self.real = (np.float32 if self.q_input.dtype == generate.F32
                      else np.float64 if self.q_input.dtype == generate.F64
                      else np.float128)
@@ -395,21 +648,31 @@ class DllKernel(Kernel):
             self.q_input.q.ctypes.data, #q
             self.result.ctypes.data,   # results
             self.real(cutoff), # cutoff
+            self.q_input.grid_nx, # grid_nx
         ]
         #print("Calling DLL")
         #call_details.show(values)
+        metrics.count('kernel.calls')
+        metrics.count('kernel.q_points', self.q_input.nq)
+        metrics.count('mesh.points', call_details.num_eval)
         step = 100
-        for start in range(0, call_details.num_eval, step):
-            stop = min(start + step, call_details.num_eval)
-            args[1:3] = [start, stop]
-            kernel(*args) # type: ignore
+        with metrics.timer('kernel.dll', model=self.info.id):
+            for start in range(0, call_details.num_eval, step):
+                stop = min(start + step, call_details.num_eval)
+                args[1:3] = [start, stop]
+                kernel(*args) # type: ignore
 
         #print("returned",self.q_input.q, self.result)
         pd_norm = self.result[self.q_input.nq]
         scale = values[0]/(pd_norm if pd_norm != 0.0 else 1.0)
         background = values[1]
         #print("scale",scale,background)
-        return scale*self.result[:self.q_input.nq] + background
+        return self.q_input.select(scale*self.result[:self.q_input.nq]
+                                   + background)
+
+    def update_q(self, q_vectors):
+        # type: (List[np.ndarray]) -> None
+        self.q_input.update(q_vectors)
 
     def release(self):
         # type: () -> None
@@ -417,3 +680,67 @@ class DllKernel(Kernel):
         Release any resources associated with the kernel.
         """
         self.q_input.release()
+
+
+def test_bundle():
+    # type: () -> None
+    """
+    Check that the precompiled bundle is used, and that it is skipped when
+    it is stale or was built by another version of sasmodels.
+    """
+    global DLL_PATH
+    if object_command is None:
+        return
+    from .core import load_model_info, build_model, precompile_dlls
+    from .direct_model import call_kernel
+
+    path = tempfile.mkdtemp(prefix="sasmodels_bundle_test_")
+    old_path = DLL_PATH
+    try:
+        bundle, = precompile_dlls(path, bundle=True)
+        manifest = _bundle_manifest(bundle)
+        with open(manifest) as fid:
+            lines = fid.read().splitlines()
+        assert lines[0] == "# " + _bundle_version()
+        assert "sphere" in _read_manifest(manifest)
+        assert "_spherepy" not in _read_manifest(manifest)
+
+        DLL_PATH = path
+        info = load_model_info('sphere')
+        assert find_bundle(info) == bundle
+        model = build_model(info, dtype='double', platform='dll')
+        assert model.bundled and model.dllpath == bundle
+        q = np.logspace(-3, -1, 20)
+        pars = dict(radius=200, radius_pd=0.1, radius_pd_n=11)
+        bundled = call_kernel(model.make_kernel([q]), pars)
+        single = load_dll(generate.make_source(info)['dll'], info, F64)
+        assert not single.bundled
+        assert np.allclose(bundled, call_kernel(single.make_kernel([q]), pars),
+                           rtol=1e-14, atol=0)
+
+        def rewrite(header, delta):
+            # type: (str, float) -> None
+            contents = _read_manifest(manifest)
+            contents['sphere'] -= delta
+            with open(manifest, "w") as fid:
+                fid.write(header + "\n")
+                for key, value in contents.items():
+                    fid.write("%s %r\n" % (key, value))
+            # make sure the manifest is seen to change
+            mtime = os.path.getmtime(manifest) + 10
+            os.utime(manifest, (mtime, mtime))
+
+        # Sources changed since the bundle was built.
+        rewrite("# " + _bundle_version(), 1000.)
+        assert find_bundle(info) is None
+        assert not build_model(info, dtype='double', platform='dll').bundled
+        assert find_bundle(load_model_info('cylinder')) == bundle
+
+        # Bundle built by a different version of sasmodels.
+        rewrite("# sasmodels 0.0", -1000.)
+        assert find_bundle(info) is None
+        assert find_bundle(load_model_info('cylinder')) is None
+    finally:
+        DLL_PATH = old_path
+        _BUNDLE_CONTENTS.clear()
+        shutil.rmtree(path, ignore_errors=True)
@@ -12,8 +12,9 @@ import logging
 
 import numpy as np  # type: ignore
 
+from . import metrics
 from .generate import F64
-from .kernel import KernelModel, Kernel
+from .kernel import KernelModel, Kernel, QGrid, fill_q_input
 
 # pylint: disable=unused-import
 try:
@@ -39,9 +40,18 @@ class PyModel(KernelModel):
         logger.info("load python model " + self.info.name)
 
     def make_kernel(self, q_vectors):
+        if isinstance(q_vectors, QGrid):
+            # Python models work on whole vectors, so expand the pixels.
+            q_vectors = list(q_vectors)
         q_input = PyInput(q_vectors, dtype=F64)
         return PyKernel(self.info, q_input)
 
+    def make_sesans_kernel(self, z):
+        if self.info.sesans is None:
+            raise NotImplementedError("no SESANS kernel for %s" % self.info.id)
+        q_input = PyInput([z], dtype=F64)
+        return PyKernel(self.info, q_input, sesans=True)
+
     def release(self):
         """
         Free resources associated with the model.
@@ -58,6 +68,14 @@ class PyInput(object):
     stretching the array to better match the memory architecture.  Additional
     points will be evaluated with *q=1e-3*.
 
+    If *q_vectors* is a :class:`sasmodels.kernel.QGrid`, then *q* holds the
+    $q_x$ values followed by the $q_y$ values, *grid_nx* is the number of
+    $q_x$ values, and *nq* counts every pixel on the grid.  The kernel
+    result is reduced to the selected pixels using :meth:`select`.
+
+    Use :meth:`update` to reuse the buffer for a different set of points
+    of the same kind, which is no larger than the original.
+
     *dtype* is the data type for the q vectors. The data type should be
     set to match that of the kernel, which is an attribute of
     :class:`GpuProgram`.  Note that not all kernels support double
@@ -68,16 +86,39 @@ class PyInput(object):
     buffer will be released when the data object is freed.
     """
     def __init__(self, q_vectors, dtype):
-        self.nq = q_vectors[0].size
         self.dtype = dtype
         self.is_2d = (len(q_vectors) == 2)
-        if self.is_2d:
-            self.q = np.empty((self.nq, 2), dtype=dtype)
-            self.q[:, 0] = q_vectors[0]
-            self.q[:, 1] = q_vectors[1]
+        self.is_grid = isinstance(q_vectors, QGrid)
+        if self.is_grid:
+            size = len(q_vectors.x_bins) + len(q_vectors.y_bins)
+            self.q = np.empty(size, dtype=dtype)
+            self.capacity = q_vectors.size
+        elif self.is_2d:
+            self.q = np.empty((q_vectors[0].size, 2), dtype=dtype)
+            self.capacity = q_vectors[0].size
         else:
-            self.q = np.empty(self.nq, dtype=dtype)
-            self.q[:self.nq] = q_vectors[0]
+            self.q = np.empty(q_vectors[0].size, dtype=dtype)
+            self.capacity = q_vectors[0].size
+        self.update(q_vectors)
+
+    def update(self, q_vectors):
+        # type: (List[np.ndarray]) -> None
+        """
+        Replace the q values with *q_vectors*, raising ValueError if they
+        do not fit in the buffers.
+        """
+        if ((len(q_vectors) == 2) != self.is_2d
+                or isinstance(q_vectors, QGrid) != self.is_grid):
+            raise ValueError("q values differ in kind from the kernel input")
+        self.nq, self.grid_nx, self.index = fill_q_input(
+            self.q, q_vectors, self.capacity)
+
+    def select(self, result):
+        # type: (np.ndarray) -> np.ndarray
+        """
+        Return the values in *result* for the selected grid pixels.
+        """
+        return result if self.index is None else result[self.index]
 
     def release(self):
         """
@@ -96,6 +137,9 @@ class PyKernel(Kernel):
     *q_input* is the DllInput q vectors at which the kernel should be
     evaluated.
 
+    If *sesans* is True then the kernel uses the model *sesans* function,
+    with *q_input* holding the spin echo lengths.
+
     The resulting call method takes the *pars*, a list of values for
     the fixed parameters to the kernel, and *pd_pars*, a list of (value,weight)
     vectors for the polydisperse parameters.  *cutoff* determines the
@@ -104,8 +148,8 @@ class PyKernel(Kernel):
 
     Call :meth:`release` when done with the kernel instance.
     """
-    def __init__(self, model_info, q_input):
-        # type: (callable, ModelInfo, List[np.ndarray]) -> None
+    def __init__(self, model_info, q_input, sesans=False):
+        # type: (callable, ModelInfo, List[np.ndarray], bool) -> None
         self.dtype = np.dtype('d')
         self.info = model_info
         self.q_input = q_input
@@ -152,7 +196,7 @@ class PyKernel(Kernel):
             qx, qy = q_input.q[:, 0], q_input.q[:, 1]
             self._form = lambda: form(qx, qy, *kernel_args)
         else:
-            form = model_info.Iq
+            form = model_info.sesans if sesans else model_info.Iq
             q = q_input.q
             self._form = lambda: form(q, *kernel_args)
 
@@ -167,8 +211,12 @@ class PyKernel(Kernel):
             raise NotImplementedError("Magnetism not implemented for pure python models")
         #print("Calling python kernel")
         #call_details.show(values)
-        res = _loops(self._parameter_vector, self._form, self._volume,
-                     self.q_input.nq, call_details, values, cutoff)
+        metrics.count('kernel.calls')
+        metrics.count('kernel.q_points', self.q_input.nq)
+        metrics.count('mesh.points', call_details.num_eval)
+        with metrics.timer('kernel.python', model=self.info.id):
+            res = _loops(self._parameter_vector, self._form, self._volume,
+                         self.q_input.nq, call_details, values, cutoff)
         return res
 
     def release(self):
@@ -225,15 +273,21 @@ def _loops(parameters,    # type: np.ndarray
     total = np.zeros(nq, 'd')
     for loop_index in range(call_details.num_eval):
         # update polydispersity parameter values
-        if p0_index == p0_length:
-            pd_index = (loop_index//pd_stride)%pd_length
-            parameters[pd_par] = pd_value[pd_offset+pd_index]
-            partial_weight = np.prod(pd_weight[pd_offset+pd_index][1:])
-            p0_index = loop_index%p0_length
-
-        weight = partial_weight * pd_weight[p0_offset + p0_index]
-        parameters[p0_par] = pd_value[p0_offset + p0_index]
-        p0_index += 1
+        if call_details.point_list:
+            # Each active parameter has a value for every point in the list
+            # and the combined weight for the point is in the first vector.
+            parameters[pd_par] = pd_value[pd_offset+loop_index]
+            weight = pd_weight[p0_offset + loop_index]
+        else:
+            if p0_index == p0_length:
+                pd_index = (loop_index//pd_stride)%pd_length
+                parameters[pd_par] = pd_value[pd_offset+pd_index]
+                partial_weight = np.prod(pd_weight[pd_offset+pd_index][1:])
+                p0_index = loop_index%p0_length
+
+            weight = partial_weight * pd_weight[p0_offset + p0_index]
+            parameters[p0_par] = pd_value[p0_offset + p0_index]
+            p0_index += 1
         if weight > cutoff:
             # Call the scattering function
             # Assume that NaNs are only generated if the parameters are bad;
@@ -263,6 +317,7 @@ def _create_default_functions(model_info):
     # Note: must call create_vector_Iq before create_vector_Iqxy
     _create_vector_Iq(model_info)
     _create_vector_Iqxy(model_info)
+    _create_vector_sesans(model_info)
 
 
 def _create_vector_Iq(model_info):
@@ -281,6 +336,21 @@ def _create_vector_Iq(model_info):
         model_info.Iq = vector_Iq
 
 
+def _create_vector_sesans(model_info):
+    """
+    Define sesans as a vector function if it exists.
+    """
+    sesans = model_info.sesans
+    if callable(sesans) and not getattr(sesans, 'vectorized', False):
+        def vector_sesans(z, *args):
+            """
+            Vectorized SESANS kernel.
+            """
+            return np.array([sesans(zi, *args) for zi in z])
+        vector_sesans.vectorized = True
+        model_info.sesans = vector_sesans
+
+
 def _create_vector_Iqxy(model_info):
     """
     Define Iqxy as a vector function if it exists, or default it from Iq().
@@ -306,4 +376,5 @@ def _create_vector_Iqxy(model_info):
             """
             return Iq(np.sqrt(qx**2 + qy**2), *args)
         default_Iqxy.vectorized = True
+        default_Iqxy.radial = True
         model_info.Iqxy = default_Iqxy
@@ -0,0 +1,393 @@
+"""
+Instrumentation for the model evaluation pipeline.
+
+The calculation engines and drivers record where the time goes in a model
+evaluation: building the dispersity mesh, packing the kernel arguments,
+running the kernel, applying the resolution or SESANS transform, compiling
+the model and moving data to and from the OpenCL device.  Recording is off
+by default, in which case each probe is a function call which returns
+immediately.  Turn it on with :func:`enable`, or by setting the environment
+variable *SAS_METRICS* to *on* (counters and timers) or *trace* (counters,
+timers and a timeline of events).  If *SAS_METRICS_OUTPUT* is also set then
+the metrics are saved to *<SAS_METRICS_OUTPUT>.json* when the program exits,
+and the timeline to *<SAS_METRICS_OUTPUT>.trace.json*.
+
+For example, to see where the time goes in a fit step::
+
+    from sasmodels import metrics
+    metrics.enable(trace=True)
+    problem.nllf()
+    print(metrics.report())
+    metrics.save_trace("fit.trace.json")
+
+The trace is in the Chrome trace event format, which can be viewed with
+*chrome://tracing* or https://ui.perfetto.dev.
+
+Timers record the number of calls and the total, minimum and maximum
+duration in seconds for each stage.  Stages nest, so *theory* includes
+*mesh*, *kernel_args*, *kernel.dll* and *resolution*.  The stages are:
+
+    * *theory*, *bumps.theory*, *sasview.calculate_Iq*: model evaluation
+      through :class:`sasmodels.direct_model.DirectModel`,
+      :class:`sasmodels.bumps_model.Experiment` and
+      :class:`sasmodels.sasview_model.SasviewModel`
+    * *mesh*: building the dispersity mesh from the parameters
+    * *kernel_args*: packing the mesh into the kernel call details
+    * *kernel.dll*, *kernel.opencl*, *kernel.python*: running the kernel
+    * *resolution*, *sesans*: applying the resolution or SESANS transform
+    * *resolution.setup*: finding or building the resolution operator
+    * *compile.dll*, *compile.opencl*: compiling the model
+    * *transfer.opencl*: copying inputs to the OpenCL device
+
+Counters accumulate *kernel.calls*, *kernel.q_points* and *mesh.points*
+(the $q$ points and dispersity points summed over kernel calls),
+*bytes.to_device* and *bytes.from_device* for OpenCL, *compile.dll.cached*
+and *compile.opencl.cached* for models which did not need compiling,
+*cache.<name>.hits* and *cache.<name>.misses* for the weight, resolution
+and SESANS caches, and *bumps.theory_cached* for theory requests answered
+from the bumps experiment cache.
+
+The probes in the code use :func:`count` and :func:`timer`::
+
+    with metrics.timer('kernel.dll', model=info.id):
+        ...
+    metrics.count('mesh.points', call_details.num_eval)
+"""
+from __future__ import print_function, division
+
+import os
+import json
+import atexit
+import threading
+from numbers import Integral
+from timeit import default_timer as clock
+
+# pylint: disable=unused-import
+try:
+    from typing import Any, Dict, List, Optional
+except ImportError:
+    pass
+# pylint: enable=unused-import
+
+#: True if the probes are recording.  Use :func:`enable` and :func:`disable`
+#: to change it.
+ENABLED = False
+
+#: Maximum number of events kept for the trace.  Later events are dropped
+#: and counted in *trace.dropped*.
+MAX_EVENTS = 1000000
+
+
+class Metrics(object):
+    """
+    Registry of counters and timers.
+
+    If *trace* is True, each timed stage and counter update is also kept
+    as an event for :meth:`trace`.
+    """
+    def __init__(self, trace=False):
+        # type: (bool) -> None
+        self.tracing = trace
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # type: () -> None
+        """
+        Clear the counters, timers and events.
+        """
+        with self._lock:
+            self.counters = {}  # type: Dict[str, float]
+            self.timers = {}  # type: Dict[str, List[float]]
+            self.events = []  # type: List[Dict[str, Any]]
+            self._origin = clock()
+
+    def count(self, name, value=1):
+        # type: (str, float) -> None
+        """
+        Add *value* to counter *name*.
+        """
+        # numpy scalars are converted so that the counters can be saved
+        value = int(value) if isinstance(value, Integral) else float(value)
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            if self.tracing:
+                self._event({'name': name, 'ph': 'C',
+                             'ts': 1e6*(clock() - self._origin),
+                             'args': {'value': total}})
+
+    def timer(self, name, args=None):
+        # type: (str, Optional[Dict[str, Any]]) -> "_Timer"
+        """
+        Return a context manager which records the time spent in the block
+        under *name*.  *args* are attached to the trace event.
+        """
+        return _Timer(self, name, args)
+
+    def add_time(self, name, start, stop, args=None):
+        # type: (str, float, float, Optional[Dict[str, Any]]) -> None
+        """
+        Record a stage *name* running from clock time *start* to *stop*.
+        """
+        duration = stop - start
+        with self._lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                self.timers[name] = [1, duration, duration, duration]
+            else:
+                stats[0] += 1
+                stats[1] += duration
+                stats[2] = min(stats[2], duration)
+                stats[3] = max(stats[3], duration)
+            if self.tracing:
+                event = {'name': name, 'ph': 'X',
+                         'ts': 1e6*(start - self._origin),
+                         'dur': 1e6*duration}
+                if args:
+                    event['args'] = args
+                self._event(event)
+
+    def _event(self, event):
+        # type: (Dict[str, Any]) -> None
+        if len(self.events) >= MAX_EVENTS:
+            self.counters['trace.dropped'] = (
+                self.counters.get('trace.dropped', 0) + 1)
+            return
+        event['cat'] = event['name'].split('.')[0]
+        event['pid'] = os.getpid()
+        event['tid'] = threading.current_thread().ident
+        self.events.append(event)
+
+    def snapshot(self):
+        # type: () -> Dict[str, Any]
+        """
+        Return the counters and timers as a dictionary.
+
+        Timers give the *count* and the *total*, *mean*, *min* and *max*
+        time in seconds for each stage.
+        """
+        with self._lock:
+            timers = dict(
+                (name, {'count': n, 'total': total, 'mean': total/n,
+                        'min': low, 'max': high})
+                for name, (n, total, low, high) in self.timers.items())
+            return {'counters': dict(self.counters), 'timers': timers}
+
+    def trace(self):
+        # type: () -> Dict[str, Any]
+        """
+        Return the events in Chrome trace event format.
+        """
+        with self._lock:
+            events = list(self.events)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def report(self):
+        # type: () -> str
+        """
+        Return a table of the timers, sorted by total time, and counters.
+        """
+        snapshot = self.snapshot()
+        lines = ["%-24s %8s %12s %12s" % ("stage", "calls", "total ms",
+                                          "mean ms")]
+        timers = sorted(snapshot['timers'].items(),
+                        key=lambda item: -item[1]['total'])
+        for name, stats in timers:
+            lines.append("%-24s %8d %12.3f %12.3f"
+                         % (name, stats['count'], 1e3*stats['total'],
+                            1e3*stats['mean']))
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append("%-24s %8g" % (name, value))
+        return "\n".join(lines)
+
+
+class _Timer(object):
+    """
+    Context manager recording the time spent in a block.
+    """
+    __slots__ = ('registry', 'name', 'args', 'start')
+    def __init__(self, registry, name, args):
+        # type: (Metrics, str, Optional[Dict[str, Any]]) -> None
+        self.registry = registry
+        self.name = name
+        self.args = args
+        self.start = 0.
+
+    def __enter__(self):
+        # type: () -> "_Timer"
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc):
+        # type: (*Any) -> None
+        self.registry.add_time(self.name, self.start, clock(), self.args)
+
+
+class _NoTimer(object):
+    """
+    Context manager which does nothing, returned by :func:`timer` when
+    recording is off.
+    """
+    __slots__ = ()
+    def __enter__(self):
+        # type: () -> "_NoTimer"
+        return self
+
+    def __exit__(self, *exc):
+        # type: (*Any) -> None
+        pass
+
+_NO_TIMER = _NoTimer()
+
+#: Registry used by the probes.
+REGISTRY = Metrics()
+
+
+def enable(trace=False):
+    # type: (bool) -> None
+    """
+    Start recording.  If *trace* is True, keep the timeline of events too.
+    """
+    global ENABLED
+    REGISTRY.tracing = trace
+    ENABLED = True
+
+def disable():
+    # type: () -> None
+    """
+    Stop recording.  The metrics recorded so far are kept.
+    """
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    # type: () -> None
+    """
+    Clear the recorded metrics.
+    """
+    REGISTRY.reset()
+
+def count(name, value=1):
+    # type: (str, float) -> None
+    """
+    Add *value* to counter *name* if recording.
+    """
+    if ENABLED:
+        REGISTRY.count(name, value)
+
+def timer(name, **args):
+    # type: (str, **Any) -> Any
+    """
+    Return a context manager which records the time in the block under
+    *name* if recording.  Keyword arguments are attached to the trace event.
+    """
+    if ENABLED:
+        return REGISTRY.timer(name, args)
+    return _NO_TIMER
+
+def snapshot():
+    # type: () -> Dict[str, Any]
+    """
+    Return the recorded counters and timers.  See :meth:`Metrics.snapshot`.
+    """
+    return REGISTRY.snapshot()
+
+def report():
+    # type: () -> str
+    """
+    Return a table of the recorded timers and counters.
+    """
+    return REGISTRY.report()
+
+def save_json(filename):
+    # type: (str) -> None
+    """
+    Save the recorded counters and timers to *filename* as JSON.
+    """
+    with open(filename, 'w') as fid:
+        json.dump(snapshot(), fid, indent=1, sort_keys=True)
+
+def save_trace(filename):
+    # type: (str) -> None
+    """
+    Save the recorded events to *filename* in Chrome trace event format.
+    """
+    with open(filename, 'w') as fid:
+        json.dump(REGISTRY.trace(), fid)
+
+def _save_at_exit(basename):
+    # type: (str) -> None
+    save_json(basename + ".json")
+    if REGISTRY.tracing:
+        save_trace(basename + ".trace.json")
+
+def _init_from_environment():
+    # type: () -> None
+    mode = os.environ.get('SAS_METRICS', '').lower()
+    if mode in ('', '0', 'off', 'no', 'false'):
+        return
+    enable(trace=(mode == 'trace'))
+    output = os.environ.get('SAS_METRICS_OUTPUT', None)
+    if output:
+        atexit.register(_save_at_exit, output)
+
+_init_from_environment()
+
+
+def test_metrics():
+    # type: () -> None
+    """
+    Check the probes in the evaluation pipeline and the exports.
+    """
+    import tempfile
+    import numpy as np  # type: ignore
+    from .core import load_model
+    from .data import empty_data1D
+    from .direct_model import DirectModel
+
+    model = load_model('sphere', dtype='double', platform='dll')
+    calculator = DirectModel(empty_data1D(np.linspace(0.001, 0.5, 100),
+                                          resolution=0.05), model)
+    pars = dict(radius=50, radius_pd=0.1, radius_pd_n=11)
+    state = ENABLED, REGISTRY.tracing
+    try:
+        reset()
+        disable()
+        calculator(**pars)
+        assert not snapshot()['counters'] and not snapshot()['timers']
+
+        enable(trace=True)
+        calculator(**pars)
+        calculator(**pars)
+        result = snapshot()
+        timers, counters = result['timers'], result['counters']
+        for stage in ('theory', 'mesh', 'kernel_args', 'kernel.dll',
+                      'resolution'):
+            assert timers[stage]['count'] == 2, stage
+        assert timers['theory']['total'] >= timers['kernel.dll']['total']
+        assert counters['kernel.calls'] == 2
+        assert counters['mesh.points'] == 2*11
+        assert counters['kernel.q_points'] == 2*len(calculator.resolution.q_calc)
+        assert 'kernel.dll' in report()
+
+        path = tempfile.mkdtemp()
+        save_json(os.path.join(path, 'metrics.json'))
+        save_trace(os.path.join(path, 'trace.json'))
+        with open(os.path.join(path, 'metrics.json')) as fid:
+            assert json.load(fid)['counters'] == counters
+        with open(os.path.join(path, 'trace.json')) as fid:
+            events = json.load(fid)['traceEvents']
+        stages = [e for e in events if e['ph'] == 'X']
+        assert len(stages) == sum(v['count'] for v in timers.values())
+        kernel = [e for e in stages if e['name'] == 'kernel.dll'][0]
+        assert kernel['cat'] == 'kernel' and kernel['args']['model'] == 'sphere'
+        import shutil
+        shutil.rmtree(path)
+    finally:
+        reset()
+        if state[0]:
+            enable(trace=state[1])
+        else:
+            disable()
+            REGISTRY.tracing = state[1]
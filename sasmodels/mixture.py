@@ -208,6 +208,11 @@ class MixtureKernel(Kernel):
 
         return scale*total + background
 
+    def update_q(self, q_vectors):
+        # type: (List[np.ndarray]) -> None
+        for k in self.kernels:
+            k.update_q(q_vectors)
+
     def release(self):
         # type: () -> None
         for k in self.kernels:
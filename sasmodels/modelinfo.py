@@ -437,7 +437,10 @@ class ParameterTable(object):
 
         self.call_parameters = self._get_call_parameters()
         self.defaults = self._get_defaults()
-        #self._name_table= dict((p.id, p) for p in parameters)
+        # Index by name for fast lookup; the first parameter with a given
+        # name wins, as it would for a linear search.
+        self._name_table = dict((p.name, p)
+                                for p in reversed(self.call_parameters))
 
         # Set the kernel parameters.  Assumes background and scale are the
         # first two parameters in the parameter list, but these are not sent
@@ -506,16 +509,13 @@ class ParameterTable(object):
 
     def __getitem__(self, key):
         # Find the parameter definition
-        for par in self.call_parameters:
-            if par.name == key:
-                return par
-        raise KeyError("unknown parameter %r"%key)
+        try:
+            return self._name_table[key]
+        except KeyError:
+            raise KeyError("unknown parameter %r"%key)
 
     def __contains__(self, key):
-        for par in self.call_parameters:
-            if par.name == key:
-                return True
-        return False
+        return key in self._name_table
 
     def _set_vector_lengths(self):
         # type: () -> List[str]
@@ -722,7 +722,8 @@ def isstr(x):
 
 
 #: Set of variables defined in the model that might contain C code
-C_SYMBOLS = ['Imagnetic', 'Iq', 'Iqxy', 'Iqac', 'Iqabc', 'form_volume', 'c_code']
+C_SYMBOLS = ['Imagnetic', 'Iq', 'Iqxy', 'Iqac', 'Iqabc', 'form_volume', 'sesans',
+             'c_code']
 
 def _find_source_lines(model_info, kernel_module):
     # type: (ModelInfo, ModuleType) -> None
@@ -993,8 +994,15 @@ class ModelInfo(object):
     #: Only the *x* component is used for now.
     profile_axes = None     # type: Tuple[str, str]
     #: Returns *sesans(z, a, b, ...)* for models which can directly compute
-    #: the SESANS correlation function.  Note: not currently implemented.
-    sesans = None           # type: Optional[Callable[[np.ndarray], np.ndarray]]
+    #: the SESANS correlation function $G(z)$ at spin echo length $z$.  This
+    #: is the Hankel transform $G(z) = \tfrac{1}{2\pi}\int J_0(qz)I(q)q\,dq$
+    #: of :attr:`Iq`, with the same parameters and the same scaling, so that
+    #: it is weighted and normalized by volume in the same way.  Like
+    #: :attr:`Iq`, this is a vectorized python function for python models,
+    #: or the body of a C function of *z* and the *Iq* parameters for C
+    #: models.  :class:`sasmodels.direct_model.DataMixin` uses it to fit
+    #: SESANS data without going through $I(q)$.
+    sesans = None           # type: Union[None, str, Callable[[np.ndarray], np.ndarray]]
     #: Returns a random parameter set for the model
     random = None           # type: Optional[Callable[[], Dict[str, float]]]
     #: Line numbers for symbols defining C code
@@ -92,6 +92,9 @@ def sesans(z, sld, sld_solvent, radius):
     Calculate SESANS-correlation function for a solid sphere.
 
     Wim Bouwman after formulae Timofei Kruglov J.Appl.Cryst. 2003 article
+
+    The normalized correlation is scaled by the projected thickness 3/2 r
+    and the contrast so that it is the Hankel transform of Iq.
     """
     d = z / radius
     g = np.zeros_like(z)
@@ -101,7 +104,7 @@ def sesans(z, sld, sld_solvent, radius):
     dlow2 = dlow ** 2
     g[low] = (sqrt(1 - dlow2/4.) * (1 + dlow2/8.)
               + dlow2/2.*(1 - dlow2/16.) * log(dlow / (2. + sqrt(4. - dlow2))))
-    return g
+    return 1.0e-4 * (sld - sld_solvent)**2 * form_volume(radius) * 1.5*radius * g
 sesans.vectorized = True  # sesans accepts an array of z values
 
 def ER(radius):
@@ -46,23 +46,26 @@ Iq(double q,
     double sld_rim,
     double sld_solvent)
 {
-    // set up the integration end points
-    const double uplim = M_PI_4;
     const double halflength = 0.5*length;
 
-    double total = 0.0;
-    for(int i=0;i<GAUSS_N;i++) {
-        double theta = (GAUSS_Z[i] + 1.0)*uplim;
-        double sin_theta, cos_theta; // slots to hold sincos function output
-        SINCOS(theta, sin_theta, cos_theta);
-        double fq = bicelle_kernel(q*sin_theta, q*cos_theta, radius, thick_radius, thick_face,
-                                   halflength, sld_core, sld_face, sld_rim, sld_solvent);
-        total += GAUSS_W[i]*fq*fq*sin_theta;
+    // adaptive integration over theta in [0, pi/2]
+    const double r_max = sqrt(square(radius + thick_radius)
+                              + square(halflength + thick_face));
+    AdaptiveGauss ag;
+    ag_init(&ag, 0.0, M_PI_2, AG_TOLERANCE, q*r_max);
+    while (ag_next(&ag)) {
+        for(int i=0; i<ag.n; i++) {
+            double theta = ag_node(&ag, i);
+            double sin_theta, cos_theta; // slots to hold sincos function output
+            SINCOS(theta, sin_theta, cos_theta);
+            double fq = bicelle_kernel(q*sin_theta, q*cos_theta, radius, thick_radius, thick_face,
+                                       halflength, sld_core, sld_face, sld_rim, sld_solvent);
+            ag_add(&ag, i, fq*fq*sin_theta);
+        }
     }
 
     // calculate value of integral to return
-    double answer = total*uplim;
-    return 1.0e-4*answer;
+    return 1.0e-4*ag.result;
 }
 
 static double
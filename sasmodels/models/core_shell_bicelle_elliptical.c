@@ -34,39 +34,41 @@ Iq(double q,
     const double dr2 = vol2*(sld_rim-sld_solvent);
     const double dr3 = vol3*(sld_face-sld_rim);
 
-    //initialize integral
-    double outer_sum = 0.0;
-    for(int i=0;i<GAUSS_N;i++) {
-        //setup inner integral over the ellipsoidal cross-section
-        //const double va = 0.0;
-        //const double vb = 1.0;
-        //const double cos_theta = ( GAUSS_Z[i]*(vb-va) + va + vb )/2.0;
-        const double cos_theta = ( GAUSS_Z[i] + 1.0 )/2.0;
-        const double sin_theta = sqrt(1.0 - cos_theta*cos_theta);
-        const double qab = q*sin_theta;
-        const double qc = q*cos_theta;
-        const double si1 = sas_sinx_x(halfheight*qc);
-        const double si2 = sas_sinx_x((halfheight+thick_face)*qc);
-        double inner_sum=0.0;
-        for(int j=0;j<GAUSS_N;j++) {
-            //76 gauss points for the inner integral (WAS 20 points,so this may make unecessarily slow, but playing safe)
-            // inner integral limits
-            //const double vaj=0.0;
-            //const double vbj=M_PI;
-            //const double phi = ( GAUSS_Z[j]*(vbj-vaj) + vaj + vbj )/2.0;
-            const double phi = ( GAUSS_Z[j] +1.0)*M_PI_2;
-            const double rr = sqrt(r2A - r2B*cos(phi));
-            const double be1 = sas_2J1x_x(rr*qab);
-            const double be2 = sas_2J1x_x((rr+thick_rim)*qab);
-            const double fq = dr1*si1*be1 + dr2*si2*be2 + dr3*si2*be1;
+    // outer integral over cos(theta) in [0, 1]
+    const double r_proj = fmax(r_minor, r_major) + thick_rim;
+    const double r_max = sqrt(square(r_proj) + square(halfheight + thick_face));
+    AdaptiveGauss outer;
+    ag_init(&outer, 0.0, 1.0, AG_TOLERANCE, q*r_max);
+    while (ag_next(&outer)) {
+        for(int i=0; i<outer.n; i++) {
+            //setup inner integral over the ellipsoidal cross-section
+            const double cos_theta = ag_node(&outer, i);
+            const double sin_theta = sqrt(1.0 - cos_theta*cos_theta);
+            const double qab = q*sin_theta;
+            const double qc = q*cos_theta;
+            const double si1 = sas_sinx_x(halfheight*qc);
+            const double si2 = sas_sinx_x((halfheight+thick_face)*qc);
+            // inner integral over phi in [0, pi]
+            AdaptiveGauss inner;
+            ag_init(&inner, 0.0, M_PI, AG_TOLERANCE, q*sin_theta*r_proj);
+            while (ag_next(&inner)) {
+                for(int j=0; j<inner.n; j++) {
+                    const double phi = ag_node(&inner, j);
+                    const double rr = sqrt(r2A - r2B*cos(phi));
+                    const double be1 = sas_2J1x_x(rr*qab);
+                    const double be2 = sas_2J1x_x((rr+thick_rim)*qab);
+                    const double fq = dr1*si1*be1 + dr2*si2*be2 + dr3*si2*be1;
 
-            inner_sum += GAUSS_W[j] * fq * fq;
+                    ag_add(&inner, j, fq * fq);
+                }
+            }
+            //now calculate outer integral
+            ag_add(&outer, i, inner.result);
         }
-        //now calculate outer integral
-        outer_sum += GAUSS_W[i] * inner_sum;
     }
 
-    return outer_sum*2.5e-05;
+    // average over phi and convert to [cm-1]
+    return outer.result*1.0e-4/M_PI;
 }
 
 static double
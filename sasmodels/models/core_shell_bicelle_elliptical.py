@@ -145,7 +145,8 @@ parameters = [
 
 # pylint: enable=bad-whitespace, line-too-long
 
-source = ["lib/sas_Si.c", "lib/polevl.c", "lib/sas_J1.c", "lib/gauss76.c",
+source = ["lib/sas_Si.c", "lib/polevl.c", "lib/sas_J1.c",
+          "lib/gauss76.c", "lib/gauss150.c", "lib/adaptive_gauss.c",
           "core_shell_bicelle_elliptical.c"]
 
 def random():
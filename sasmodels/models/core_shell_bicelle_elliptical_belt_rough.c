@@ -44,37 +44,43 @@ Iq(double q,
          r_major+thick_rim)* 2.0*halfheight;
     const double dr3 = (rhoh-rhosolv) *M_PI*r_minor*r_major*
          2.0*(halfheight+thick_face);
-    //initialize integral
-    double outer_sum = 0.0;
-    for(int i=0;i<GAUSS_N;i++) {
-        //setup inner integral over the ellipsoidal cross-section
-        // since we generate these lots of times, why not store them somewhere?
-        //const double cos_alpha = ( GAUSS_Z[i]*(vb-va) + va + vb )/2.0;
-        const double cos_alpha = ( GAUSS_Z[i] + 1.0 )/2.0;
-        const double sin_alpha = sqrt(1.0 - cos_alpha*cos_alpha);
-        double inner_sum=0;
-        double sinarg1 = q*halfheight*cos_alpha;
-        double sinarg2 = q*(halfheight+thick_face)*cos_alpha;
-        si1 = sas_sinx_x(sinarg1);
-        si2 = sas_sinx_x(sinarg2);
-        for(int j=0;j<GAUSS_N;j++) {
-            //76 gauss points for the inner integral (WAS 20 points,so this may make unecessarily slow, but playing safe)
-            //const double beta = ( GAUSS_Z[j]*(vbj-vaj) + vaj + vbj )/2.0;
-            const double beta = ( GAUSS_Z[j] +1.0)*M_PI_2;
-            const double rr = sqrt(r2A - r2B*cos(beta));
-            double besarg1 = q*rr*sin_alpha;
-            double besarg2 = q*(rr+thick_rim)*sin_alpha;
-            be1 = sas_2J1x_x(besarg1);
-            be2 = sas_2J1x_x(besarg2);
-            inner_sum += GAUSS_W[j] *square(dr1*si1*be1 +
-                                              dr2*si1*be2 +
-                                              dr3*si2*be1);
+    // outer integral over cos(alpha) in [0, 1]
+    const double r_proj = fmax(r_minor, r_major) + thick_rim;
+    const double r_max = sqrt(square(r_proj) + square(halfheight + thick_face));
+    AdaptiveGauss outer;
+    ag_init(&outer, 0.0, 1.0, AG_TOLERANCE, q*r_max);
+    while (ag_next(&outer)) {
+        for(int i=0; i<outer.n; i++) {
+            //setup inner integral over the ellipsoidal cross-section
+            const double cos_alpha = ag_node(&outer, i);
+            const double sin_alpha = sqrt(1.0 - cos_alpha*cos_alpha);
+            double sinarg1 = q*halfheight*cos_alpha;
+            double sinarg2 = q*(halfheight+thick_face)*cos_alpha;
+            si1 = sas_sinx_x(sinarg1);
+            si2 = sas_sinx_x(sinarg2);
+            // inner integral over beta in [0, pi]
+            AdaptiveGauss inner;
+            ag_init(&inner, 0.0, M_PI, AG_TOLERANCE, q*sin_alpha*r_proj);
+            while (ag_next(&inner)) {
+                for(int j=0; j<inner.n; j++) {
+                    const double beta = ag_node(&inner, j);
+                    const double rr = sqrt(r2A - r2B*cos(beta));
+                    double besarg1 = q*rr*sin_alpha;
+                    double besarg2 = q*(rr+thick_rim)*sin_alpha;
+                    be1 = sas_2J1x_x(besarg1);
+                    be2 = sas_2J1x_x(besarg2);
+                    ag_add(&inner, j, square(dr1*si1*be1 +
+                                             dr2*si1*be2 +
+                                             dr3*si2*be1));
+                }
+            }
+            //now calculate outer integral
+            ag_add(&outer, i, inner.result);
         }
-        //now calculate outer integral
-        outer_sum += GAUSS_W[i] * inner_sum;
     }
 
-    return outer_sum*2.5e-05*exp(-0.5*square(q*sigma));
+    // average over beta and convert to [cm-1]
+    return outer.result*1.0e-4/M_PI*exp(-0.5*square(q*sigma));
 }
 
 static double
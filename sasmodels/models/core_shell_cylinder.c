@@ -28,22 +28,23 @@ Iq(double q,
     const double shell_r = (radius + thickness);
     const double shell_h = (0.5*length + thickness);
     const double shell_vd = form_volume(radius,thickness,length) * (shell_sld-solvent_sld);
-    double total = 0.0;
-    for (int i=0; i<GAUSS_N ;i++) {
-        // translate a point in [-1,1] to a point in [0, pi/2]
-        //const double theta = ( GAUSS_Z[i]*(upper-lower) + upper + lower )/2.0;
-        double sin_theta, cos_theta;
-        const double theta = GAUSS_Z[i]*M_PI_4 + M_PI_4;
-        SINCOS(theta, sin_theta,  cos_theta);
-        const double qab = q*sin_theta;
-        const double qc = q*cos_theta;
-        const double fq = _cyl(core_vd, core_r*qab, core_h*qc)
-            + _cyl(shell_vd, shell_r*qab, shell_h*qc);
-        total += GAUSS_W[i] * fq * fq * sin_theta;
+    // adaptive integration over theta in [0, pi/2]
+    const double r_max = sqrt(shell_r*shell_r + shell_h*shell_h);
+    AdaptiveGauss ag;
+    ag_init(&ag, 0.0, M_PI_2, AG_TOLERANCE, q*r_max);
+    while (ag_next(&ag)) {
+        for (int i=0; i<ag.n; i++) {
+            double sin_theta, cos_theta;
+            const double theta = ag_node(&ag, i);
+            SINCOS(theta, sin_theta,  cos_theta);
+            const double qab = q*sin_theta;
+            const double qc = q*cos_theta;
+            const double fq = _cyl(core_vd, core_r*qab, core_h*qc)
+                + _cyl(shell_vd, shell_r*qab, shell_h*qc);
+            ag_add(&ag, i, fq * fq * sin_theta);
+        }
     }
-    // translate dx in [-1,1] to dx in [lower,upper]
-    //const double form = (upper-lower)/2.0*total;
-    return 1.0e-4 * total * M_PI_4;
+    return 1.0e-4 * ag.result;
 }
 
 
@@ -123,7 +123,9 @@ parameters = [["sld_core", "1e-6/Ang^2", 4, [-inf, inf], "sld",
                "rotation about beam"],
              ]
 
-source = ["lib/polevl.c", "lib/sas_J1.c", "lib/gauss76.c", "core_shell_cylinder.c"]
+source = ["lib/polevl.c", "lib/sas_J1.c",
+          "lib/gauss76.c", "lib/gauss150.c", "lib/adaptive_gauss.c",
+          "core_shell_cylinder.c"]
 
 def ER(radius, thickness, length):
     """
@@ -54,23 +54,24 @@ Iq(double q,
     const double equat_shell = radius_equat_core + thick_shell;
     const double polar_shell = radius_equat_core*x_core + thick_shell*x_polar_shell;
 
-    // translate from [-1, 1] => [0, 1]
-    const double m = 0.5;
-    const double b = 0.5;
-    double total = 0.0;     //initialize intergral
-    for(int i=0;i<GAUSS_N;i++) {
-        const double cos_theta = GAUSS_Z[i]*m + b;
-        const double sin_theta = sqrt(1.0 - cos_theta*cos_theta);
-        double fq = _cs_ellipsoid_kernel(q*sin_theta, q*cos_theta,
-            radius_equat_core, polar_core,
-            equat_shell, polar_shell,
-            sld_core_shell, sld_shell_solvent);
-        total += GAUSS_W[i] * fq * fq;
+    // adaptive integration over cos(theta) in [0, 1]
+    const double r_max = fmax(equat_shell, polar_shell);
+    AdaptiveGauss ag;
+    ag_init(&ag, 0.0, 1.0, AG_TOLERANCE, q*r_max);
+    while (ag_next(&ag)) {
+        for(int i=0; i<ag.n; i++) {
+            const double cos_theta = ag_node(&ag, i);
+            const double sin_theta = sqrt(1.0 - cos_theta*cos_theta);
+            double fq = _cs_ellipsoid_kernel(q*sin_theta, q*cos_theta,
+                radius_equat_core, polar_core,
+                equat_shell, polar_shell,
+                sld_core_shell, sld_shell_solvent);
+            ag_add(&ag, i, fq * fq);
+        }
     }
-    total *= m;
 
     // convert to [cm-1]
-    return 1.0e-4 * total;
+    return 1.0e-4 * ag.result;
 }
 
 static double
@@ -143,7 +143,7 @@ parameters = [
     ]
 # pylint: enable=bad-whitespace, line-too-long
 
-source = ["lib/sas_3j1x_x.c", "lib/gauss76.c", "core_shell_ellipsoid.c"]
+source = ["lib/sas_3j1x_x.c", "lib/gauss76.c", "lib/gauss150.c", "lib/adaptive_gauss.c", "core_shell_ellipsoid.c"]
 
 def ER(radius_equat_core, x_core, thick_shell, x_polar_shell):
     """
@@ -182,6 +182,8 @@ qy = q*sin(pi/6.0)
 # 11Jan2017 RKH sorted tests after redefinition of angles
 tests = [
     # Accuracy tests based on content in test/utest_coreshellellipsoidXTmodel.py
+    # The value at q=1 is from adaptive quadrature; the 76 point rule used
+    # previously gave 0.00189402.
     [{'radius_equat_core': 200.0,
       'x_core': 0.1,
       'thick_shell': 50.0,
@@ -191,7 +193,7 @@ tests = [
       'sld_solvent': 6.3,
       'background': 0.001,
       'scale': 1.0,
-     }, 1.0, 0.00189402],
+     }, 1.0, 0.00199394],
 
     # Additional tests with larger range of parameters
     [{'background': 0.01}, 0.1, 11.6915],
@@ -57,44 +57,51 @@ Iq(double q,
     const double drB = (brim_sld-solvent_sld);
     const double drC = (crim_sld-solvent_sld);
 
-    // outer integral (with gauss points), integration limits = 0, 1
-    double outer_sum = 0; //initialize integral
-    for( int i=0; i<GAUSS_N; i++) {
-        const double cos_alpha = 0.5 * ( GAUSS_Z[i] + 1.0 );
-        const double mu = half_q * sqrt(1.0-cos_alpha*cos_alpha);
+    // outer integral (adaptive), integration limits = 0, 1
+    const double r_max = 0.5*sqrt(tA*tA + tB*tB + tC*tC);
+    const double r_proj = sqrt(tA*tA + tB*tB);
+    AdaptiveGauss outer;
+    ag_init(&outer, 0.0, 1.0, AG_TOLERANCE, q*r_max);
+    while (ag_next(&outer)) {
+        for( int i=0; i<outer.n; i++) {
+            const double cos_alpha = ag_node(&outer, i);
+            const double mu = half_q * sqrt(1.0-cos_alpha*cos_alpha);
 
-        // inner integral (with gauss points), integration limits = 0, pi/2
-        const double siC = length_c * sas_sinx_x(length_c * cos_alpha * half_q);
-        const double siCt = tC * sas_sinx_x(tC * cos_alpha * half_q);
-        double inner_sum = 0.0;
-        for(int j=0; j<GAUSS_N; j++) {
-            const double beta = 0.5 * ( GAUSS_Z[j] + 1.0 );
-            double sin_beta, cos_beta;
-            SINCOS(M_PI_2*beta, sin_beta, cos_beta);
-            const double siA = length_a * sas_sinx_x(length_a * mu * sin_beta);
-            const double siB = length_b * sas_sinx_x(length_b * mu * cos_beta);
-            const double siAt = tA * sas_sinx_x(tA * mu * sin_beta);
-            const double siBt = tB * sas_sinx_x(tB * mu * cos_beta);
+            // inner integral (adaptive), integration limits = 0, pi/2
+            const double siC = length_c * sas_sinx_x(length_c * cos_alpha * half_q);
+            const double siCt = tC * sas_sinx_x(tC * cos_alpha * half_q);
+            AdaptiveGauss inner;
+            ag_init(&inner, 0.0, 1.0, AG_TOLERANCE, mu*r_proj);
+            while (ag_next(&inner)) {
+                for(int j=0; j<inner.n; j++) {
+                    const double beta = ag_node(&inner, j);
+                    double sin_beta, cos_beta;
+                    SINCOS(M_PI_2*beta, sin_beta, cos_beta);
+                    const double siA = length_a * sas_sinx_x(length_a * mu * sin_beta);
+                    const double siB = length_b * sas_sinx_x(length_b * mu * cos_beta);
+                    const double siAt = tA * sas_sinx_x(tA * mu * sin_beta);
+                    const double siBt = tB * sas_sinx_x(tB * mu * cos_beta);
 
 #if OVERLAPPING
-            const double f = dr0*siA*siB*siC
-                + drA*(siAt-siA)*siB*siC
-                + drB*siAt*(siBt-siB)*siC
-                + drC*siAt*siBt*(siCt-siC);
+                    const double f = dr0*siA*siB*siC
+                        + drA*(siAt-siA)*siB*siC
+                        + drB*siAt*(siBt-siB)*siC
+                        + drC*siAt*siBt*(siCt-siC);
 #else
-            const double f = dr0*siA*siB*siC
-                + drA*(siAt-siA)*siB*siC
-                + drB*siA*(siBt-siB)*siC
-                + drC*siA*siB*(siCt-siC);
+                    const double f = dr0*siA*siB*siC
+                        + drA*(siAt-siA)*siB*siC
+                        + drB*siA*(siBt-siB)*siC
+                        + drC*siA*siB*(siCt-siC);
 #endif
 
-            inner_sum += GAUSS_W[j] * f * f;
+                    ag_add(&inner, j, f * f);
+                }
+            }
+            // now sum up the outer integral
+            ag_add(&outer, i, inner.result);
         }
-        inner_sum *= 0.5;
-        // now sum up the outer integral
-        outer_sum += GAUSS_W[i] * inner_sum;
     }
-    outer_sum *= 0.5;
+    const double outer_sum = outer.result;
 
     //convert from [1e-12 A-1] to [cm-1]
     return 1.0e-4 * outer_sum;
@@ -75,7 +75,19 @@ parameters = [["radius",      "Ang",        60.0, [0, inf],    "volume", "Sphere
               ["sld_solvent", "1e-6/Ang^2", 3.0,  [-inf, inf], "sld",    "Solvent scattering length density"]]
 # pylint: enable=bad-whitespace, line-too-long
 
-source = ["lib/sas_3j1x_x.c", "lib/core_shell.c", "core_shell_sphere.c"]
+source = ["lib/sas_3j1x_x.c", "lib/core_shell.c", "lib/sphere_sesans.c",
+          "core_shell_sphere.c"]
+
+sesans = """
+    const double outer = radius + thickness;
+    const double core_contrast = sld_core - sld_shell;
+    const double shell_contrast = sld_shell - sld_solvent;
+    return 1.0e-4*(
+        square(core_contrast)*sphere_overlap_projection(z, radius, radius)
+        + 2.0*core_contrast*shell_contrast
+            * sphere_overlap_projection(z, radius, outer)
+        + square(shell_contrast)*sphere_overlap_projection(z, outer, outer));
+    """
 
 demo = dict(scale=1, background=0, radius=60, thickness=10,
             sld_core=1.0, sld_shell=2.0, sld_solvent=0.0)
@@ -15,21 +15,21 @@ fq(double qab, double qc, double radius, double length)
 static double
 orient_avg_1D(double q, double radius, double length)
 {
-    // translate a point in [-1,1] to a point in [0, pi/2]
-    const double zm = M_PI_4;
-    const double zb = M_PI_4;
-
-    double total = 0.0;
-    for (int i=0; i<GAUSS_N ;i++) {
-        const double theta = GAUSS_Z[i]*zm + zb;
-        double sin_theta, cos_theta; // slots to hold sincos function output
-        // theta (theta,phi) the projection of the cylinder on the detector plane
-        SINCOS(theta , sin_theta, cos_theta);
-        const double form = fq(q*sin_theta, q*cos_theta, radius, length);
-        total += GAUSS_W[i] * form * form * sin_theta;
+    // adaptive integration over theta in [0, pi/2]
+    const double r_max = sqrt(radius*radius + 0.25*length*length);
+    AdaptiveGauss ag;
+    ag_init(&ag, 0.0, M_PI_2, AG_TOLERANCE, q*r_max);
+    while (ag_next(&ag)) {
+        for (int i=0; i<ag.n; i++) {
+            const double theta = ag_node(&ag, i);
+            double sin_theta, cos_theta; // slots to hold sincos function output
+            // theta (theta,phi) the projection of the cylinder on the detector plane
+            SINCOS(theta , sin_theta, cos_theta);
+            const double form = fq(q*sin_theta, q*cos_theta, radius, length);
+            ag_add(&ag, i, form * form * sin_theta);
+        }
     }
-    // translate dx in [-1,1] to dx in [lower,upper]
-    return total*zm;
+    return ag.result;
 }
 
 static double
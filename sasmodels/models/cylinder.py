@@ -136,7 +136,9 @@ parameters = [["sld", "1e-6/Ang^2", 4, [-inf, inf], "sld",
                "rotation about beam"],
              ]
 
-source = ["lib/polevl.c", "lib/sas_J1.c", "lib/gauss76.c", "cylinder.c"]
+source = ["lib/polevl.c", "lib/sas_J1.c",
+          "lib/gauss76.c", "lib/gauss150.c", "lib/adaptive_gauss.c",
+          "cylinder.c"]
 
 def ER(radius, length):
     """
@@ -20,19 +20,19 @@ Iq(double q,
     //     i(h) = int_0^1 Phi^2(h a sqrt(1 + u^2(v^2-1)) du
     const double v_square_minus_one = square(radius_polar/radius_equatorial) - 1.0;
 
-    // translate a point in [-1,1] to a point in [0, 1]
-    // const double u = GAUSS_Z[i]*(upper-lower)/2 + (upper+lower)/2;
-    const double zm = 0.5;
-    const double zb = 0.5;
-    double total = 0.0;
-    for (int i=0;i<GAUSS_N;i++) {
-        const double u = GAUSS_Z[i]*zm + zb;
-        const double r = radius_equatorial*sqrt(1.0 + u*u*v_square_minus_one);
-        const double f = sas_3j1x_x(q*r);
-        total += GAUSS_W[i] * f * f;
+    // adaptive integration over u in [0, 1]
+    const double r_max = fmax(radius_polar, radius_equatorial);
+    AdaptiveGauss ag;
+    ag_init(&ag, 0.0, 1.0, AG_TOLERANCE, q*r_max);
+    while (ag_next(&ag)) {
+        for (int i=0; i<ag.n; i++) {
+            const double u = ag_node(&ag, i);
+            const double r = radius_equatorial*sqrt(1.0 + u*u*v_square_minus_one);
+            const double f = sas_3j1x_x(q*r);
+            ag_add(&ag, i, f * f);
+        }
     }
-    // translate dx in [-1,1] to dx in [lower,upper]
-    const double form = total*zm;
+    const double form = ag.result;
     const double s = (sld - sld_solvent) * form_volume(radius_polar, radius_equatorial);
     return 1.0e-4 * s * s * form;
 }
@@ -160,7 +160,7 @@ parameters = [["sld", "1e-6/Ang^2", 4, [-inf, inf], "sld",
                "rotation about beam"],
              ]
 
-source = ["lib/sas_3j1x_x.c", "lib/gauss76.c", "ellipsoid.c"]
+source = ["lib/sas_3j1x_x.c", "lib/gauss76.c", "lib/gauss150.c", "lib/adaptive_gauss.c", "ellipsoid.c"]
 
 def ER(radius_polar, radius_equatorial):
     # see equation (26) in A.Isihara, J.Chem.Phys. 18(1950)1446-1449
@@ -0,0 +1,190 @@
+/*******************************************************************
+
+Adaptive Gaussian quadrature with error control
+
+Integrates over [lower, upper] with a sequence of increasingly accurate
+rules:
+
+    level 0: 15 point Kronrod rule
+    level 1: 76 point Gauss-Legendre rule
+    level 2: 150 point Gauss-Legendre rule
+    level 3+: 150 point rule on 2, 4, 8, ... equal panels, up to
+             AG_MAX_PANELS panels
+
+The caller gives *qr*, the product of q and the largest distance from the
+center of the shape to its surface, which bounds the number of oscillations
+of the integrand.  For the orientation averages the 15 point rule is
+accurate to 1e-12 for qr below AG_KRONROD_QR, and the 76 point rule is
+accurate to 1e-11 for qr below AG_FIXED_QR, so at low q the integral is the
+result of the first of these rules which is accurate enough, with no
+further evaluations to check it.
+
+For higher qr the sequence starts at the 76 point rule and stops when two
+successive rules agree.  Each rule has several times the polynomial degree
+of the one before, so for smooth integrands the error of the new rule is
+roughly the square of the relative difference from the previous rule.  The
+new rule is accepted when that squared difference is below *tolerance*.
+Oscillatory integrands at high q get as many points as they need, up to the
+panel limit.
+
+Models pass AG_TOLERANCE as the tolerance.  It defaults to 1e-8 in double
+precision and 1e-5 in single precision, and can be changed with the
+*tolerance* option when the model is built (see sasmodels.core.build_model).
+
+The rules only need a fixed amount of state, with no recursion and no
+function pointers, so this works under OpenCL.  Instead of passing in the
+integrand, the caller evaluates it at the nodes of each rule in turn:
+
+    AdaptiveGauss ag;
+    ag_init(&ag, lower, upper, AG_TOLERANCE, q*r_max);
+    while (ag_next(&ag)) {
+        for (int i=0; i<ag.n; i++) {
+            const double x = ag_node(&ag, i);
+            ag_add(&ag, i, f(x));
+        }
+    }
+    const double integral = ag.result;
+
+After the loop *evaluations* is the total number of integrand evaluations.
+
+Requires lib/gauss76.c and lib/gauss150.c.
+
+********************************************************************/
+
+#ifndef AG_TOLERANCE
+# if FLOAT_SIZE>4
+#  define AG_TOLERANCE 1e-8
+# else
+#  define AG_TOLERANCE 1e-5
+# endif
+#endif
+#ifndef AG_MAX_PANELS
+# define AG_MAX_PANELS 16
+#endif
+#ifndef AG_KRONROD_QR
+# define AG_KRONROD_QR 4.0
+#endif
+#ifndef AG_FIXED_QR
+# define AG_FIXED_QR 70.0
+#endif
+
+// 15 point Kronrod nodes and weights on [-1, 1].
+constant double Kronrod15Z[15] = {
+    -0.991455371120812639206854697526329,
+    -0.949107912342758524526189684047851,
+    -0.864864423359769072789712788640926,
+    -0.741531185599394439863864773280788,
+    -0.586087235467691130294144845693013,
+    -0.405845151377397166906606412076961,
+    -0.207784955007898467600689403773245,
+    0.000000000000000000000000000000000,
+    0.207784955007898467600689403773245,
+    0.405845151377397166906606412076961,
+    0.586087235467691130294144845693013,
+    0.741531185599394439863864773280788,
+    0.864864423359769072789712788640926,
+    0.949107912342758524526189684047851,
+    0.991455371120812639206854697526329,
+};
+constant double Kronrod15Wt[15] = {
+    0.022935322010529224963732008058970,
+    0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518,
+    0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550,
+    0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649,
+    0.209482141084727828012999174891714,
+    0.204432940075298892414161999234649,
+    0.190350578064785409913256402421014,
+    0.169004726639267902826583426598550,
+    0.140653259715525918745189590510238,
+    0.104790010322250183839876322541518,
+    0.063092092629978553290700663189204,
+    0.022935322010529224963732008058970,
+};
+
+typedef struct {
+    double lower, upper;
+    double tolerance;
+    double result;      // integral from the most recent rule
+    double previous;    // integral from the rule before
+    double sum;         // weighted sum for the current rule
+    int level;          // current rule in the sequence
+    int panels;         // number of panels for the current rule
+    int n;              // number of nodes in the current rule
+    int evaluations;    // total evaluations so far
+    int fixed;          // accept the first rule without checking it
+} AdaptiveGauss;
+
+static void
+ag_init(AdaptiveGauss *ag, double lower, double upper, double tolerance,
+        double qr)
+{
+    ag->lower = lower;
+    ag->upper = upper;
+    ag->tolerance = tolerance;
+    ag->fixed = (qr < AG_FIXED_QR);
+    ag->result = ag->previous = ag->sum = 0.0;
+    // Skip the 15 point rule where it is not accurate.
+    ag->level = (qr < AG_KRONROD_QR ? -1 : 0);
+    ag->panels = 1;
+    ag->n = 0;
+    ag->evaluations = 0;
+}
+
+static double
+ag_node(const AdaptiveGauss *ag, int i)
+{
+    const double half_width = 0.5*(ag->upper - ag->lower)/ag->panels;
+    if (ag->level == 0) {
+        return ag->lower + half_width*(Kronrod15Z[i] + 1.0);
+    } else if (ag->level == 1) {
+        return ag->lower + half_width*(Gauss76Z[i] + 1.0);
+    } else {
+        const int panel = i/150;
+        return ag->lower + half_width*(Gauss150Z[i - 150*panel] + 1.0 + 2.0*panel);
+    }
+}
+
+static void
+ag_add(AdaptiveGauss *ag, int i, double value)
+{
+    if (ag->level == 0) {
+        ag->sum += Kronrod15Wt[i]*value;
+    } else if (ag->level == 1) {
+        ag->sum += Gauss76Wt[i]*value;
+    } else {
+        ag->sum += Gauss150Wt[i - 150*(i/150)]*value;
+    }
+}
+
+// Finish the rule that was just evaluated, then set up the next rule if
+// the result has not converged.  Returns zero when done.
+static int
+ag_next(AdaptiveGauss *ag)
+{
+    if (ag->n > 0) {
+        const double half_width = 0.5*(ag->upper - ag->lower)/ag->panels;
+        ag->previous = ag->result;
+        ag->result = ag->sum*half_width;
+        ag->evaluations += ag->n;
+        const double change = ag->result - ag->previous;
+        if (ag->fixed
+                || change*change <= ag->tolerance*ag->result*ag->result
+                || ag->panels >= AG_MAX_PANELS) {
+            return 0;
+        }
+    }
+    ag->level++;
+    ag->sum = 0.0;
+    if (ag->level == 0) {
+        ag->n = 15;
+    } else if (ag->level == 1) {
+        ag->n = 76;
+    } else {
+        ag->panels = (ag->level == 2 ? 1 : 2*ag->panels);
+        ag->n = 150*ag->panels;
+    }
+    return 1;
+}
@@ -0,0 +1,59 @@
+double sphere_overlap_projection(double z, double a, double b);
+
+/*******************************************************************
+
+sphere_overlap_projection
+
+Projected correlation function of a pair of concentric spheres for SESANS,
+used by sphere and core_shell_sphere.
+
+Spheres of radius a and b with centres a distance r apart overlap in
+a volume
+
+    V(r) = 4/3 pi min(a,b)^3                                for r < |b-a|
+    V(r) = pi/12 (r^3 - 3 (s^2+d^2) r + 2 s^3 + 6 s d^2 - 3 d^2 s^2/r)
+                                                        for |b-a| < r < a+b
+
+with s = a+b and d = b-a, and zero beyond a+b.  The Fourier transform of
+V(r) is V_a V_b 3j1(qa)/(qa) 3j1(qb)/(qb), so the correlation function of
+I(q) = 1e-4 (sld V 3j1(qr)/(qr))^2 is 1e-4 sld^2 V(r).  The SESANS
+correlation function G(z) at spin echo length z is the integral of this
+along the beam, which is computed here in closed form.
+
+********************************************************************/
+static double
+_sphere_overlap_integral(double x, double z, double A, double B, double C)
+{
+    // Integral from 0 to x of pi/12 (r^3 - 3 A r + B - C/r) with
+    // r = sqrt(x^2 + z^2).  The log terms vanish when x = z = 0 since
+    // C = 0 whenever the inner region reaches the origin.
+    const double z2 = z*z;
+    const double r = sqrt(x*x + z2);
+    const double log_xr = (x + r > 0.0 ? log(x + r) : 0.0);
+    const double int_r3 = 0.25*x*r*r*r + 0.375*z2*x*r + 0.375*z2*z2*log_xr;
+    const double int_r = 0.5*x*r + 0.5*z2*log_xr;
+    return M_PI/12.0*(int_r3 - 3.0*A*int_r + B*x - C*log_xr);
+}
+
+double sphere_overlap_projection(double z, double a, double b)
+{
+    const double s = a + b;
+    const double d = fabs(b - a);
+    z = fabs(z);
+    if (z >= s) {
+        return 0.0;
+    }
+    const double A = s*s + d*d;
+    const double B = 2.0*s*s*s + 6.0*s*d*d;
+    const double C = 3.0*d*d*s*s;
+    const double x_outer = sqrt(s*s - z*z);
+    const double outer = _sphere_overlap_integral(x_outer, z, A, B, C);
+    if (z >= d) {
+        return 2.0*(outer - _sphere_overlap_integral(0.0, z, A, B, C));
+    } else {
+        // the smaller sphere lies entirely inside the larger one
+        const double x_inner = sqrt(d*d - z*z);
+        const double inner = _sphere_overlap_integral(x_inner, z, A, B, C);
+        return 2.0*(M_4PI_3*cube(fmin(a, b))*x_inner + outer - inner);
+    }
+}
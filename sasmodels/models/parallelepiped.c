@@ -19,30 +19,37 @@ Iq(double q,
     const double a_scaled = length_a / length_b;
     const double c_scaled = length_c / length_b;
 
-    // outer integral (with gauss points), integration limits = 0, 1
-    double outer_total = 0; //initialize integral
+    // outer integral (adaptive), integration limits = 0, 1
+    const double r_max = 0.5*sqrt(length_a*length_a + length_b*length_b
+                                  + length_c*length_c);
+    const double r_proj = sqrt(a_scaled*a_scaled + 1.0);
+    AdaptiveGauss outer;
+    ag_init(&outer, 0.0, 1.0, AG_TOLERANCE, q*r_max);
+    while (ag_next(&outer)) {
+        for( int i=0; i<outer.n; i++) {
+            const double sigma = ag_node(&outer, i);
+            const double mu_proj = mu * sqrt(1.0-sigma*sigma);
 
-    for( int i=0; i<GAUSS_N; i++) {
-        const double sigma = 0.5 * ( GAUSS_Z[i] + 1.0 );
-        const double mu_proj = mu * sqrt(1.0-sigma*sigma);
+            // inner integral (adaptive), integration limits = 0, 1
+            // corresponding to angles from 0 to pi/2.
+            AdaptiveGauss inner;
+            ag_init(&inner, 0.0, 1.0, AG_TOLERANCE, mu_proj*r_proj);
+            while (ag_next(&inner)) {
+                for(int j=0; j<inner.n; j++) {
+                    const double uu = ag_node(&inner, j);
+                    double sin_uu, cos_uu;
+                    SINCOS(M_PI_2*uu, sin_uu, cos_uu);
+                    const double si1 = sas_sinx_x(mu_proj * sin_uu * a_scaled);
+                    const double si2 = sas_sinx_x(mu_proj * cos_uu);
+                    ag_add(&inner, j, square(si1 * si2));
+                }
+            }
 
-        // inner integral (with gauss points), integration limits = 0, 1
-        // corresponding to angles from 0 to pi/2.
-        double inner_total = 0.0;
-        for(int j=0; j<GAUSS_N; j++) {
-            const double uu = 0.5 * ( GAUSS_Z[j] + 1.0 );
-            double sin_uu, cos_uu;
-            SINCOS(M_PI_2*uu, sin_uu, cos_uu);
-            const double si1 = sas_sinx_x(mu_proj * sin_uu * a_scaled);
-            const double si2 = sas_sinx_x(mu_proj * cos_uu);
-            inner_total += GAUSS_W[j] * square(si1 * si2);
+            const double si = sas_sinx_x(mu * c_scaled * sigma);
+            ag_add(&outer, i, inner.result * si * si);
         }
-        inner_total *= 0.5;
-
-        const double si = sas_sinx_x(mu * c_scaled * sigma);
-        outer_total += GAUSS_W[i] * inner_total * si * si;
     }
-    outer_total *= 0.5;
+    const double outer_total = outer.result;
 
     // Multiply by contrast^2 and convert from [1e-12 A-1] to [cm-1]
     const double V = form_volume(length_a, length_b, length_c);
@@ -210,7 +210,7 @@ parameters = [["sld", "1e-6/Ang^2", 4, [-inf, inf], "sld",
                "rotation about c axis"],
              ]
 
-source = ["lib/gauss76.c", "parallelepiped.c"]
+source = ["lib/gauss76.c", "lib/gauss150.c", "lib/adaptive_gauss.c", "parallelepiped.c"]
 
 def ER(length_a, length_b, length_c):
     """
@@ -66,7 +66,7 @@ parameters = [["sld", "1e-6/Ang^2", 1, [-inf, inf], "sld",
                "Sphere radius"],
              ]
 
-source = ["lib/sas_3j1x_x.c", "lib/sphere_form.c"]
+source = ["lib/sas_3j1x_x.c", "lib/sphere_form.c", "lib/sphere_sesans.c"]
 
 # No volume normalization despite having a volume parameter
 # This should perhaps be volume normalized?
@@ -78,6 +78,11 @@ Iq = """
     return sphere_form(q, radius, sld, sld_solvent);
     """
 
+sesans = """
+    return 1.0e-4*square(sld - sld_solvent)
+        * sphere_overlap_projection(z, radius, radius);
+    """
+
 def ER(radius):
     """
     Return equivalent radius (ER)
@@ -0,0 +1,529 @@
+"""
+Sparse Dispersity Integration
+=============================
+
+The default dispersity calculation evaluates the model on the full tensor
+product of the distributions for each polydisperse parameter.  With three
+to five polydisperse parameters (e.g., radius, length and thickness along
+with orientation jitter) this can require $35^3$ to $35^5$ evaluations for
+each $q$, which is too slow for fitting.  This module provides integration
+schemes which sample the joint distribution with far fewer points.  Each
+one sends a list of points to the kernel (see
+:func:`sasmodels.details.make_point_kernel_args`) rather than a tensor
+product mesh.
+
+:class:`SobolMesh` uses randomized quasi-Monte Carlo integration over
+scrambled Sobol' sequences.  The points are drawn from the discrete
+distributions returned by :func:`sasmodels.weights.get_weights`, so the
+result converges to the full tensor product result.  The error estimate
+comes from independent scrambles of the sequence.
+
+:class:`SmolyakMesh` uses Smolyak sparse grids built from Gaussian
+quadrature rules for each of the dispersity distributions.  This is very
+efficient when the model varies smoothly over the distribution, but needs
+a high level when it oscillates, as it does for size distributions at high
+$q$.  The error estimate is the difference from the next lower level
+sparse grid, which is only reliable once the level is high enough.
+
+For oriented models, :class:`JitterGaussMesh` replaces the *theta* and
+*phi* jitter distributions with Gaussian quadrature rules for the same
+distributions, giving a smaller theta/phi mesh.  For a few degrees of
+jitter it is more accurate than an equally spaced mesh with twice the
+points, but for wide jitter it needs about as many points as the full
+mesh.
+
+Use an instance of any of these classes as the *pd_mesh* argument to
+:func:`sasmodels.direct_model.call_kernel`, or to :class:`DirectModel
+<sasmodels.direct_model.DirectModel>` or :class:`Experiment
+<sasmodels.bumps_model.Experiment>`.  After each evaluation, *error* holds
+the estimated absolute error in $I(q)$ and *num_points* the number of
+points sent to the kernel.
+"""
+from __future__ import division, print_function
+
+from itertools import product as cross
+
+import numpy as np  # type: ignore
+from scipy.special import comb  # type: ignore
+
+from .details import make_kernel_args, make_point_kernel_args
+
+# pylint: disable=unused-import
+try:
+    from typing import List, Tuple, Optional, Callable
+except ImportError:
+    pass
+else:
+    from .kernel import Kernel
+    Mesh = List[Tuple[float, np.ndarray, np.ndarray]]
+# pylint: enable=unused-import
+
+
+def _active_distributions(kernel, mesh):
+    # type: (Kernel, Mesh) -> Tuple[List[int], List[np.ndarray], List[np.ndarray]]
+    """
+    Return the indices, values and weights for the polydisperse parameters
+    in *mesh*, not including scale and background.
+
+    Returns an empty list of indices if the full mesh should be used
+    instead, either because the model is a composite model or because
+    there is no dispersity.
+    """
+    npars = kernel.info.parameters.npars
+    pd = mesh[2:npars+2]
+    active = [k for k, (_v, _d, w) in enumerate(pd) if len(w) > 1]
+    if (kernel.info.composition is not None
+            or any(len(w) == 0 for _v, _d, w in pd)):
+        active = []
+    values = [np.asarray(pd[k][1], 'd') for k in active]
+    weights = [np.asarray(pd[k][2], 'd') for k in active]
+    return active, values, weights
+
+
+def _call_points(kernel, mesh, cutoff, active, values, weight):
+    # type: (Kernel, Mesh, float, List[int], List[np.ndarray], np.ndarray) -> np.ndarray
+    """
+    Evaluate *kernel* on the list of points.
+    """
+    call_details, data, is_magnetic = make_point_kernel_args(
+        kernel, mesh, active, values, weight)
+    return kernel(call_details, data, cutoff, is_magnetic)
+
+
+def _call_full(kernel, mesh, cutoff):
+    # type: (Kernel, Mesh, float) -> np.ndarray
+    """
+    Evaluate *kernel* on the full tensor product mesh.
+    """
+    call_details, data, is_magnetic = make_kernel_args(kernel, mesh)
+    return kernel(call_details, data, cutoff, is_magnetic)
+
+
+class SobolMesh(object):
+    """
+    Randomized quasi-Monte Carlo integration over the dispersity mesh.
+
+    *npts* is the total number of sample points.  It is divided between
+    *replicates* independent scrambles of the Sobol' sequence, each rounded
+    up to a power of two.  The result is the average over the replicates,
+    and *error* is the standard error of that average.
+
+    *seed* initializes the random number generator used for scrambling.
+    With a fixed seed the same points are used for each evaluation, which
+    keeps the fit surface smooth.  If *seed* is None, a new set of points is
+    drawn for each evaluation.
+
+    Points are drawn from the discrete distributions in the dispersity
+    mesh, and duplicate points are combined.  For low dimensional meshes
+    this can leave fewer points than requested.
+
+    Requires *scipy.stats.qmc*, which is available in scipy 1.7 and above.
+    """
+    def __init__(self, npts=256, replicates=4, seed=1):
+        # type: (int, int, Optional[int]) -> None
+        self.npts = npts
+        self.replicates = replicates
+        self.seed = seed
+        self.error = None  # type: np.ndarray
+        self.num_points = 0
+
+    def integrate(self, kernel, mesh, cutoff=0.):
+        # type: (Kernel, Mesh, float) -> np.ndarray
+        """
+        Evaluate *kernel* at the Sobol' points for *mesh*.
+        """
+        from scipy.stats import qmc  # type: ignore
+
+        active, values, weights = _active_distributions(kernel, mesh)
+        if not active:
+            self.num_points = 0
+            result = _call_full(kernel, mesh, cutoff)
+            self.error = np.zeros_like(result)
+            return result
+
+        # Inverse cumulative distribution for each discrete distribution.
+        cdf = [np.cumsum(w)/np.sum(w) for w in weights]
+        per_replicate = max(self.npts//self.replicates, 1)
+        m = int(np.ceil(np.log2(per_replicate)))
+        rng = np.random.RandomState(self.seed)
+        results = []
+        self.num_points = 0
+        for _ in range(self.replicates):
+            seed = rng.randint(2**31)
+            sampler = qmc.Sobol(d=len(active), scramble=True, seed=seed)
+            u = sampler.random_base2(m)
+            index = np.array([
+                np.minimum(np.searchsorted(c, u[:, j], side='right'), len(c)-1)
+                for j, c in enumerate(cdf)])
+            # Combine repeated points, weighting by the number of repeats.
+            # The counts are at least one, so no point falls below the
+            # weight cutoff; the points are already distributed according
+            # to the dispersity weights.
+            index, counts = np.unique(index.T, axis=0, return_counts=True)
+            point_values = [v[index[:, j]] for j, v in enumerate(values)]
+            weight = counts.astype('d')
+            self.num_points += len(weight)
+            results.append(_call_points(kernel, mesh, cutoff, active,
+                                        point_values, weight))
+        results = np.array(results)
+        self.error = np.std(results, axis=0, ddof=1)/np.sqrt(len(results))
+        return np.mean(results, axis=0)
+
+
+class SmolyakMesh(object):
+    r"""
+    Smolyak sparse grid integration over the dispersity mesh.
+
+    *level* controls the accuracy of the sparse grid.  Level 0 evaluates
+    the model at the mean of the distributions.  Each level adds two
+    quadrature points along every dimension, so level $L$ integrates
+    polynomials of total degree $2L+1$ exactly.  Level 2 or 3 is usually
+    sufficient for models which vary smoothly over the distributions.
+
+    Size distributions make the pattern oscillate across the distribution
+    at high $q$.  For a parameter with width $\sigma$ sampled over
+    $\pm n_\sigma \sigma$, there are about $m = q n_\sigma \sigma/\pi$
+    periods of oscillation across the distribution at $q$.  The sparse grid
+    is only accurate once it resolves them, which for a cylinder with
+    radius and length dispersity takes roughly $L \ge m/1.5$ for 1%
+    accuracy and $L \ge m$ for 0.1% at the largest $q$.  For example, a
+    length of 500 with 10% dispersity has $m = 4.8$ at $q = 0.1$, needing
+    level 4 or 5, but $m = 14$ at $q = 0.3$, needing level 10 or more,
+    which is more points than the full 35 x 35 mesh.  Use
+    :class:`SobolMesh` when the level needed gives too many points.
+
+    The one dimensional rules are Gaussian quadrature rules computed for
+    the discrete distribution of each parameter, so the nodes are always
+    within the range of the distribution.  Sparse grid weights can be
+    negative, so the weight *cutoff* is not used.
+
+    If *estimate_error* is True, the model is also evaluated on the
+    level $L-1$ grid, and *error* is the absolute difference between the
+    two results.  This increases the cost by the size of the smaller grid.
+    The difference measures the error in the level $L-1$ result.  Once the
+    level is high enough to resolve the oscillations, the largest relative
+    error estimate over $q$ overstates the largest error, though at some
+    $q$ the two results can agree by chance.  Below that level it is not a
+    bound, and can understate the error several times over.
+    """
+    def __init__(self, level=2, estimate_error=True):
+        # type: (int, bool) -> None
+        self.level = level
+        self.estimate_error = estimate_error
+        self.error = None  # type: np.ndarray
+        self.num_points = 0
+
+    def integrate(self, kernel, mesh, cutoff=0.):
+        # type: (Kernel, Mesh, float) -> np.ndarray
+        """
+        Evaluate *kernel* on the sparse grid for *mesh*.
+        """
+        active, values, weights = _active_distributions(kernel, mesh)
+        if not active:
+            self.num_points = 0
+            result = _call_full(kernel, mesh, cutoff)
+            self.error = np.zeros_like(result)
+            return result
+
+        rules = [_RuleSet(v, w) for v, w in zip(values, weights)]
+        points, weight = smolyak_grid(rules, self.level)
+        self.num_points = len(weight)
+        result = _call_points(kernel, mesh, -np.inf, active, points, weight)
+        if self.estimate_error and self.level > 0:
+            points, weight = smolyak_grid(rules, self.level - 1)
+            self.num_points += len(weight)
+            lower = _call_points(kernel, mesh, -np.inf, active, points, weight)
+            self.error = abs(result - lower)
+        else:
+            self.error = np.full_like(result, np.nan)
+        return result
+
+
+class JitterGaussMesh(object):
+    r"""
+    Reduced theta/phi mesh for orientation jitter using Gaussian quadrature.
+
+    The *theta* and *phi* jitter distributions of the mesh are each replaced
+    by the $n \approx \sqrt{npts}$ point Gaussian quadrature rule for the
+    discrete distribution (see :func:`discrete_gauss`), and the model is
+    evaluated on the $n \times n$ tensor product of the two rules.  This is
+    a coarser theta/phi mesh with the nodes and weights chosen to integrate
+    polynomials exactly, so it converges to the full mesh result, including
+    the truncation of the distributions at *nsigmas*.  The kernel applies
+    the projection correction to each point as it does for the mesh.  Other
+    dispersity parameters, including *psi* jitter, are integrated over
+    their full distributions as usual.
+
+    The rule is accurate while the scattering varies smoothly across the
+    jitter, and poor once it oscillates.  For a cylinder of length 300 with
+    $|q| < 0.3$, relative to the 35 x 35 mesh, the default 100 points are
+    within 0.002% for 3 degrees of Gaussian jitter and about 1% for 5
+    degrees, where a 15 x 15 mesh of 225 points is 1.6% and 2.5% off.  For
+    10 degrees the 100 points are over 50% off against 6% for the mesh,
+    and *npts=400* is needed to get within 0.1%.  Rectangular jitter
+    favours the rule even more, since a 15 point rectangle is a different
+    distribution from a 35 point one.
+
+    Unoriented models, composite models and models without both *theta*
+    and *phi* jitter use the full mesh instead.
+
+    If *estimate_error* is True, the model is also evaluated with half the
+    number of points, and *error* is the absolute difference between the
+    two results.  This adds half again to the cost, and is included in
+    *num_points*.  The estimate is the error of the smaller rule, so it
+    overstates the error of the result, often by orders of magnitude.
+    """
+    def __init__(self, npts=100, estimate_error=True):
+        # type: (int, bool) -> None
+        self.npts = npts
+        self.estimate_error = estimate_error
+        self.error = None  # type: np.ndarray
+        self.num_points = 0
+
+    def integrate(self, kernel, mesh, cutoff=0.):
+        # type: (Kernel, Mesh, float) -> np.ndarray
+        """
+        Evaluate *kernel* on the jitter rule for *mesh*.
+        """
+        active, values, weights = _active_distributions(kernel, mesh)
+        theta = kernel.info.parameters.theta_offset
+        if theta < 0 or theta not in active or theta+1 not in active:
+            self.num_points = 0
+            result = _call_full(kernel, mesh, cutoff)
+            self.error = np.zeros_like(result)
+            return result
+
+        others = [j for j, k in enumerate(active) if k not in (theta, theta+1)]
+        jitter = [(values[active.index(k)], weights[active.index(k)])
+                  for k in (theta, theta+1)]
+        pd_par = [active[j] for j in others] + [theta, theta+1]
+        values = [values[j] for j in others]
+        weights = [weights[j] for j in others]
+        self.num_points = 0
+        result = self._call(kernel, mesh, cutoff, pd_par, jitter, self.npts,
+                            values, weights)
+        if self.estimate_error:
+            lower = self._call(kernel, mesh, cutoff, pd_par, jitter,
+                               self.npts//2, values, weights)
+            self.error = abs(result - lower)
+        else:
+            self.error = np.full_like(result, np.nan)
+        return result
+
+    def _call(self, kernel, mesh, cutoff, pd_par, jitter, npts,
+              values, weights):
+        # type: (Kernel, Mesh, float, List[int], List[Tuple[np.ndarray, np.ndarray]], int, List[np.ndarray], List[np.ndarray]) -> np.ndarray
+        # A rule with n points for each of theta and phi.
+        n = max(int(round(np.sqrt(npts))), 1)
+        (dtheta, theta_weight), (dphi, phi_weight) = [
+            discrete_gauss(x, w, n) for x, w in jitter]
+        dtheta, dphi = [v.flatten() for v in np.meshgrid(dtheta, dphi,
+                                                          indexing='ij')]
+        weight = np.outer(theta_weight, phi_weight).flatten()
+
+        # Tensor product of the other dispersity parameters with the jitter.
+        index = [v.flatten() for v in np.meshgrid(
+            *[np.arange(len(w)) for w in weights + [weight]], indexing='ij')]
+        point_values = [v[k] for v, k in zip(values, index)]
+        point_values += [dtheta[index[-1]], dphi[index[-1]]]
+        point_weight = np.prod([w[k] for w, k in zip(weights + [weight], index)],
+                               axis=0)
+        self.num_points += len(point_weight)
+        return _call_points(kernel, mesh, cutoff, pd_par, point_values,
+                            point_weight)
+
+
+class _RuleSet(object):
+    """
+    Gaussian quadrature rules of increasing order for a discrete
+    distribution, cached by level.
+    """
+    def __init__(self, values, weights):
+        # type: (np.ndarray, np.ndarray) -> None
+        self.values = values
+        self.weights = weights/np.sum(weights)
+        self._rules = {}
+
+    def __call__(self, level):
+        # type: (int) -> Tuple[np.ndarray, np.ndarray]
+        """
+        Return the nodes and weights of the rule for *level* >= 1, which
+        has $2 level - 1$ nodes, or all the points of the distribution if
+        there are fewer.
+        """
+        if level not in self._rules:
+            npts = min(2*level - 1, len(self.values))
+            self._rules[level] = discrete_gauss(self.values, self.weights, npts)
+        return self._rules[level]
+
+
+def discrete_gauss(x, w, n):
+    # type: (np.ndarray, np.ndarray, int) -> Tuple[np.ndarray, np.ndarray]
+    """
+    Return the nodes and weights of the *n* point Gaussian quadrature rule
+    for the discrete distribution with points *x* and weights *w*.
+
+    The recurrence coefficients for the orthogonal polynomials are computed
+    using the Stieltjes procedure, and the nodes and weights are found from
+    the eigenvalues of the resulting Jacobi matrix.  The rule integrates
+    polynomials of degree $2n-1$ over the distribution exactly.  The
+    weights are normalized to sum to one.
+    """
+    w = w/np.sum(w)
+    if n >= len(x):
+        return x, w
+    # Center and scale x for numerical stability.
+    center, scale = np.sum(w*x), np.ptp(x)/2
+    t = (x - center)/scale
+    alpha, beta = np.zeros(n), np.zeros(n)
+    p_prev, p = np.zeros_like(t), np.ones_like(t)
+    for k in range(n):
+        alpha[k] = np.sum(w*t*p*p)
+        p_next = (t - alpha[k])*p - beta[k]*p_prev
+        if k+1 < n:
+            beta[k+1] = np.sqrt(np.sum(w*p_next*p_next))
+            p_prev, p = p, p_next/beta[k+1]
+    jacobi = np.diag(alpha) + np.diag(beta[1:], 1) + np.diag(beta[1:], -1)
+    nodes, vectors = np.linalg.eigh(jacobi)
+    return center + scale*nodes, vectors[0]**2
+
+
+def smolyak_grid(rules, level):
+    # type: (List[Callable[[int], Tuple[np.ndarray, np.ndarray]]], int) -> Tuple[List[np.ndarray], np.ndarray]
+    """
+    Return the points and weights of the Smolyak sparse grid of *level*.
+
+    *rules* is a list with one function for each dimension, which returns
+    the one dimensional quadrature *(nodes, weights)* for a given level,
+    starting from level 1.
+
+    Returns a list of node values for each dimension and the weight of each
+    point.  Repeated points are combined, and their weights summed.
+    """
+    dim = len(rules)
+    q = level + dim
+    grids = []
+    for levels in cross(range(1, level+2), repeat=dim):
+        norm = sum(levels)
+        if norm > q or norm < max(dim, q - dim + 1):
+            continue
+        coeff = (-1)**(q - norm) * comb(dim - 1, q - norm, exact=True)
+        nodes, weights = zip(*[rule(k) for rule, k in zip(rules, levels)])
+        points = [v.flatten() for v in np.meshgrid(*nodes, indexing='ij')]
+        weight = np.prod([v.flatten()
+                          for v in np.meshgrid(*weights, indexing='ij')],
+                         axis=0)
+        grids.append((np.array(points), coeff*weight))
+    points = np.hstack([p for p, _ in grids])
+    weight = np.hstack([w for _, w in grids])
+    unique, inverse = np.unique(points.T, axis=0, return_inverse=True)
+    weight = np.bincount(inverse.flatten(), weights=weight)
+    keep = abs(weight) > 1e-14*np.max(abs(weight))
+    return list(unique[keep].T), weight[keep]
+
+
+def test_smolyak():
+    """
+    Check that the sparse grid integrates low order polynomials exactly.
+    """
+    x = np.linspace(-3, 3, 35)
+    w = np.exp(-0.5*x**2)
+    w /= np.sum(w)
+    rules = [_RuleSet(x, w), _RuleSet(2*x + 5, w), _RuleSet(x, w)]
+    points, weight = smolyak_grid(rules, 2)
+    # sum of weights and moments of the tensor product distribution
+    assert abs(np.sum(weight) - 1) < 1e-12
+    second = np.sum(w*x**2)
+    fourth = np.sum(w*x**4)
+    assert abs(np.sum(weight*points[0]**2) - second) < 1e-12
+    assert abs(np.sum(weight*points[1]) - 5) < 1e-12
+    assert abs(np.sum(weight*points[0]**2*points[2]**2) - second**2) < 1e-12
+    assert abs(np.sum(weight*points[2]**4) - fourth) < 1e-10
+    # far fewer points than the full tensor product
+    assert len(weight) < 35**3//100
+
+
+def test_smolyak_kernel():
+    """
+    Check the sparse grid against the full mesh for an oscillating model.
+    """
+    from .core import load_model
+    from .direct_model import call_kernel
+
+    model = load_model('cylinder', dtype='double', platform='dll')
+    pars = dict(radius=50, length=500, radius_pd=0.1, radius_pd_n=35,
+                length_pd=0.1, length_pd_n=35)
+    # About m = 0.1*3*50/pi = 4.8 periods across the length distribution.
+    q = np.logspace(-3, -1, 50)
+    kernel = model.make_kernel([q])
+    full = call_kernel(kernel, pars)
+    mesh = SmolyakMesh(level=4)
+    result = call_kernel(kernel, pars, pd_mesh=mesh)
+    # At a level which resolves the oscillations the result is accurate,
+    # and the largest error estimate is larger than the largest error, with
+    # far fewer points than the full mesh.
+    error = np.max(abs(result - full)/full)
+    assert error < 1e-3
+    assert error <= np.max(mesh.error/full)
+    assert mesh.num_points < 35**2//4
+    # Too low a level is several percent off at the oscillations.
+    result = call_kernel(kernel, pars, pd_mesh=SmolyakMesh(level=2))
+    assert np.max(abs(result - full)/full) > 1e-2
+
+
+def test_jitter_kernel():
+    """
+    Check the jitter rule against the full theta/phi mesh for a cylinder.
+    """
+    from .core import load_model
+    from .data import empty_data2D
+    from .direct_model import call_kernel
+
+    model = load_model('cylinder', dtype='double', platform='dll')
+    data = empty_data2D(np.linspace(-0.2, 0.2, 21))
+    kernel = model.make_kernel([data.qx_data, data.qy_data])
+    def relative_error(pd_type, width, npts=None):
+        # Error against the 35 x 35 mesh of the rule with *npts* points, or
+        # of the 15 x 15 mesh if *npts* is None.
+        pars = dict(radius=20, length=300, theta=30, phi=20,
+                    theta_pd=width, theta_pd_type=pd_type,
+                    phi_pd=width, phi_pd_type=pd_type)
+        full = call_kernel(kernel, dict(pars, theta_pd_n=35, phi_pd_n=35))
+        if npts is None:
+            result = call_kernel(kernel, dict(pars, theta_pd_n=15, phi_pd_n=15))
+        else:
+            mesh = JitterGaussMesh(npts=npts, estimate_error=False)
+            result = call_kernel(kernel, dict(pars, theta_pd_n=35, phi_pd_n=35),
+                                 pd_mesh=mesh)
+            assert mesh.num_points == npts
+        return np.max(abs(result - full)/full)
+
+    for pd_type in ('gaussian', 'rectangle'):
+        pars = dict(radius=20, length=300, theta=30, phi=20,
+                    theta_pd=3, theta_pd_n=35, theta_pd_type=pd_type,
+                    phi_pd=3, phi_pd_n=35, phi_pd_type=pd_type)
+        full = call_kernel(kernel, pars)
+        mesh = JitterGaussMesh()
+        result = call_kernel(kernel, pars, pd_mesh=mesh)
+        # The rule converges to the truncated distributions of the mesh,
+        # and the error estimate bounds the error at the cost of another
+        # half rule.
+        error = np.max(abs(result - full)/full)
+        assert error < 1e-4, (pd_type, error)
+        assert error <= np.max(mesh.error/full)
+        assert mesh.num_points == 100 + 49
+        # For narrow jitter the 100 point rule beats the 225 point mesh.
+        for width in (3, 5):
+            assert (relative_error(pd_type, width, 100)
+                    < relative_error(pd_type, width)), (pd_type, width)
+    # For wide jitter the scattering oscillates across the distribution and
+    # the rule needs more points than the 15 x 15 mesh to do better.
+    assert relative_error('gaussian', 10, 100) > relative_error('gaussian', 10)
+    assert relative_error('gaussian', 10, 400) < 1e-3
+    # Without phi jitter the full mesh is used.
+    pars = dict(radius=20, length=300, theta=30, phi=20,
+                theta_pd=3, theta_pd_n=35)
+    mesh = JitterGaussMesh()
+    result = call_kernel(kernel, pars, pd_mesh=mesh)
+    assert mesh.num_points == 0
+    assert np.all(result == call_kernel(kernel, pars))
@@ -275,6 +275,11 @@ class ProductKernel(Kernel):
 
         return values[0]*(p_result*s_result) + values[1]
 
+    def update_q(self, q_vectors):
+        # type: (List[np.ndarray]) -> None
+        self.p_kernel.update_q(q_vectors)
+        self.s_kernel.update_q(q_vectors)
+
     def release(self):
         # type: () -> None
         self.p_kernel.release()
@@ -7,18 +7,33 @@ from __future__ import division
 
 import unittest
 
-from scipy.special import erf  # type: ignore
+from scipy.special import erf, erfcinv  # type: ignore
+import scipy.sparse  # type: ignore
 from numpy import sqrt, log, log10, exp, pi  # type: ignore
 import numpy as np  # type: ignore
 
+from .weights import WeightCache
+from .resolution_cache import digest
+
 __all__ = ["Resolution", "Perfect1D", "Pinhole1D", "Slit1D",
-           "apply_resolution_matrix", "pinhole_resolution", "slit_resolution",
+           "apply_resolution_matrix", "pinhole_resolution",
+           "pinhole_resolution_sparse", "slit_resolution",
            "pinhole_extend_q", "slit_extend_q", "bin_edges",
            "interpolate", "linear_extrapolation", "geometric_extrapolation",
+           "pinhole_adaptive_q", "slit_adaptive_q",
           ]
 
 MINIMUM_RESOLUTION = 1e-8
 MINIMUM_ABSOLUTE_Q = 0.02  # relative to the minimum q in the data
+PINHOLE_TOLERANCE = 1e-10  # gaussian tail dropped from sparse pinhole weights
+ADAPTIVE_TOLERANCE = 1e-3  # target relative error for adaptive q_calc
+ADAPTIVE_LEVELS = 6  # thin probe points by up to 2**ADAPTIVE_LEVELS
+ADAPTIVE_PROBE_REFINE = 4  # probe with steps this much finer than needed
+
+#: Cache for the weight matrices of :class:`Slit1D`, keyed by a digest of
+#: the q values and slit dimensions, so that refitting with the same
+#: instrument configuration reuses the matrix.
+RESOLUTION_CACHE = WeightCache(size=16, name='slit_weights')
 
 class Resolution(object):
     """
@@ -64,8 +79,23 @@ class Pinhole1D(Resolution):
 
     *q_calc* is the list of points to calculate, or None if this should
     be estimated from the *q* and *q_width*.
+
+    *sparse* is True if the weight matrix should be stored as a sparse
+    matrix with the gaussian truncated at *PINHOLE_TOLERANCE*, as computed
+    by :func:`pinhole_resolution_sparse`.  This takes memory and time
+    proportional to the number of points rather than its square, which
+    matters for long or merged data sets.  Use *sparse=False* for the
+    dense matrix from :func:`pinhole_resolution`.
+
+    *tolerance*, if given, is the target relative error in the smeared
+    theory.  When *q_calc* is None, the points are then chosen by
+    :func:`pinhole_adaptive_q` from the resolution widths, or with one
+    evaluation of *probe(q)* if it is given, rather than extending *q* by
+    *nsigma*.  Since the kernel time scales with the number of points,
+    this is usually faster than the default for dense data.
     """
-    def __init__(self, q, q_width, q_calc=None, nsigma=3):
+    def __init__(self, q, q_width, q_calc=None, nsigma=3, sparse=True,
+                 tolerance=None, probe=None):
         #*min_step* is the minimum point spacing to use when computing the
         #underlying model.  It should be on the order of
         #$\tfrac{1}{10}\tfrac{2\pi}{d_\text{max}}$ to make sure that fringes
@@ -77,8 +107,12 @@ class Pinhole1D(Resolution):
         # In practice this should never be needed, since resolution should
         # default to Perfect1D if the pinhole geometry is not defined.
         self.q, self.q_width = q, q_width
-        self.q_calc = (pinhole_extend_q(q, q_width, nsigma=nsigma)
-                       if q_calc is None else np.sort(q_calc))
+        if q_calc is not None:
+            self.q_calc = np.sort(q_calc)
+        elif tolerance is not None:
+            self.q_calc = pinhole_adaptive_q(q, q_width, tolerance, probe=probe)
+        else:
+            self.q_calc = pinhole_extend_q(q, q_width, nsigma=nsigma)
 
         # Protect against models which are not defined for very low q.  Limit
         # the smallest q value evaluated (in absolute) to 0.02*min
@@ -86,7 +120,8 @@ class Pinhole1D(Resolution):
         self.q_calc = self.q_calc[abs(self.q_calc) >= cutoff]
 
         # Build weight matrix from calculated q values
-        self.weight_matrix = pinhole_resolution(
+        build = pinhole_resolution_sparse if sparse else pinhole_resolution
+        self.weight_matrix = build(
             self.q_calc, self.q, np.maximum(q_width, MINIMUM_RESOLUTION))
         self.q_calc = abs(self.q_calc)
 
@@ -107,9 +142,15 @@ class Slit1D(Resolution):
     *q_calc* is the list of points to calculate, or None if this should
     be estimated from the *q* and *q_width*.
 
-    The *weight_matrix* is computed by :func:`slit1d_resolution`
+    *tolerance* and *probe* select the points with :func:`slit_adaptive_q`
+    when *q_calc* is None, as for :class:`Pinhole1D`.
+
+    The *weight_matrix* is computed by :func:`slit_resolution`, and is
+    shared through :data:`RESOLUTION_CACHE` with other instances which have
+    the same *q*, *q_calc* and slit dimensions.
     """
-    def __init__(self, q, qx_width, qy_width=0., q_calc=None):
+    def __init__(self, q, qx_width, qy_width=0., q_calc=None,
+                 tolerance=None, probe=None):
         # Remember what width/dqy was used even though we won't need them
         # after the weight matrix is constructed
         self.qx_width, self.qy_width = qx_width, qy_width
@@ -126,8 +167,13 @@ class Slit1D(Resolution):
             qy_width = np.asarray(qy_width)
 
         self.q = q.flatten()
-        self.q_calc = slit_extend_q(q, qx_width, qy_width) \
-            if q_calc is None else np.sort(q_calc)
+        if q_calc is not None:
+            self.q_calc = np.sort(q_calc)
+        elif tolerance is not None:
+            self.q_calc = slit_adaptive_q(self.q, qx_width, qy_width,
+                                          tolerance, probe=probe)
+        else:
+            self.q_calc = slit_extend_q(q, qx_width, qy_width)
 
         # Protect against models which are not defined for very low q.  Limit
         # the smallest q value evaluated (in absolute) to 0.02*min
@@ -135,8 +181,10 @@ class Slit1D(Resolution):
         self.q_calc = self.q_calc[abs(self.q_calc) >= cutoff]
 
         # Build weight matrix from calculated q values
-        self.weight_matrix = \
-            slit_resolution(self.q_calc, self.q, qx_width, qy_width)
+        q_calc = self.q_calc
+        key = ('slit', digest(q_calc, self.q, qx_width, qy_width))
+        self.weight_matrix = RESOLUTION_CACHE.lookup(
+            key, lambda: slit_resolution(q_calc, self.q, qx_width, qy_width))
         self.q_calc = abs(self.q_calc)
 
     def apply(self, theory):
@@ -146,7 +194,11 @@ class Slit1D(Resolution):
 def apply_resolution_matrix(weight_matrix, theory):
     """
     Apply the resolution weight matrix to the computed theory function.
+
+    The weight matrix may be a dense array or a scipy sparse matrix.
     """
+    if scipy.sparse.issparse(weight_matrix):
+        return weight_matrix.T.dot(theory)
     #print("apply shapes", theory.shape, weight_matrix.shape)
     Iq = np.dot(theory[None, :], weight_matrix)
     #print("result shape",Iq.shape)
@@ -173,6 +225,52 @@ def pinhole_resolution(q_calc, q, q_width):
     return weights
 
 
+def pinhole_resolution_sparse(q_calc, q, q_width, tolerance=PINHOLE_TOLERANCE):
+    """
+    Compute the convolution matrix *W* for pinhole resolution 1-D data as
+    a sparse matrix.
+
+    This is the same as :func:`pinhole_resolution`, but only the bins of
+    *q_calc* within the central part of the gaussian are included, leaving
+    out a fraction *tolerance* of the gaussian weight.  The result is a
+    *scipy.sparse.csc_matrix* of shape *(len(q_calc), len(q))*, which is
+    built one band of nonzero values at a time without forming the dense
+    matrix.
+
+    *q_calc* must be increasing.  *q_width* must be greater than zero.
+    """
+    q, q_width = np.asarray(q, 'd'), np.asarray(q_width, 'd')
+    q_width = np.broadcast_to(q_width, q.shape)
+    edges = bin_edges(q_calc)
+    nsigma = sqrt(2.0)*erfcinv(tolerance)
+    # Bins which overlap [q - nsigma dq, q + nsigma dq] for each q.
+    start = np.maximum(np.searchsorted(edges, q - nsigma*q_width, 'right') - 1, 0)
+    stop = np.minimum(np.searchsorted(edges, q + nsigma*q_width), len(q_calc))
+    column, row = _bands(start, stop)
+    indptr = np.hstack((0, np.cumsum(np.maximum(stop - start, 0))))
+    scale = 1.0/(sqrt(2.0)*q_width[column])
+    cdf_hi = erf((edges[row+1] - q[column])*scale)
+    cdf_lo = erf((edges[row] - q[column])*scale)
+    weights = cdf_hi - cdf_lo
+    weights /= np.bincount(column, weights, minlength=len(q))[column]
+    return scipy.sparse.csc_matrix((weights, row, indptr),
+                                   shape=(len(q_calc), len(q)))
+
+
+def _bands(start, stop):
+    """
+    Expand the index ranges *[start[k], stop[k])* into a list of indices.
+
+    Returns *(owner, index)* where *owner* is the *k* for each *index*.
+    Empty ranges contribute nothing.
+    """
+    length = np.maximum(stop - start, 0)
+    offset = np.cumsum(length) - length
+    owner = np.repeat(np.arange(len(start)), length)
+    index = np.arange(np.sum(length)) + np.repeat(start - offset, length)
+    return owner, index
+
+
 def slit_resolution(q_calc, q, width, height, n_height=30):
     r"""
     Build a weight matrix to compute *I_s(q)* from *I(q_calc)*, given
@@ -293,10 +391,123 @@ def slit_resolution(q_calc, q, width, height, n_height=30):
             \sum_{k=-L}^L \Delta u_{jk}
                 \left(\frac{\Delta q_\parallel}{2 L + 1}\right)
 
+    The matrix is returned as a *scipy.sparse.csc_matrix* of shape
+    *(len(q_calc), len(q))*.  It is built with array operations over the
+    nonzero band of each row rather than a python loop over $q$ and $k$.
+    """
+    # The current algorithm is a midpoint rectangle rule.
+    q, q_calc = np.asarray(q, 'd'), np.asarray(q_calc, 'd')
+    width = np.broadcast_to(np.asarray(width, 'd'), q.shape)
+    height = np.broadcast_to(np.asarray(height, 'd'), q.shape)
+    q_edges = bin_edges(q_calc) # Note: requires q > 0
+    nbins = len(q_calc)
+
+    # Each column of the weight matrix is nonzero over a single range of
+    # bins [start, stop), which is filled in for each kind of slit.
+    start = np.zeros(len(q), 'i')
+    stop = np.zeros(len(q), 'i')
+    perfect = (width == 0.) & (height == 0.)
+    only_width = (width > 0.) & (height == 0.)
+    only_height = (width == 0.) & (height > 0.)
+    both = (width > 0.) & (height > 0.)
+
+    # Perfect resolution, so return the theory value directly.
+    # Note: assumes that q is a subset of q_calc.
+    start[perfect] = np.searchsorted(q_calc, q[perfect], 'left')
+    stop[perfect] = np.searchsorted(q_calc, q[perfect], 'right')
+    # Slit width only: bins between |q| and sqrt(q^2 + width^2).
+    start[only_width], stop[only_width] = _q_perp_range(
+        q_edges, q[only_width], width[only_width])
+    # Slit height only: bins in [q-h, q+h], plus [0, |q-h|] folded over
+    # when q < h.
+    qi, h = q[only_height], height[only_height]
+    start[only_height] = np.where(qi < h, 0,
+                                  np.searchsorted(q_calc, qi - h, 'left'))
+    stop[only_height] = np.searchsorted(q_calc, qi + h, 'right')
+    # Both: the union of the width ranges over the heights.
+    qi, h, w = q[both], height[both], width[both]
+    start[both] = _q_perp_range(q_edges, np.maximum(abs(qi) - h, 0.), w)[0]
+    stop[both] = _q_perp_range(q_edges, abs(qi) + h, w)[1]
+
+    stop = np.maximum(stop, start)
+    _, row = _bands(start, stop)
+    indptr = np.hstack((0, np.cumsum(stop - start)))
+
+    # Weights for the bands of each kind of slit, in column order.
+    parts = []
+    if perfect.any():
+        parts.append((perfect, np.ones(np.sum((stop - start)[perfect]))))
+    if only_height.any():
+        owner, j = _bands(start[only_height], stop[only_height])
+        qi, h = q[only_height][owner], height[only_height][owner]
+        in_x = (q_calc[j] >= qi - h) & (q_calc[j] <= qi + h)
+        abs_x = (qi < h) & (q_calc[j] < abs(qi - h))
+        parts.append((only_height,
+                      (1.0*in_x + 1.0*abs_x)*np.diff(q_edges)[j]/(2*h)))
+    if only_width.any():
+        parts.append((only_width, _q_perp_band(
+            q_edges, start[only_width], stop[only_width],
+            q[only_width], width[only_width], [0.])))
+    if both.any():
+        parts.append((both, _q_perp_band(
+            q_edges, start[both], stop[both], q[both], width[both],
+            np.arange(-n_height, n_height+1)/n_height, height[both])))
+
+    if len(parts) == 1:
+        weights = parts[0][1]
+    else:
+        weights = np.empty(len(row), 'd')
+        for columns, values in parts:
+            _, position = _bands(indptr[:-1][columns], indptr[1:][columns])
+            weights[position] = values
+    return scipy.sparse.csc_matrix((weights, row, indptr),
+                                   shape=(nbins, len(q)))
+
+
+def _q_perp_range(q_edges, qi, w):
+    """
+    Return the range of bins *[start, stop)* for which the q_perp weights
+    of :func:`_q_perp_weights` are nonzero.  These are the bins with an
+    upper edge above *|qi|* and a lower edge below *sqrt(qi^2 + w^2)*.
+    """
+    start = np.maximum(np.searchsorted(q_edges, abs(qi), 'right') - 1, 0)
+    stop = np.minimum(np.searchsorted(q_edges, np.sqrt(qi**2 + w**2), 'left'),
+                      len(q_edges) - 1)
+    return start, stop
 
+
+def _q_perp_band(q_edges, start, stop, qi, w, steps, h=0.):
     """
-    #np.set_printoptions(precision=6, linewidth=10000)
+    Vectorized form of :func:`_q_perp_weights` for the bins *[start, stop)*
+    of each *qi*, averaged over *qi + steps*h*.
 
+    Returns the weights for all the bands joined together.
+    """
+    # The weight of a bin is the difference in u between its edges, so
+    # accumulate u for the edges of each band, then take differences.
+    # Negative edges are below |qi| so they can be set to zero, and then
+    # u = sqrt(clip(edge^2 - qi^2, 0, w^2)).
+    length = stop - start
+    _, edge = _bands(start, stop + 1)
+    edge_sq = np.maximum(q_edges[edge], 0.)**2
+    w_sq = np.repeat(w**2, length + 1)
+    u = np.zeros(len(edge), 'd')
+    for step in steps:
+        x_sq = np.repeat((qi + step*h)**2, length + 1)
+        u += np.sqrt(np.clip(edge_sq - x_sq, 0., w_sq))
+    u /= np.repeat(w, length + 1)*len(steps)
+    # Drop the difference between the last edge of one band and the first
+    # edge of the next.
+    keep = np.ones(len(edge) - 1 if len(edge) else 0, dtype=bool)
+    keep[np.cumsum(length + 1)[:-1] - 1] = False
+    return np.diff(u)[keep]
+
+
+def _slit_resolution_loop(q_calc, q, width, height, n_height=30):
+    """
+    Dense reference implementation of :func:`slit_resolution`, used to
+    check the vectorized form.
+    """
     # The current algorithm is a midpoint rectangle rule.
     q_edges = bin_edges(q_calc) # Note: requires q > 0
     #q_edges[q_edges < 0.0] = 0.0 # clip edges below zero
@@ -409,12 +620,12 @@ def linear_extrapolation(q, q_min, q_max):
     """
     q = np.sort(q)
     if q_min + 2*MINIMUM_RESOLUTION < q[0]:
-        n_low = np.ceil((q[0]-q_min) / (q[1]-q[0])) if q[1] > q[0] else 15
+        n_low = int(np.ceil((q[0]-q_min) / (q[1]-q[0]))) if q[1] > q[0] else 15
         q_low = np.linspace(q_min, q[0], n_low+1)[:-1]
     else:
         q_low = []
     if q_max - 2*MINIMUM_RESOLUTION > q[-1]:
-        n_high = np.ceil((q_max-q[-1]) / (q[-1]-q[-2])) if q[-1] > q[-2] else 15
+        n_high = int(np.ceil((q_max-q[-1]) / (q[-1]-q[-2]))) if q[-1] > q[-2] else 15
         q_high = np.linspace(q[-1], q_max, n_high+1)[1:]
     else:
         q_high = []
@@ -463,16 +674,220 @@ def geometric_extrapolation(q, q_min, q_max, points_per_decade=None):
         if q_min < 0:
             q_min = q[0]*MINIMUM_ABSOLUTE_Q
         n_low = log_delta_q * (log(q[0])-log(q_min))
-        q_low = np.logspace(log10(q_min), log10(q[0]), np.ceil(n_low)+1)[:-1]
+        q_low = np.logspace(log10(q_min), log10(q[0]), int(np.ceil(n_low))+1)[:-1]
     else:
         q_low = []
     if q_max > q[-1]:
         n_high = log_delta_q * (log(q_max)-log(q[-1]))
-        q_high = np.logspace(log10(q[-1]), log10(q_max), np.ceil(n_high)+1)[1:]
+        q_high = np.logspace(log10(q[-1]), log10(q_max), int(np.ceil(n_high))+1)[1:]
     else:
         q_high = []
     return np.concatenate([q_low, q, q_high])
 
+def pinhole_adaptive_q(q, q_width, tolerance=ADAPTIVE_TOLERANCE, probe=None):
+    r"""
+    Choose the points *q_calc* for pinhole smearing of *q* by gaussians of
+    width *q_width* so that the smeared theory has a relative error of
+    about *tolerance*.
+
+    The midpoint rule in :func:`pinhole_resolution` has an error of
+    $\tfrac{1}{24}\Delta^2 \langle I'' \rangle$ for steps $\Delta$ in
+    *q_calc*, where $\langle I'' \rangle$ is the curvature of the theory
+    averaged over the resolution function.  The gaussian damps fine
+    structure, so the error is largest for oscillations with a period of a
+    few $\sigma$.  Near the minima of a sphere this gives a relative error
+    of about $\Delta^2/12\sigma^2$, so the steps are set to
+    $\Delta = \sigma \sqrt{8\,\text{tolerance}}$, leaving some margin,
+    for the resolution width $\sigma$ interpolated from *q_width*.  The points cover the range in
+    which the gaussian tails are above a tenth of *tolerance*, leaving out
+    gaps between widely separated data points.  Points with no resolution are
+    included in *q_calc* as they are.
+
+    If *probe(q)* is given, it is called once to evaluate the theory on
+    these points, at half the tolerance.  The points are then thinned by
+    up to a factor of $2^L$, for *L* = *ADAPTIVE_LEVELS*, while keeping
+    the smeared probe within half the tolerance of its value on the full
+    set.  This gives fewer points where the theory is smooth, such as
+    power law regions, but the points are only suitable for theories
+    close to the probe.
+    """
+    q, q_width = np.asarray(q, 'd'), np.asarray(q_width, 'd')
+    q_width = np.broadcast_to(q_width, q.shape)
+    target = tolerance if probe is None else 0.5*tolerance
+    perfect = q_width <= MINIMUM_RESOLUTION
+    order = np.argsort(q[~perfect])
+    q_res, width = q[~perfect][order], q_width[~perfect][order]
+    if not len(q_res):
+        return np.unique(q)
+
+    nsigma = sqrt(2.0)*erfcinv(0.1*target)
+    scale = sqrt(8.0*target)
+    if probe is not None:
+        scale /= ADAPTIVE_PROBE_REFINE
+    sigma = lambda x: np.interp(x, q_res, width)
+    segments = []
+    for lower, upper in _merge_ranges(q_res - nsigma*width,
+                                      q_res + nsigma*width):
+        inside = q_res[(q_res > lower) & (q_res < upper)]
+        x = np.hstack((lower, inside, upper))
+        segments.append(_fill_steps(x, scale*sigma(x)))
+    q_calc, fixed = _join_segments(segments, q[perfect])
+    # Drop points near zero, as done by Pinhole1D, so that the probe is
+    # evaluated on the same points as the model.
+    keep = abs(q_calc) >= MINIMUM_ABSOLUTE_Q*np.min(q)
+    q_calc, fixed = q_calc[keep], fixed[keep]
+    if probe is None:
+        return q_calc
+
+    width = np.maximum(q_width, MINIMUM_RESOLUTION)
+    build = lambda q_calc: pinhole_resolution_sparse(q_calc, q, width)
+    theory = probe(abs(q_calc))
+    return q_calc[_thin_points(q_calc, fixed, theory, build, 0.5*tolerance)]
+
+
+def slit_adaptive_q(q, width, height, tolerance=ADAPTIVE_TOLERANCE, probe=None):
+    r"""
+    Choose the points *q_calc* for slit smearing of *q* with slit *width*
+    and *height* so that the smeared theory has a relative error of about
+    *tolerance*.
+
+    The weights from :func:`slit_resolution` are exact for a theory which
+    is constant across each bin of *q_calc*, but the slit has sharp edges,
+    and for the slit width the weight is singular at $u = q$.  The errors
+    from the bins at the edges are first order in the step size rather
+    than second order as for the pinhole.  For a theory falling as
+    $q^{-4}$ the relative error from the singularity is about
+    $3 (\Delta/q)^{3/2}$, so the points are spaced geometrically with
+    $\Delta/q = (\text{tolerance}/3)^{2/3}$.  For a slit with height $h$
+    but no width, the error from the bins at the edges of the slit is
+    about $\Delta/h$, so the steps are further limited to
+    $\Delta = h\,\text{tolerance}$.  The points cover $q-h$ to
+    $\sqrt{(q+h)^2 + w^2}$ for each $q$.  Points with no resolution are
+    included in *q_calc* as they are.
+
+    If *probe(q)* is given, the points are refined using a single
+    evaluation of the theory as described in :func:`pinhole_adaptive_q`.
+    This matters more for slits, where oscillations in the theory can
+    need many more points than a power law.
+    """
+    q = np.asarray(q, 'd')
+    width = np.broadcast_to(np.asarray(width, 'd'), q.shape)
+    height = np.broadcast_to(np.asarray(height, 'd'), q.shape)
+    target = tolerance if probe is None else 0.5*tolerance
+    perfect = (width == 0.) & (height == 0.)
+    if perfect.all():
+        return np.unique(q)
+
+    ratio = (target/3.0)**(2./3.)
+    max_step = target*np.min(height[width == 0.], initial=np.inf)
+    if probe is not None:
+        ratio /= ADAPTIVE_PROBE_REFINE
+    lower = q - height
+    upper = sqrt((q + height)**2 + width**2)
+    cutoff = MINIMUM_ABSOLUTE_Q*np.min(q)
+    lower = np.where(lower < cutoff, cutoff, lower)
+    segments = []
+    for start, stop in _merge_ranges(lower[~perfect], upper[~perfect]):
+        # The theory is not evaluated below the cutoff, so when the slit
+        # reaches zero the first point stands for [0, 2*cutoff].
+        first = [cutoff] if start == cutoff else []
+        if first:
+            start = 3*cutoff
+        # Geometric steps need more than the ends of the range to define
+        # the spacing, so use twenty points per decade.
+        x = np.geomspace(start, stop, int(20*log10(stop/start)) + 2)
+        x = _fill_steps(x, np.minimum(ratio*x, max_step))
+        segments.append(np.hstack((first, x)))
+    q_calc, fixed = _join_segments(segments, q[perfect])
+    keep = q_calc >= cutoff
+    q_calc, fixed = q_calc[keep], fixed[keep]
+    if probe is None:
+        return q_calc
+
+    build = lambda q_calc: slit_resolution(q_calc, q, width, height)
+    theory = probe(q_calc)
+    return q_calc[_thin_points(q_calc, fixed, theory, build, 0.5*tolerance)]
+
+
+def _merge_ranges(lower, upper):
+    """
+    Return the ranges *[lower, upper]* merged into a sorted list of
+    non-overlapping ranges.
+    """
+    order = np.argsort(lower)
+    lower, upper = lower[order], np.maximum.accumulate(upper[order])
+    gaps = np.nonzero(lower[1:] > upper[:-1])[0]
+    return list(zip(np.hstack((lower[0], lower[gaps+1])),
+                    np.hstack((upper[gaps], upper[-1]))))
+
+
+def _fill_steps(x, step):
+    """
+    Return points from *x[0]* to *x[-1]* spaced by *step*, which is given
+    at the points *x* and is interpolated between them.
+    """
+    density = 1.0/step
+    count = np.hstack((0., np.cumsum(0.5*(density[1:]+density[:-1])*np.diff(x))))
+    n = max(int(np.ceil(count[-1])), 1)
+    return np.interp(np.linspace(0., count[-1], n+1), count, x)
+
+
+def _join_segments(segments, q_perfect):
+    """
+    Join the *segments* of *q_calc* and the points *q_perfect* with no
+    resolution.  Returns *q_calc* and a mask of the points which are fixed,
+    namely the ends of the segments and the points with no resolution.
+
+    The bins of *q_calc* extend halfway to the neighbouring points, so each
+    segment is padded by one step at either end to keep the bins at the
+    ends from covering the gaps between segments.
+    """
+    segments = [np.hstack((2*x[0] - x[1], x, 2*x[-1] - x[-2]))
+                for x in segments]
+    ends = [segment[[0, 1, -2, -1]] for segment in segments]
+    q_calc = np.unique(np.hstack(segments + [q_perfect]))
+    fixed = np.isin(q_calc, np.hstack(ends + [q_perfect]))
+    return q_calc, fixed
+
+
+def _thin_points(q_calc, fixed, theory, build, tolerance):
+    """
+    Return a mask selecting a subset of *q_calc* for which the smeared
+    *theory* is within *tolerance* of the result using all points.
+
+    *build(q_calc)* returns the resolution weight matrix for a set of
+    points.  The points in *fixed* are always kept.
+
+    Each point is given a level from 0 to *ADAPTIVE_LEVELS*, with the
+    points at level $k$ and above spaced every $2^k$ points.  Starting
+    with the coarsest level, the level is lowered by one over the support
+    of any smeared value which is outside the tolerance, until all values
+    are within tolerance.  The bins at the ends of the support reach
+    halfway to the next point that is kept, so the support is widened by
+    $2^L$ points on either side.
+    """
+    weights = scipy.sparse.csc_matrix(build(q_calc))
+    target = apply_resolution_matrix(weights, theory)
+    n, margin = len(q_calc), 2**ADAPTIVE_LEVELS
+    index = np.arange(n)
+    level = np.zeros(n, 'i')
+    for k in range(1, ADAPTIVE_LEVELS+1):
+        level[index % 2**k == 0] = k
+    level[fixed] = ADAPTIVE_LEVELS
+    threshold = np.full(n, ADAPTIVE_LEVELS)
+    while True:
+        keep = level >= threshold
+        Iq = apply_resolution_matrix(build(q_calc[keep]), theory[keep])
+        bad = abs(Iq - target) > tolerance*abs(target)
+        support = abs(weights[:, bad]).sum(axis=1).A1 > 0.
+        total = np.hstack((0, np.cumsum(support)))
+        support = (total[np.minimum(index + margin + 1, n)]
+                   > total[np.maximum(index - margin, 0)])
+        support &= threshold > 0
+        if not support.any():
+            return keep
+        threshold[support] -= 1
+
 
 ############################################################################
 # unit tests
@@ -693,6 +1108,51 @@ class ResolutionTest(unittest.TestCase):
         np.testing.assert_allclose(output, answer, atol=1e-8)
 
 
+    def test_pinhole_sparse_matrix(self):
+        """
+        Sparse pinhole weights match the dense weights.
+        """
+        q = np.logspace(-3, -1, 400)
+        q_width = 0.05*q
+        q_calc = np.logspace(-3.5, -0.5, 1000)
+        dense = pinhole_resolution(q_calc, q, q_width)
+        sparse = pinhole_resolution_sparse(q_calc, q, q_width)
+        self.assertLess(sparse.nnz, dense.size//4)
+        np.testing.assert_allclose(sparse.toarray(), dense, atol=1e-9)
+        theory = self.Iq(q_calc)
+        np.testing.assert_allclose(apply_resolution_matrix(sparse, theory),
+                                   apply_resolution_matrix(dense, theory),
+                                   rtol=1e-9, atol=1e-8)
+
+
+    def test_slit_sparse_matrix(self):
+        """
+        Vectorized slit weights match the loop over q.
+        """
+        q = np.logspace(-4, -1, 40)
+        q_calc = np.union1d(q, np.logspace(-5, -0.5, 200))
+        # Mix of perfect, width only, height only and both.
+        width = np.tile([0., 0.01, 0., 0.01], 10)
+        height = np.tile([0., 0., 0.003, 0.002], 10)
+        sparse = slit_resolution(q_calc, q, width, height)
+        dense = _slit_resolution_loop(q_calc, q, width, height)
+        np.testing.assert_allclose(sparse.toarray(), dense, atol=1e-14)
+
+    def test_slit_cache(self):
+        """
+        Slit resolution with the same configuration reuses the matrix.
+        """
+        RESOLUTION_CACHE.clear()
+        q = np.logspace(-4, -2, 20)
+        first = Slit1D(q, qx_width=0.01, qy_width=0., q_calc=q)
+        second = Slit1D(q.copy(), qx_width=0.01, qy_width=0., q_calc=q)
+        third = Slit1D(q, qx_width=0.02, qy_width=0., q_calc=q)
+        self.assertIs(first.weight_matrix, second.weight_matrix)
+        self.assertIsNot(first.weight_matrix, third.weight_matrix)
+        self.assertEqual(RESOLUTION_CACHE.stats()['hits'], 1)
+        RESOLUTION_CACHE.clear()
+
+
 class IgorComparisonTest(unittest.TestCase):
     """
     Test resolution calculations against those returned by Igor.
@@ -808,6 +1268,46 @@ class IgorComparisonTest(unittest.TestCase):
         # TODO: relative error should be lower
         self._compare(q, output, answer, 0.025)
 
+    def test_pinhole_adaptive(self):
+        """
+        Compare pinhole smearing on adaptive points with romberg integration.
+        """
+        data = np.loadtxt(TEST_DATA_PINHOLE_SPHERE.split('\n')).T
+        q, q_width, _ = data
+        for radius in (60, 300):
+            pars = dict(TEST_PARS_PINHOLE_SPHERE, radius=radius)
+            answer = romberg_pinhole_1d(q, q_width, self.model, pars)
+            probe = lambda q: eval_form(q, self.model, pars)
+            for tol in (1e-2, 1e-3):
+                resolution = Pinhole1D(q, q_width, tolerance=tol)
+                output = self._eval_sphere(pars, resolution)
+                self._compare(q, output, answer, tol)
+                resolution = Pinhole1D(q, q_width, tolerance=tol, probe=probe)
+                output = self._eval_sphere(pars, resolution)
+                self._compare(q, output, answer, tol)
+            if radius == 60:
+                # The sphere is smooth at this resolution, so the probe
+                # needs far fewer points than the default.
+                default = Pinhole1D(q, q_width)
+                self.assertLess(len(resolution.q_calc), len(default.q_calc)//2)
+
+    def test_slit_adaptive(self):
+        """
+        Compare slit smearing on adaptive points with romberg integration.
+        """
+        pars = dict(TEST_PARS_PINHOLE_SPHERE)
+        probe = lambda q: eval_form(q, self.model, pars)
+        q = np.logspace(-3, -1, 12)
+        for width, height in ((0.05, 0.), (0., 0.005)):
+            answer = romberg_slit_1d(q, width, height, self.model, pars)
+            # Without a probe the points assume a power law, which is
+            # not enough for the minima of the sphere.
+            for tol in (1e-2, 1e-3):
+                resolution = Slit1D(q, width, height, tolerance=tol,
+                                    probe=probe)
+                output = self._eval_sphere(pars, resolution)
+                self._compare(q, output, answer, tol)
+
     def test_ellipsoid(self):
         """
         Compare romberg integration for ellipsoid model.
@@ -818,7 +1318,10 @@ class IgorComparisonTest(unittest.TestCase):
             'radius_polar':500, 'radius_equatorial':15000,
             'sld':6, 'sld_solvent': 1,
             }
-        form = load_model('ellipsoid', dtype='double')
+        # The adaptive orientation integral changes rules from one q to the
+        # next, so Romberg cannot converge on it.  A tolerance of 1 accepts
+        # the first rule at each q, which is smooth in q.
+        form = load_model('ellipsoid', dtype='double', tolerance=1.)
         q = np.logspace(log10(4e-5), log10(2.5e-2), 68)
         width, height = 0.117, 0.
         resolution = Slit1D(q, qx_width=width, qy_width=height)
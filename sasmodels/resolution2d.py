@@ -11,6 +11,7 @@ from numpy import pi, cos, sin, sqrt  # type: ignore
 
 from . import resolution
 from .resolution import Resolution
+from .kernel import QGrid
 
 ## Singular point
 SIGMA_ZERO = 1.0e-010
@@ -18,8 +19,35 @@ SIGMA_ZERO = 1.0e-010
 # default: 2.5 to cover 98.7% of Gaussian
 NSIGMA = 3.0
 ## Defaults
-NR = {'xhigh':10, 'high':5, 'med':5, 'low':3}
-NPHI = {'xhigh':20, 'high':12, 'med':6, 'low':4}
+NR = {'xhigh':10, 'high':5, 'med':5, 'low':3, 'adaptive':2}
+NPHI = {'xhigh':20, 'high':12, 'med':6, 'low':4, 'adaptive':4}
+## Memory allowed for the oversampled q values of Pinhole2D, in bytes
+MEMORY_BUDGET = 2**28
+## Bytes used for each oversampled point, including intermediate values
+POINT_BYTES = 80
+## Accuracy setting which selects adaptive oversampling
+ADAPTIVE_ACCURACY = 'adaptive'
+## Default tolerance and number of nested sampling levels for adaptive
+## oversampling, which goes from 9 to 513 points per pixel
+ADAPTIVE_TOLERANCE = 1e-3
+ADAPTIVE_LEVELS = 4
+## Accuracy setting which selects GridPinhole2D in place of oversampling
+GRID_ACCURACY = 'grid'
+## Largest number of pixels on each side of a tile with constant resolution
+TILE_SIZE = 16
+## Allowed change in the resolution across a tile
+TILE_TOLERANCE = 0.02
+## Largest offset of the data q from the detector grid, as a fraction of a step
+GRID_TOLERANCE = 0.01
+## Largest offset of the data q from the detector grid, as a fraction of the
+## narrowest resolution width at the pixel, if that is larger
+GRID_RESOLUTION_TOLERANCE = 0.05
+## Smallest fraction of the detector grid which is evaluated as a grid
+GRID_FILL = 0.5
+## Largest tile which is convolved directly rather than by FFT
+DIRECT_TILE_SIZE = 16
+## Number of grid values to convolve at once
+TILE_BLOCK = 2**20
 
 ## Defaults
 N_SLIT_PERP = {'xhigh':1000, 'high':500, 'med':200, 'low':50}
@@ -30,10 +58,33 @@ N_SLIT_PERP_DOC = ", ".join("%s=%d"%(name, value)
 class Pinhole2D(Resolution):
     """
     Gaussian Q smearing class for SAS 2d data
+
+    Each pixel is sampled at *nr* by *nphi* points in the resolution
+    ellipse.  If the samples for all the pixels need more than *memory*
+    bytes then they are not stored.  Instead, *q_calc* is None and the
+    pixels are split into tiles, with :meth:`tiles` returning the samples
+    for one tile at a time and :meth:`apply_tile` averaging them, so that
+    each tile can be evaluated and smeared before the next is built.
+
+    If *accuracy* is 'Adaptive' the sampling is refined pixel by pixel.
+    The samples are the pixel itself and *nr* rings of *nphi* points
+    equally spaced in $r$ up to *nsigma*, with Simpson weights in $r$ for
+    the Gaussian, so that even the coarsest level is exact for patterns
+    which are quadratic across the resolution ellipse.  Each of the
+    *levels* sample sets doubles *nr* and *nphi* of the one before, so it
+    includes all of its samples, and only the new samples are evaluated,
+    and only for the pixels whose smeared value changed by more than
+    *tolerance* relative to the value at the previous level.  The samples
+    then depend on the theory, so *q_calc* is None and the model is
+    evaluated through :meth:`calculate`, which also returns the number of
+    points evaluated.  Features which fall between all the samples of the
+    coarse levels, such as a narrow peak at the edge of the resolution
+    ellipse, are not detected.
     """
 
     def __init__(self, data=None, index=None,
-                 nsigma=NSIGMA, accuracy='Low', coords='polar'):
+                 nsigma=NSIGMA, accuracy='Low', coords='polar', memory=None,
+                 tolerance=None, levels=ADAPTIVE_LEVELS):
         """
         Assumption: equally spaced bins in dq_r, dq_phi space.
 
@@ -43,6 +94,11 @@ class Pinhole2D(Resolution):
         :param nr: number of bins in dq_r-axis
         :param nphi: number of bins in dq_phi-axis
         :param coord: coordinates [string], 'polar' or 'cartesian'
+        :param memory: bytes allowed for the oversampled q values, or
+         None for MEMORY_BUDGET
+        :param tolerance: relative change in the smeared value below
+         which a pixel is not refined further, for 'Adaptive' accuracy
+        :param levels: number of nested sample sets, for 'Adaptive' accuracy
         """
         ## Accuracy: Higher stands for more sampling points in both directions
         ## of r and phi.
@@ -53,6 +109,12 @@ class Pinhole2D(Resolution):
         ## maximum nsigmas
         self.nsigma = nsigma
         self.coords = coords
+        self.memory = MEMORY_BUDGET if memory is None else memory
+        if accuracy.lower() != ADAPTIVE_ACCURACY:
+            self.tolerance, self.nlevels = None, 1
+        else:
+            self.tolerance = ADAPTIVE_TOLERANCE if tolerance is None else tolerance
+            self.nlevels = levels
         self._init_data(data, index)
 
     def _init_data(self, data, index):
@@ -71,6 +133,7 @@ class Pinhole2D(Resolution):
 
         dqx = getattr(data, 'dqx_data', None)
         dqy = getattr(data, 'dqy_data', None)
+        nq = len(self.qx_data)
         if dqx is not None and dqy is not None:
             # Here dqx and dqy mean dq_parr and dq_perp
             self.dqx_data = dqx[self.index]
@@ -78,43 +141,50 @@ class Pinhole2D(Resolution):
             ## Remove singular points if exists
             self.dqx_data[self.dqx_data < SIGMA_ZERO] = SIGMA_ZERO
             self.dqy_data[self.dqy_data < SIGMA_ZERO] = SIGMA_ZERO
-            qx_calc, qy_calc, weights = self._calc_res()
-            self.q_calc = [qx_calc, qy_calc]
-            self.q_calc_weights = weights
+            self._calc_bins()
+            scale = 2**(self.nlevels - 1)
+            nbins = (1 + self.nr*scale*self.nphi*scale
+                     if self.tolerance is not None else self.nr*self.nphi)
+            self.tile_size = max(1, int(self.memory // (nbins*POINT_BYTES)))
+            if nq <= self.tile_size and self.tolerance is None:
+                self.tile_size = max(nq, 1)
+                self.q_calc = self._calc_res(slice(None))
+            else:
+                self.q_calc = None
         else:
             # No resolution information
             self.dqx_data = self.dqy_data = None
-            self.q_calc = [self.qx_data, self.qy_data]
+            self.q_calc = detector_q(data, self.index)
             self.q_calc_weights = None
+            self.tile_size = max(nq, 1)
 
         #self.phi_data = np.arctan(self.qx_data / self.qy_data)
 
-    def _calc_res(self):
+    def _calc_bins(self):
         """
-        Over sampling of r_nbins times phi_nbins, calculate Gaussian weights,
-        then find smeared intensity
+        Over sampling of r_nbins times phi_nbins: set the offset *dr*
+        and angle *dphi* of each bin, and its Gaussian weight
         """
         nr, nphi = self.nr, self.nphi
-        # Total number of bins = # of bins
-        nbins = nr * nphi
-        # Number of bins in the dqr direction (polar coordinate of dqx and dqy)
-        bin_size = self.nsigma / nr
-        # in dq_r-direction times # of bins in dq_phi-direction
-        # data length in the range of self.index
-        nq = len(self.qx_data)
+        r, weight_res = _radial_bins(nr, self.nsigma)
+        # mean values of qphi at each bines; bins run over r within phi
+        self.dphi = (np.arange(nphi) * 2.0 * pi / nphi).repeat(nr)
+        self.dr = np.tile(r, nphi)
+        self.q_calc_weights = np.tile(weight_res, nphi)
 
-        # Mean values of dqr at each bins
-        # starting from the half of bin size
-        r = bin_size / 2.0 + np.arange(nr) * bin_size
-        # mean values of qphi at each bines
-        phi = np.arange(nphi)
-        dphi = phi * 2.0 * pi / nphi
-        dphi = dphi.repeat(nr)
-
-        ## Transform to polar coordinate,
-        #  and set dphi at each data points ; 1d array
-        dphi = dphi.repeat(nq)
-        q_phi = self.qy_data / self.qx_data
+    def _calc_res(self, pixels, dr=None, dphi=None):
+        """
+        Return the oversampled [qx, qy] for the data points selected by
+        *pixels*, with all the points for the first bin, then all the
+        points for the second bin, and so on.  The bins are at offsets
+        *dr*, *dphi*, which default to the bins for *nr* by *nphi*.
+        """
+        qx, qy = self.qx_data[pixels], self.qy_data[pixels]
+        ## Set dqr for all data points
+        dr = (self.dr if dr is None else dr)[:, None]
+        dphi = (self.dphi if dphi is None else dphi)[:, None]
+        dqx = dr * self.dqx_data[pixels]
+        dqy = dr * self.dqy_data[pixels]
 
         # Starting angle is different between polar
         #  and cartesian coordinates.
@@ -123,56 +193,462 @@ class Pinhole2D(Resolution):
         #                  self.dqy_data).repeat(nbins).reshape(nq,\
         #                                nbins).transpose().flatten()
 
-        # The angle (phi) of the original q point
-        q_phi = np.arctan(q_phi).repeat(nbins)\
-            .reshape([nq, nbins]).transpose().flatten()
-        ## Find Gaussian weight for each dq bins: The weight depends only
-        #  on r-direction (The integration may not need)
-        weight_res = (np.exp(-0.5 * (r - bin_size / 2.0)**2)  -
-                      np.exp(-0.5 * (r + bin_size / 2.0)**2))
-        # No needs of normalization here.
-        #weight_res /= np.sum(weight_res)
-        weight_res = weight_res.repeat(nphi).reshape(nr, nphi)
-        weight_res = weight_res.transpose().flatten()
-
-        ## Set dr for all dq bins for averaging
-        dr = r.repeat(nphi).reshape(nr, nphi).transpose().flatten()
-        ## Set dqr for all data points
-        dqx = np.outer(dr, self.dqx_data).flatten()
-        dqy = np.outer(dr, self.dqy_data).flatten()
-
-        qx = self.qx_data.repeat(nbins)\
-            .reshape(nq, nbins).transpose().flatten()
-        qy = self.qy_data.repeat(nbins)\
-            .reshape(nq, nbins).transpose().flatten()
-
         # The polar needs rotation by -q_phi
         if self.coords == 'polar':
+            # The angle (phi) of the original q point
+            q_phi = np.arctan(qy / qx)
             q_r = sqrt(qx**2 + qy**2)
-            qx_res = ((dqx*cos(dphi) + q_r) * cos(-q_phi)
-                      + dqy*sin(dphi) * sin(-q_phi))
-            qy_res = (-(dqx*cos(dphi) + q_r) * sin(-q_phi)
-                      + dqy*sin(dphi) * cos(-q_phi))
+            parallel = dqx*cos(dphi) + q_r
+            perpendicular = dqy*sin(dphi)
+            qx_res = parallel*cos(q_phi) - perpendicular*sin(q_phi)
+            qy_res = parallel*sin(q_phi) + perpendicular*cos(q_phi)
         else:
             qx_res = qx + dqx*cos(dphi)
             qy_res = qy + dqy*sin(dphi)
 
+        return [qx_res.flatten(), qy_res.flatten()]
+
+    def _pixel_tiles(self):
+        """Return a slice of data points for each tile."""
+        nq = len(self.qx_data)
+        return [slice(start, min(start + self.tile_size, nq))
+                for start in range(0, nq, self.tile_size)]
+
+    def tiles(self):
+        """
+        Generate *(pixels, q_calc)* for each tile of pixels, where *pixels*
+        is the slice of data points in the tile and *q_calc* is the
+        oversampled [qx, qy] for those points.  This is for fixed sampling;
+        use :meth:`calculate` for adaptive sampling.
+        """
+        if self.q_calc is not None:
+            yield slice(None), self.q_calc
+        else:
+            for pixels in self._pixel_tiles():
+                yield pixels, self._calc_res(pixels)
+
+    def apply_tile(self, theory):
+        """
+        Return the smeared values for a tile given the *theory* evaluated
+        at the *q_calc* for the tile from :meth:`tiles`.
+        """
+        if self.q_calc_weights is None:
+            return theory
+        ## Reshape into 2d array to use np weighted averaging
+        theory = np.reshape(theory, (self.nr * self.nphi, -1))
+        ## Averaging with Gaussian weighting: normalization included.
+        return np.average(theory, axis=0, weights=self.q_calc_weights)
+
+    def calculate(self, evaluate):
+        """
+        Return the smeared theory and the number of points at which it was
+        evaluated, where *evaluate(q_calc)* returns the theory at the points
+        *q_calc = [qx, qy]*.
 
-        return qx_res, qy_res, weight_res
+        The theory is evaluated one tile at a time, so this works whether
+        or not *q_calc* is stored, and it is the only way to apply adaptive
+        sampling.
+        """
+        if self.q_calc is not None:
+            return self.apply(evaluate(self.q_calc)), len(self.q_calc[0])
+        parts, count = [], 0
+        for pixels in self._pixel_tiles():
+            if self.tolerance is None:
+                theory = evaluate(self._calc_res(pixels))
+                parts.append(self.apply_tile(theory))
+                count += len(theory)
+            else:
+                value, evaluated = self._refine(pixels, evaluate)
+                parts.append(value)
+                count += evaluated
+        return np.hstack(parts), count
+
+    def _refine(self, pixels, evaluate):
+        """
+        Adaptive sampling of the data points selected by *pixels*, returning
+        the smeared values and the number of points evaluated.
+        """
+        # Samples are the centre followed by the rings of the finest level,
+        # and each level picks out a subset of them.
+        scale = 2**(self.nlevels - 1)
+        nr_fine, nphi_fine = self.nr*scale, self.nphi*scale
+        r_fine = np.arange(1, nr_fine+1) * self.nsigma / nr_fine
+        dr = np.hstack((0., np.tile(r_fine, nphi_fine)))
+        dphi = np.hstack(
+            (0., (np.arange(nphi_fine) * 2.0 * pi / nphi_fine).repeat(nr_fine)))
+        pixels = np.arange(len(self.qx_data))[pixels]
+        values = np.empty((len(dr), len(pixels)))
+        result = np.empty(len(pixels))
+        active = np.arange(len(pixels))
+        previous, count = np.empty(0, 'i'), 0
+        for level in range(self.nlevels):
+            nr, nphi = self.nr*2**level, self.nphi*2**level
+            r_step, phi_step = nr_fine//nr, nphi_fine//nphi
+            rings = (np.arange(0, nphi_fine, phi_step)[:, None]*nr_fine
+                     + np.arange(r_step, nr_fine+1, r_step)[None, :]).flatten()
+            bins = np.hstack((0, rings))
+            new = np.setdiff1d(bins, previous)
+            theory = evaluate(self._calc_res(pixels[active], dr[new], dphi[new]))
+            values[new[:, None], active[None, :]] = \
+                np.reshape(theory, (len(new), len(active)))
+            count += len(theory)
+            weights = _simpson_weights(nr, self.nsigma)
+            weights = np.hstack((weights[0], np.tile(weights[1:]/nphi, nphi)))
+            value = np.average(values[bins[:, None], active[None, :]], axis=0,
+                               weights=weights)
+            if level > 0:
+                done = abs(value - result[active]) <= self.tolerance*abs(value)
+            else:
+                done = np.zeros(len(active), 'bool')
+            result[active] = value
+            active = active[~done]
+            if not len(active):
+                break
+            previous = bins
+        return result, count
 
     def apply(self, theory):
-        if self.q_calc_weights is not None:
+        if self.q_calc is not None:
             # TODO: interpolate rather than recomputing all the different qx,qy
-            # Resolution needs to be applied
-            nq, nbins = len(self.qx_data), self.nr * self.nphi
-            ## Reshape into 2d array to use np weighted averaging
-            theory = np.reshape(theory, (nbins, nq))
-            ## Averaging with Gaussian weighting: normalization included.
-            value = np.average(theory, axis=0, weights=self.q_calc_weights)
             ## Return the smeared values in the range of self.index
-            return value
-        else:
+            return self.apply_tile(theory)
+        # Resolution needs to be applied to the tiles in turn
+        nbins = self.nr * self.nphi
+        bounds = np.cumsum([0] + [nbins*(pixels.stop - pixels.start)
+                                  for pixels in self._pixel_tiles()])
+        return np.hstack([self.apply_tile(theory[lo:hi])
+                          for lo, hi in zip(bounds[:-1], bounds[1:])])
+
+
+def _radial_bins(nr, nsigma):
+    """
+    Return the centres of *nr* equal bins in the radial offset from 0 to
+    *nsigma* widths and the Gaussian weight of each bin.
+    """
+    # Number of bins in the dqr direction (polar coordinate of dqx and dqy)
+    bin_size = nsigma / nr
+    # Mean values of dqr at each bins
+    # starting from the half of bin size
+    r = bin_size / 2.0 + np.arange(nr) * bin_size
+    ## Find Gaussian weight for each dq bins: The weight depends only
+    #  on r-direction (The integration may not need)
+    # No needs of normalization here.
+    weight_res = (np.exp(-0.5 * (r - bin_size / 2.0)**2)
+                  - np.exp(-0.5 * (r + bin_size / 2.0)**2))
+    return r, weight_res
+
+
+def _simpson_weights(nr, nsigma):
+    r"""
+    Return the weights for Simpson's rule on *nr* equal intervals in the
+    radial offset from 0 to *nsigma* widths, for the 2D Gaussian
+    $r \exp(-r^2/2)$.  The rule is exact for polynomials in $r$ up to
+    degree two within each pair of intervals.
+    """
+    step = nsigma / nr
+    z, w = np.polynomial.legendre.leggauss(20)
+    # Position within each pair of intervals, from 0 to 1
+    t = 0.5*(z + 1)
+    weights = np.zeros(nr + 1)
+    for k in range(0, nr, 2):
+        r = (k + 2*t)*step
+        density = step*w*r*np.exp(-0.5*r**2)
+        weights[k] += np.sum(density*(2*t - 1)*(t - 1))
+        weights[k+1] += np.sum(density*4*t*(1 - t))
+        weights[k+2] += np.sum(density*t*(2*t - 1))
+    return weights
+
+
+class GridPinhole2D(Resolution):
+    """
+    Gaussian Q smearing by convolution for 2d data on a regular detector grid
+
+    Rather than oversampling each pixel like :class:`Pinhole2D`, the model is
+    evaluated once per pixel on the detector grid, padded by *nsigma*
+    widths on each side, and the smeared value at each pixel is the
+    Gaussian weighted sum of the neighbouring grid values.
+
+    The detector is split into tiles of at most *tile* by *tile* pixels
+    over which the resolution is treated as constant, so that each tile is
+    a plain convolution.  Tiles are split in four until the covariance of
+    the resolution at each pixel is within *tolerance* of the tile average,
+    relative to the average variance or to the pixel area if that is
+    larger.  Near the beam centre, where $dq$ changes quickly with $q$, the
+    tiles get small; where the resolution is much narrower than a pixel,
+    the kernel is a single point and the tiles stay large.  Tiles with the
+    same shape and kernel size are convolved together using FFTs.
+
+    This assumes that the pixels are small compared to the features in the
+    pattern and that the resolution varies slowly across the detector.  The
+    data must lie on a grid with equal steps in $q_x$ and $q_y$, such as
+    :func:`sasmodels.data.empty_data2D`, with *x_bins*, *y_bins* giving the
+    grid if they are available.  Pixels may be slightly off the grid, by
+    up to *GRID_TOLERANCE* steps or *GRID_RESOLUTION_TOLERANCE* resolution
+    widths, and are smeared as if they were on it.  A ValueError is raised
+    otherwise.
+
+    :param data: 2d data used to set the smearing parameters
+    :param index: 1d array with len(data) to define the range
+     of the calculation: elements are given as True or False
+    :param nsigma: number of widths included in the Gaussian
+    :param tile: largest number of pixels on each side of a tile
+    :param tolerance: allowed change in resolution across a tile
+    """
+    def __init__(self, data=None, index=None, nsigma=NSIGMA, tile=TILE_SIZE,
+                 tolerance=TILE_TOLERANCE):
+        self.data = data
+        self.index = index if index is not None else slice(None)
+        self.nsigma = nsigma
+
+        (x0, step_x, nx), (y0, step_y, ny) = _detector_grid(data)
+        self.nx_data, self.ny_data = nx, ny
+        dqx = getattr(data, 'dqx_data', None)
+        dqy = getattr(data, 'dqy_data', None)
+        if dqx is None or dqy is None:
+            # No resolution information
+            self.kernels = None
+            self.q_calc = detector_q(data, self.index)
+            return
+
+        # Covariance of the resolution at each pixel, with dqx and dqy
+        # meaning dq_parr and dq_perp.
+        phi = np.arctan2(data.qy_data, data.qx_data)
+        var_parr = np.maximum(dqx, SIGMA_ZERO)**2
+        var_perp = np.maximum(dqy, SIGMA_ZERO)**2
+        cov = np.array([
+            var_parr*cos(phi)**2 + var_perp*sin(phi)**2,
+            var_parr*sin(phi)**2 + var_perp*cos(phi)**2,
+            (var_parr - var_perp)*cos(phi)*sin(phi),
+            ]).reshape(3, ny, nx)
+        active = np.zeros(nx*ny, 'bool')
+        active[self.index] = True
+        active = active.reshape(ny, nx)
+
+        # Group the tiles by tile shape and kernel size
+        rows, cols, sizes, tile_cov = _resolution_tiles(
+            cov, active, tile, abs(step_x*step_y), tolerance)
+        shapes = np.array([
+            np.minimum(sizes, ny-rows), np.minimum(sizes, nx-cols),
+            (nsigma*sqrt(tile_cov[:, 1])/abs(step_y)).astype('i'),
+            (nsigma*sqrt(tile_cov[:, 0])/abs(step_x)).astype('i'),
+            ]).T
+        unique, group = np.unique(shapes, axis=0, return_inverse=True)
+        group = group.reshape(-1)
+        self.tile_origins, self.kernels = [], []
+        for k, (_, _, hy, hx) in enumerate(unique):
+            select = (group == k)
+            self.tile_origins.append(
+                np.array([rows[select], cols[select]], 'i').T)
+            self.kernels.append(_gaussian_kernels(
+                tile_cov[select], step_x, step_y, nsigma, hy, hx))
+        # Kernels include a one pixel border; see _gaussian_kernels
+        self.tile_shapes = (unique + [0, 0, 1, 1]).astype('i')
+
+        # Pad the grid by the largest kernel so that every tile is complete
+        self.pad_y = int(np.max(self.tile_shapes[:, 2], initial=0))
+        self.pad_x = int(np.max(self.tile_shapes[:, 3], initial=0))
+        x_calc = x0 + step_x*np.arange(-self.pad_x, nx+self.pad_x)
+        y_calc = y0 + step_y*np.arange(-self.pad_y, ny+self.pad_y)
+        self.ncols, self.nrows = len(x_calc), len(y_calc)
+        self.q_calc = QGrid(x_calc, y_calc)
+
+    def apply(self, theory):
+        if self.kernels is None:
             return theory
+        grid = np.reshape(theory, (self.nrows, self.ncols))
+        result = np.zeros((self.ny_data, self.nx_data))
+        for (ty, tx, hy, hx), origins, kernels in zip(
+                self.tile_shapes, self.tile_origins, self.kernels):
+            # Tiles plus the kernel border, in padded grid coordinates
+            rows = origins[:, 0, None] + self.pad_y - hy + np.arange(ty+2*hy)
+            cols = origins[:, 1, None] + self.pad_x - hx + np.arange(tx+2*hx)
+            out_rows = origins[:, 0, None] + np.arange(ty)
+            out_cols = origins[:, 1, None] + np.arange(tx)
+            step = max(1, TILE_BLOCK//(rows.shape[1]*cols.shape[1]))
+            for k in range(0, len(origins), step):
+                block = slice(k, k+step)
+                regions = grid[rows[block, :, None], cols[block, None, :]]
+                result[out_rows[block, :, None], out_cols[block, None, :]] = \
+                    _convolve_tiles(regions, kernels[block])
+        return result.flatten()[self.index]
+
+
+def _convolve_tiles(regions, kernels):
+    """
+    Return the valid part of the convolution of each of a stack of *regions*
+    with the corresponding kernel.  The kernels are symmetric, so this is
+    the kernel weighted sum about each point.
+    """
+    ky, kx = kernels.shape[1:]
+    ty, tx = regions.shape[1]-ky+1, regions.shape[2]-kx+1
+    if ty*tx <= DIRECT_TILE_SIZE:
+        # Small tiles: direct weighted sum about each point
+        result = np.empty((len(regions), ty, tx))
+        for i in range(ty):
+            for j in range(tx):
+                result[:, i, j] = np.einsum(
+                    'kij,kij->k', regions[:, i:i+ky, j:j+kx], kernels)
+        return result
+    shape = regions.shape[1:]
+    transform = (np.fft.rfft2(regions, axes=(1, 2))
+                 * np.fft.rfft2(kernels, s=shape, axes=(1, 2)))
+    return np.fft.irfft2(transform, s=shape, axes=(1, 2))[:, ky-1:, kx-1:]
+
+
+def _resolution_tiles(cov, active, tile, floor, tolerance):
+    """
+    Split the detector into square tiles over which the resolution is
+    nearly constant.
+
+    *cov* is the resolution covariance *(var_x, var_y, cov_xy)* at each
+    pixel, with shape *(3, ny, nx)*, and *active* marks the pixels which
+    are needed.  Tiles start at *tile* pixels on a side, rounded up to a
+    power of two, and are split in four until every pixel covariance is
+    within *tolerance* times the mean variance or *floor*, whichever is
+    larger, of the tile mean.
+
+    Returns the *rows*, *columns* and *sizes* of the tiles with active
+    pixels, and their mean covariance with shape *(n, 3)*.  Tiles on the
+    far edges may extend beyond the detector.
+    """
+    ny, nx = active.shape
+    size = 2**int(np.ceil(np.log2(max(tile, 1))))
+    # Pad to whole tiles, with the padding excluded from the averages.
+    pad = ((0, -ny % size), (0, -nx % size))
+    cov = np.pad(cov, ((0, 0),) + pad, mode='edge')
+    real = np.pad(np.ones((ny, nx), 'bool'), pad, mode='constant')
+    active = np.pad(active, pad, mode='constant')
+    todo = np.ones((cov.shape[1]//size, cov.shape[2]//size), 'bool')
+    rows, cols, sizes, tile_cov = [], [], [], []
+    while size >= 1:
+        shape = (todo.shape[0], size, todo.shape[1], size)
+        weight = real.reshape(shape)
+        count = np.sum(weight, axis=(1, 3))
+        part = cov.reshape((3,) + shape)
+        mean = np.sum(part*weight, axis=(2, 4))/np.maximum(count, 1)
+        deviation = np.max(abs(part - mean[:, :, None, :, None])*weight,
+                           axis=(0, 2, 4))
+        limit = tolerance*np.maximum(0.5*(mean[0] + mean[1]), floor)
+        todo &= np.any(active.reshape(shape), axis=(1, 3))
+        done = todo & ((deviation <= limit) | (size == 1))
+        row, col = np.nonzero(done)
+        rows.append(row*size)
+        cols.append(col*size)
+        sizes.append(np.full(len(row), size))
+        tile_cov.append(mean[:, row, col].T)
+        todo = np.repeat(np.repeat(todo & ~done, 2, axis=0), 2, axis=1)
+        size //= 2
+    return (np.hstack(rows), np.hstack(cols), np.hstack(sizes),
+            np.vstack(tile_cov))
+
+
+def _detector_grid(data):
+    """
+    Return *(start, step, n)* for the $q_x$ and $q_y$ axes of the detector
+    grid for *data*, or raise ValueError if the data is not on a regular
+    grid.
+
+    Each pixel must be within *GRID_TOLERANCE* steps of the grid, or within
+    *GRID_RESOLUTION_TOLERANCE* of its narrowest resolution width if that
+    is larger.  The resolution smooths the pattern over its width, so
+    moving a pixel to the grid by a small part of the width changes the
+    smeared value very little.  This allows for detectors whose pixel $q$
+    values are not quite on a grid.
+    """
+    x = getattr(data, 'x_bins', None)
+    y = getattr(data, 'y_bins', None)
+    if x is None or y is None:
+        x, y = np.unique(data.qx_data), np.unique(data.qy_data)
+    x, y = np.asarray(x, 'd'), np.asarray(y, 'd')
+    nx, ny = len(x), len(y)
+    if nx < 2 or ny < 2 or nx*ny != len(data.qx_data):
+        raise ValueError("2D data is not on a regular detector grid")
+    step_x, step_y = (x[-1]-x[0])/(nx-1), (y[-1]-y[0])/(ny-1)
+    grid_x = x[0] + step_x*np.arange(nx)[None, :]
+    grid_y = y[0] + step_y*np.arange(ny)[:, None]
+    limit_x = GRID_TOLERANCE*abs(step_x)
+    limit_y = GRID_TOLERANCE*abs(step_y)
+    dqx = getattr(data, 'dqx_data', None)
+    dqy = getattr(data, 'dqy_data', None)
+    if dqx is not None and dqy is not None:
+        width = GRID_RESOLUTION_TOLERANCE*np.minimum(dqx, dqy).reshape(ny, nx)
+        limit_x, limit_y = np.maximum(limit_x, width), np.maximum(limit_y, width)
+    if (np.any(abs(data.qx_data.reshape(ny, nx) - grid_x) > limit_x)
+            or np.any(abs(data.qy_data.reshape(ny, nx) - grid_y) > limit_y)):
+        raise ValueError("2D data is not on a regular detector grid")
+    return (x[0], step_x, nx), (y[0], step_y, ny)
+
+
+def detector_q(data, index=None):
+    """
+    Return the $(q_x, q_y)$ values of the pixels of *data* selected by
+    *index* for evaluating the model.
+
+    If *data* has *x_bins* and *y_bins* which give the pixel values exactly
+    and at least *GRID_FILL* of the pixels are selected, this is a
+    :class:`sasmodels.kernel.QGrid` so that the kernel only needs the axes.
+    Otherwise it is the list *[qx, qy]* of selected pixel values.
+    """
+    index = index if index is not None else slice(None)
+    qx, qy = data.qx_data, data.qy_data
+    x = getattr(data, 'x_bins', None)
+    y = getattr(data, 'y_bins', None)
+    if x is not None and y is not None:
+        x, y = np.asarray(x), np.asarray(y)
+        nx, ny = len(x), len(y)
+        mask = np.zeros(len(qx), 'bool')
+        mask[index] = True
+        if (nx*ny == len(qx) and np.sum(mask) >= GRID_FILL*nx*ny
+                and np.array_equal(qx.reshape(ny, nx), np.broadcast_to(x, (ny, nx)))
+                and np.array_equal(qy.reshape(ny, nx).T, np.broadcast_to(y, (nx, ny)))):
+            return QGrid(x, y, None if mask.all() else mask)
+    return [qx[index], qy[index]]
+
+
+def _gaussian_kernels(cov, step_x, step_y, nsigma, hy, hx):
+    """
+    Return the normalized weights of Gaussians with covariance
+    *cov = [(var_x, var_y, cov_xy), ...]* cut off at *nsigma* widths, on a
+    grid with steps *step_x*, *step_y*.  The Gaussians are sampled from
+    *-hx* to *hx* and *-hy* to *hy* steps, and the kernels have one more
+    step on each side.
+
+    Sampling the Gaussian at the grid points misses much of the variance
+    when the width is less than a step, and all of it when the width is
+    less than a third of a step.  The sampled weights are convolved with a
+    3x3 kernel which makes up the difference, so that the weights have the
+    same second moments as the truncated Gaussian.
+    """
+    var_x, var_y, cov_xy = (v[:, None, None] for v in cov.T)
+    u = np.arange(-hx, hx+1)[None, None, :]
+    v = np.arange(-hy, hy+1)[None, :, None]
+    det = var_x*var_y - cov_xy**2
+    r_sq = (var_y*(u*step_x)**2 - 2*cov_xy*(u*step_x)*(v*step_y)
+            + var_x*(v*step_y)**2)/det
+    weights = np.where(r_sq <= nsigma**2, np.exp(-0.5*r_sq), 0.)
+    weights /= np.sum(weights, axis=(1, 2), keepdims=True)
+
+    # Missing variance in units of steps, compared with the variance of the
+    # Gaussian truncated at nsigma.
+    moment = lambda w: np.sum(weights*w, axis=(1, 2))
+    scale = 1. - 0.5*nsigma**2/np.expm1(0.5*nsigma**2)
+    dxx = np.maximum(scale*cov[:, 0]/step_x**2 - moment(u**2), 0.)
+    dyy = np.maximum(scale*cov[:, 1]/step_y**2 - moment(v**2), 0.)
+    dxy = scale*cov[:, 2]/(step_x*step_y) - moment(u*v)
+    dxy = np.clip(dxy, -np.minimum(dxx, dyy), np.minimum(dxx, dyy))
+    corner = 0.5*abs(dxy)
+    correction = np.zeros((len(cov), 3, 3))
+    correction[:, 1, 0] = correction[:, 1, 2] = 0.5*dxx - corner
+    correction[:, 0, 1] = correction[:, 2, 1] = 0.5*dyy - corner
+    correction[:, 0, 0] = correction[:, 2, 2] = np.where(dxy > 0, corner, 0.)
+    correction[:, 0, 2] = correction[:, 2, 0] = np.where(dxy < 0, corner, 0.)
+    correction[:, 1, 1] = 1. - np.sum(correction, axis=(1, 2))
+    result = np.zeros((len(cov), 2*hy+3, 2*hx+3))
+    for i in range(3):
+        for j in range(3):
+            result[:, i:i+2*hy+1, j:j+2*hx+1] += \
+                correction[:, i, j, None, None]*weights
+    return result
 
 
 class Slit2D(Resolution):
@@ -235,3 +711,124 @@ class Slit2D(Resolution):
         if self.weights is not None:
             Iq = resolution.apply_resolution_matrix(self.weights, Iq)
         return Iq
+
+
+def test_grid_pinhole():
+    """
+    Compare grid convolution with oversampling for a smooth pattern.
+    """
+    from .data import empty_data2D
+
+    data = empty_data2D(np.linspace(-0.3, 0.3, 64), resolution=0.05)
+    index = data.q_data > 0.02
+    def theory(qx, qy):
+        x = 30.*sqrt(qx**2 + (1.5*qy)**2)
+        return (3*(np.sin(x) - x*np.cos(x))/x**3)**2 + 1e-4
+    target = Pinhole2D(data, index, accuracy='xhigh')
+    target = target.apply(theory(*target.q_calc))
+    low = Pinhole2D(data, index, accuracy='low')
+    low = low.apply(theory(*low.q_calc))
+    grid = GridPinhole2D(data, index)
+    assert len(grid.q_calc[0]) < 2*len(data.qx_data)
+    grid = grid.apply(theory(*grid.q_calc))
+    # Errors are largest at the minima, where the model varies most within
+    # a pixel, but are much smaller than 'low' elsewhere.
+    assert np.max(abs(grid/target-1)) < 0.05
+    assert np.median(abs(grid/target-1)) < 0.1*np.median(abs(low/target-1))
+
+    # Without resolution the pixels are returned as they are
+    data = empty_data2D(np.linspace(-0.3, 0.3, 64))
+    grid = GridPinhole2D(data, index)
+    assert np.all(grid.apply(theory(*grid.q_calc))
+                  == theory(data.qx_data[index], data.qy_data[index]))
+
+    # Data which is not on a grid is rejected
+    data.qx_data = data.qx_data**3
+    try:
+        GridPinhole2D(data, index)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError for irregular data")
+
+
+def test_grid_detector_file():
+    """
+    Check grid convolution on a detector whose pixels are not quite on a
+    grid, as read from a NIST 2D file.
+    """
+    import os
+    from .data import load_native
+
+    path = os.path.join(os.path.dirname(__file__), '..', 'example',
+                        'DEC07266.DAT')
+    data = load_native(path, cache=False)
+    index = data.q_data > 0.01
+    def theory(qx, qy):
+        x = 300.*sqrt(qx**2 + (1.5*qy)**2)
+        return (3*(np.sin(x) - x*np.cos(x))/x**3)**2 + 1e-4
+    target = Pinhole2D(data, index, accuracy='high')
+    target = target.apply(theory(*target.q_calc))
+    grid = GridPinhole2D(data, index)
+    grid = grid.apply(theory(*grid.q_calc))
+    assert np.max(abs(grid/target-1)) < 0.05
+    assert np.median(abs(grid/target-1)) < 0.01
+
+    # Pixels are several percent of a step from the grid.
+    (x0, step_x, nx), _ = _detector_grid(data)
+    offset = data.qx_data.reshape(-1, nx) - (x0 + step_x*np.arange(nx))
+    assert np.max(abs(offset)) > 0.02*abs(step_x)
+
+
+def test_pinhole_tiles():
+    """
+    Check that tiled oversampling matches the oversampling of all pixels.
+    """
+    from .data import empty_data2D
+
+    data = empty_data2D(np.linspace(-0.3, 0.3, 40), resolution=0.05)
+    index = data.q_data > 0.02
+    def theory(qx, qy):
+        return 1./(1. + (30.*sqrt(qx**2 + (1.5*qy)**2))**4)
+    full = Pinhole2D(data, index, accuracy='high')
+    target = full.apply(theory(*full.q_calc))
+    nbins = full.nr*full.nphi
+    tiled = Pinhole2D(data, index, accuracy='high', memory=100*nbins*POINT_BYTES)
+    assert tiled.q_calc is None and tiled.tile_size == 100
+    parts = [tiled.apply_tile(theory(*q_calc)) for _, q_calc in tiled.tiles()]
+    assert len(parts) == (np.sum(index) + 99)//100
+    assert np.allclose(np.hstack(parts), target, rtol=1e-14, atol=0.)
+    q_calc = np.hstack([q_calc for _, q_calc in tiled.tiles()])
+    assert np.allclose(tiled.apply(theory(*q_calc)), target, rtol=1e-14, atol=0.)
+
+
+def test_pinhole_adaptive():
+    """
+    Check that adaptive oversampling refines only where needed.
+    """
+    from .data import empty_data2D
+
+    assert abs(np.sum(_simpson_weights(8, 3.)) - (1 - np.exp(-4.5))) < 1e-14
+    data = empty_data2D(np.linspace(-0.3, 0.3, 40), resolution=0.05)
+    index = data.q_data > 0.02
+    npix = np.sum(index)
+    # The coarsest level is exact for a quadratic, so every pixel stops
+    # after the first refinement.
+    def quadratic(qx, qy):
+        return 1. + qx + 3.*qx*qy + 5.*qy**2
+    res = Pinhole2D(data, index, accuracy='adaptive')
+    assert res.q_calc is None
+    value, count = res.calculate(lambda q_calc: quadratic(*q_calc))
+    assert count == 33*npix
+    exact, _ = Pinhole2D(data, index, accuracy='adaptive', tolerance=0.,
+                         levels=5).calculate(lambda q_calc: quadratic(*q_calc))
+    assert np.allclose(value, exact, rtol=1e-12, atol=0.)
+
+    def theory(qx, qy):
+        x = 30.*sqrt(qx**2 + (1.5*qy)**2)
+        return (3*(np.sin(x) - x*np.cos(x))/x**3)**2 + 1e-4
+    target, _ = Pinhole2D(data, index, accuracy='adaptive', tolerance=0.,
+                          levels=5).calculate(lambda q_calc: theory(*q_calc))
+    value, count = res.calculate(lambda q_calc: theory(*q_calc))
+    assert 33*npix < count < 513*npix
+    assert np.max(abs(value/target - 1)) < 1e-2
@@ -0,0 +1,307 @@
+"""
+Cache of resolution operators shared between data sets.
+
+Batch fits often load many data sets measured with the same instrument
+configuration, and each :class:`sasmodels.direct_model.DataMixin` would
+otherwise rebuild identical resolution operators, with the same *q_calc*
+and weight matrices.  :data:`RESOLUTION_OPERATORS` keeps the recently used
+operators in memory, keyed by a :func:`digest` of the q values, the
+resolution widths, the mask and the resolution options.
+
+If the environment variable *SAS_RESOLUTION_CACHE* names a directory, or
+if *path* is set on the cache, then operators are also saved to that
+directory and reused across sessions.  Each operator is stored in its own
+subdirectory as a set of *.npy* files, which are memory mapped when they
+are loaded, so large weight matrices are paged in as needed rather than
+read in full.  The oldest entries are removed when the directory grows
+beyond *max_bytes*.
+
+Operators are saved attribute by attribute.  Arrays, scipy sparse matrices,
+lists of arrays, :class:`sasmodels.kernel.QGrid` detector grids and simple
+values are supported.  The *data* attribute,
+which some operators keep as a reference to the data set they were built
+from, is not saved.  Operators with other kinds of attributes are only
+cached in memory.
+
+The cached operators are shared, so they must not be modified.
+"""
+from __future__ import division
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import importlib
+
+import numpy as np  # type: ignore
+import scipy.sparse  # type: ignore
+
+from . import metrics
+from .kernel import QGrid
+from .weights import WeightCache
+
+# pylint: disable=unused-import
+try:
+    from typing import Any, Callable, Dict, Optional
+except ImportError:
+    pass
+# pylint: enable=unused-import
+
+#: Attributes which refer back to the data and are not saved to disk.
+TRANSIENT_ATTRIBUTES = ('data',)
+
+_MANIFEST = 'operator.json'
+
+
+def digest(*values):
+    # type: (*Any) -> str
+    """
+    Return a digest of *values*, which may be arrays, strings, numbers or
+    None.  Arrays are included by shape, type and content.
+    """
+    sha = hashlib.sha1()
+    for value in values:
+        if value is None or isinstance(value, (str, int, float, bool)):
+            sha.update(repr(value).encode())
+        else:
+            array = np.ascontiguousarray(value)
+            sha.update(str((array.shape, array.dtype.str)).encode())
+            sha.update(array.tobytes())
+        sha.update(b'|')
+    return sha.hexdigest()
+
+
+class ResolutionCache(object):
+    """
+    Least-recently-used cache of resolution operators.
+
+    *size* is the maximum number of operators to keep in memory.  Use
+    *size=0* to disable the memory cache.
+
+    *path* is the directory for the persistent cache, or None for no
+    persistent cache.  *max_bytes* is the maximum total size of the
+    files in *path*.
+
+    The number of memory *hits*, *disk_hits* and *misses* are recorded for
+    tuning; use :meth:`stats` to retrieve them.  They are also counted as
+    *cache.resolution.hits*, etc., in :mod:`sasmodels.metrics`.
+    """
+    def __init__(self, size=32, path=None, max_bytes=2**30):
+        # type: (int, Optional[str], int) -> None
+        self._memory = WeightCache(size, name='resolution')
+        self.path = path
+        self.max_bytes = max_bytes
+        self.disk_hits = 0
+
+    @property
+    def size(self):
+        # type: () -> int
+        """Maximum number of operators kept in memory."""
+        return self._memory.size
+
+    @size.setter
+    def size(self, value):
+        # type: (int) -> None
+        self._memory.size = value
+
+    def lookup(self, key, build):
+        # type: (str, Callable[[], Any]) -> Any
+        """
+        Return the operator for *key*, calling *build()* to create it if it
+        is not in memory or in the persistent cache.
+        """
+        return self._memory.lookup(key, lambda: self._load_or_build(key, build))
+
+    def _load_or_build(self, key, build):
+        # type: (str, Callable[[], Any]) -> Any
+        if self.path is None:
+            return build()
+        entry = os.path.join(self.path, key)
+        if os.path.exists(os.path.join(entry, _MANIFEST)):
+            try:
+                operator = load_operator(entry)
+            except Exception:  # corrupt or stale entry, so rebuild it
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                self.disk_hits += 1
+                os.utime(entry, None)
+                # memory hits are counted by the memory cache; the disk hit
+                # replaces a miss
+                self._memory.misses -= 1
+                metrics.count('cache.resolution.misses', -1)
+                metrics.count('cache.resolution.disk_hits')
+                return operator
+        operator = build()
+        if save_operator(operator, entry):
+            self._prune()
+        return operator
+
+    def _prune(self):
+        # type: () -> None
+        """Remove the oldest entries until the cache fits in *max_bytes*."""
+        entries = []
+        for name in os.listdir(self.path):
+            entry = os.path.join(self.path, name)
+            if os.path.isdir(entry) and not name.startswith('.'):
+                nbytes = sum(os.path.getsize(os.path.join(entry, f))
+                             for f in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), nbytes, entry))
+        total = sum(nbytes for _, nbytes, _ in entries)
+        for _, nbytes, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= nbytes
+
+    def clear(self, disk=False):
+        # type: (bool) -> None
+        """
+        Empty the memory cache and reset the statistics.  If *disk* is
+        True, remove the persistent cache as well.
+        """
+        self._memory.clear()
+        self.disk_hits = 0
+        if disk and self.path is not None and os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def stats(self):
+        # type: () -> Dict[str, Any]
+        """
+        Return a dictionary of memory *hits*, *disk_hits*, *misses* (the
+        number of operators built), number of memory *entries* and maximum
+        *size*.
+        """
+        stats = self._memory.stats()
+        stats['disk_hits'] = self.disk_hits
+        return stats
+
+
+def save_operator(operator, path):
+    # type: (Any, str) -> bool
+    """
+    Save the attributes of *operator* to the directory *path*.
+
+    Returns False without saving anything if the operator has attributes
+    which cannot be saved.
+    """
+    manifest = {
+        'class': [type(operator).__module__, type(operator).__name__],
+        'values': {}, 'arrays': {}, 'sparse': {}, 'lists': {}, 'grids': {},
+    }
+    arrays = {}
+    for name, value in vars(operator).items():
+        if name in TRANSIENT_ATTRIBUTES:
+            manifest['values'][name] = None
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            manifest['values'][name] = value
+        elif isinstance(value, np.generic):
+            manifest['values'][name] = value.item()
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            manifest['arrays'][name] = name
+            arrays[name] = value
+        elif scipy.sparse.issparse(value) and value.format in ('csr', 'csc'):
+            manifest['sparse'][name] = [value.format, list(value.shape)]
+            arrays[name+'.data'] = value.data
+            arrays[name+'.indices'] = value.indices
+            arrays[name+'.indptr'] = value.indptr
+        elif (isinstance(value, (list, tuple)) and value
+              and all(isinstance(v, np.ndarray) for v in value)):
+            manifest['lists'][name] = len(value)
+            for k, v in enumerate(value):
+                arrays['%s.%d' % (name, k)] = v
+        elif isinstance(value, QGrid):
+            manifest['grids'][name] = value.index is not None
+            arrays[name+'.x'] = value.x_bins
+            arrays[name+'.y'] = value.y_bins
+            if value.index is not None:
+                arrays[name+'.index'] = value.index
+        else:
+            return False
+
+    # Write to a temporary directory then rename so that partially written
+    # entries are never visible.
+    parent = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    tmp = tempfile.mkdtemp(prefix='.tmp', dir=parent)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, name+'.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(tmp, _MANIFEST), 'w') as fid:
+            json.dump(manifest, fid)
+        os.rename(tmp, path)
+    except OSError:
+        # Another process may have saved the same entry first.
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    return True
+
+
+def load_operator(path, mmap=True):
+    # type: (str, bool) -> Any
+    """
+    Load an operator saved by :func:`save_operator` from *path*.  If *mmap*
+    is True the arrays are memory mapped read-only.
+    """
+    with open(os.path.join(path, _MANIFEST)) as fid:
+        manifest = json.load(fid)
+    mode = 'r' if mmap else None
+    load = lambda name: np.load(os.path.join(path, name+'.npy'), mmap_mode=mode)
+
+    module, name = manifest['class']
+    cls = getattr(importlib.import_module(module), name)
+    operator = cls.__new__(cls)
+    state = dict(manifest['values'])
+    for name in manifest['arrays']:
+        state[name] = load(name)
+    for name, (fmt, shape) in manifest['sparse'].items():
+        matrix_type = (scipy.sparse.csr_matrix if fmt == 'csr'
+                       else scipy.sparse.csc_matrix)
+        state[name] = matrix_type(
+            (load(name+'.data'), load(name+'.indices'), load(name+'.indptr')),
+            shape=tuple(shape))
+    for name, length in manifest['lists'].items():
+        state[name] = [load('%s.%d' % (name, k)) for k in range(length)]
+    for name, masked in manifest.get('grids', {}).items():
+        state[name] = QGrid(load(name+'.x'), load(name+'.y'),
+                            load(name+'.index') if masked else None)
+    operator.__dict__.update(state)
+    return operator
+
+
+#: Resolution operators shared by :class:`sasmodels.direct_model.DataMixin`.
+RESOLUTION_OPERATORS = ResolutionCache(
+    path=os.environ.get('SAS_RESOLUTION_CACHE', None) or None)
+
+
+def test_resolution_cache():
+    # type: () -> None
+    """
+    Check that operators are shared in memory and restored from disk.
+    """
+    from .resolution import Pinhole1D
+
+    q = np.logspace(-3, -1, 50)
+    dq = 0.05*q
+    key = digest('Pinhole1D', q, dq)
+    build = lambda: Pinhole1D(q, dq, q_calc=np.logspace(-3.3, -0.9, 200))
+    path = tempfile.mkdtemp()
+    try:
+        cache = ResolutionCache(size=4, path=path)
+        first = cache.lookup(key, build)
+        assert cache.lookup(digest('Pinhole1D', q.copy(), dq), build) is first
+        cache.clear()
+        restored = cache.lookup(key, build)
+        assert restored is not first
+        assert cache.stats()['disk_hits'] == 1 and cache.stats()['misses'] == 0
+        assert isinstance(restored.q_calc, np.memmap)
+        theory = 1.0/(1.0 + (30*first.q_calc)**4)
+        assert np.allclose(restored.apply(theory), first.apply(theory),
+                           rtol=1e-14, atol=0.)
+        cache.max_bytes = 0
+        cache._prune()
+        assert not os.listdir(path)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
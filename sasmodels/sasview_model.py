@@ -26,9 +26,10 @@ from . import core
 from . import custom
 from . import product
 from . import generate
+from . import metrics
 from . import weights
 from . import modelinfo
-from .details import make_kernel_args, dispersion_mesh
+from .details import CallPlan, dispersion_mesh
 
 # pylint: disable=unused-import
 try:
@@ -292,6 +293,7 @@ class SasviewModel(object):
     # purposes.
     _model = None       # type: KernelModel
     _model_info = None  # type: ModelInfo
+    _call_plan = None   # type: CallPlan
     #: load/save name for the model
     id = None           # type: str
     #: display name for the model
@@ -396,6 +398,7 @@ class SasviewModel(object):
         # type: () -> Dict[str, Any]
         state = self.__dict__.copy()
         state.pop('_model')
+        state.pop('_call_plan', None)
         # May need to reload model info on set state since it has pointers
         # to python implementations of Iq, etc.
         #state.pop('_model_info')
@@ -405,6 +408,7 @@ class SasviewModel(object):
         # type: (Dict[str, Any]) -> None
         self.__dict__ = state
         self._model = None
+        self._call_plan = None
 
     def __str__(self):
         # type: () -> str
@@ -661,7 +665,8 @@ class SasviewModel(object):
         #    logger.info("\n".join(traceback.format_stack()))
 
         with calculation_lock:
-            return self._calculate_Iq(qx, qy)
+            with metrics.timer('sasview.calculate_Iq', model=self._model_info.id):
+                return self._calculate_Iq(qx, qy)
 
     def _calculate_Iq(self, qx, qy=None):
         #core.HAVE_OPENCL = False
@@ -673,9 +678,16 @@ class SasviewModel(object):
             q_vectors = [np.asarray(qx)]
         calculator = self._model.make_kernel(q_vectors)
         parameters = self._model_info.parameters
-        pairs = [self._get_weights(p) for p in parameters.call_parameters]
+        with metrics.timer('mesh'):
+            pairs = [self._get_weights(p) for p in parameters.call_parameters]
         #weights.plot_weights(self._model_info, pairs)
-        call_details, values, is_magnetic = make_kernel_args(calculator, pairs)
+        # Reuse the kernel arguments from the previous call if possible.
+        plan = self._call_plan
+        if (plan is None or plan.info is not calculator.info
+                or plan.dtype != calculator.dtype):
+            plan = self._call_plan = CallPlan(calculator.info, calculator.dtype)
+        with metrics.timer('kernel_args'):
+            call_details, values, is_magnetic = plan(pairs)
         #call_details.show()
         #print("pairs", pairs)
         #for k, p in enumerate(self._model_info.parameters.call_parameters):
@@ -764,6 +776,9 @@ class SasviewModel(object):
         # type: (Parameter) -> Tuple[np.ndarray, np.ndarray]
         """
         Return dispersion weights for parameter
+
+        Distributions other than "array" are shared through the weight cache
+        in :mod:`sasmodels.weights`, and so are read-only.
         """
         if par.name not in self.params:
             if par.name == self.multiplicity_info.control:
@@ -1,5 +1,11 @@
 """
 SAS distributions for polydispersity.
+
+Distributions returned by :func:`get_weights` are memoized in
+:data:`WEIGHT_CACHE`, an LRU cache keyed by the disperser name and its
+arguments.  During a fit most parameters do not change from one step to
+the next, so most of the distributions can be reused.  The cached arrays
+are read-only since they are shared between callers.
 """
 # TODO: include dispersion docs with the disperser models
 from __future__ import division, print_function
@@ -8,7 +14,9 @@ from math import sqrt  # type: ignore
 from collections import OrderedDict
 
 import numpy as np  # type: ignore
-from scipy.special import gammaln  # type: ignore
+from scipy.special import gammaln, gammaincinv, ndtri  # type: ignore
+
+from . import metrics
 
 # TODO: include dispersion docs with the disperser models
 
@@ -158,6 +166,137 @@ class SchulzDispersion(Dispersion):
         return x, px
 
 
+class GaussHermiteDispersion(Dispersion):
+    r"""
+    Gaussian dispersion, with 1-$\sigma$ width, using Gauss-Hermite
+    quadrature.
+
+    The points are the *npts* Gauss-Hermite nodes scaled to the distribution,
+    $x_k = c + \sqrt 2 \sigma t_k$, with the corresponding quadrature weights.
+    Integrals of smooth functions converge much faster than for the evenly
+    spaced points of :class:`GaussianDispersion`, so far fewer points are
+    needed.  *nsigmas* is not used since the nodes cover the full
+    distribution.
+    """
+    type = "gaussian_quad"
+    default = dict(npts=11, width=0, nsigmas=3)
+    def _weights(self, center, sigma, lb, ub):
+        t, wt = np.polynomial.hermite.hermgauss(self.npts)
+        x = center + sqrt(2.0)*sigma*t
+        idx = (x >= lb) & (x <= ub)
+        return x[idx], wt[idx]
+
+
+class LogNormalHermiteDispersion(Dispersion):
+    r"""
+    log Gaussian dispersion, with 1-$\sigma$ width, using Gauss-Hermite
+    quadrature in $\ln x$.
+
+    Since $\ln x$ is normally distributed with width $\sigma/c$, the points
+    are $x_k = c \exp(\sqrt 2 t_k \sigma/c)$ for the Gauss-Hermite nodes
+    $t_k$, with the corresponding quadrature weights.  *nsigmas* is not used.
+    """
+    type = "lognormal_quad"
+    default = dict(npts=11, width=0, nsigmas=8)
+    def _weights(self, center, sigma, lb, ub):
+        t, wt = np.polynomial.hermite.hermgauss(self.npts)
+        sig = np.fabs(sigma/center)
+        x = center*np.exp(sqrt(2.0)*sig*t)
+        idx = (x >= max(lb, 1e-8)) & (x <= max(ub, 1e-8))
+        return x[idx], wt[idx]
+
+
+class SchulzLaguerreDispersion(Dispersion):
+    r"""
+    Schultz dispersion, with 1-$\sigma$ width, using generalized
+    Gauss-Laguerre quadrature.
+
+    The Schulz distribution is a gamma distribution with shape $z=(c/\sigma)^2$
+    and scale $c/z$, so the integral over $u = xz/c$ has the weight function
+    $u^{z-1} e^{-u}$.  The points are $x_k = c u_k / z$ for the generalized
+    Gauss-Laguerre nodes $u_k$ with $\alpha = z-1$.  The nodes and weights
+    are computed from the eigenvalues of the Jacobi matrix so that the
+    $\Gamma(z)$ normalization, which overflows for narrow distributions,
+    is never formed.  *nsigmas* is not used.
+    """
+    type = "schulz_quad"
+    default = dict(npts=11, width=0, nsigmas=8)
+    def _weights(self, center, sigma, lb, ub):
+        z = (center/sigma)**2
+        u, wt = _gen_laguerre(self.npts, z - 1.0)
+        x = center*u/z
+        idx = (x >= max(lb, 1e-8)) & (x <= max(ub, 1e-8))
+        return x[idx], wt[idx]
+
+
+def _gen_laguerre(n, alpha):
+    r"""
+    Nodes and normalized weights for *n* point generalized Gauss-Laguerre
+    quadrature with weight function $u^\alpha e^{-u}$.
+    """
+    k = np.arange(n)
+    diag = 2.0*k + alpha + 1.0
+    offdiag = np.sqrt(k[1:]*(k[1:] + alpha))
+    jacobi = np.diag(diag) + np.diag(offdiag, 1) + np.diag(offdiag, -1)
+    nodes, vectors = np.linalg.eigh(jacobi)
+    return nodes, vectors[0]**2
+
+
+class QuantileDispersion(Dispersion):
+    r"""
+    Base class for equal probability sampling of a distribution.
+
+    The points are placed at the quantiles $(k+1/2)/n$ of the distribution
+    for $k = 0 \ldots n-1$, each with weight $1/n$, so each point represents
+    the same fraction of the population.  Subclasses define
+    *_quantile(p, center, sigma)* to compute the points.  *nsigmas* is
+    not used.
+    """
+    def _weights(self, center, sigma, lb, ub):
+        p = (np.arange(self.npts) + 0.5)/self.npts
+        x = self._quantile(p, center, sigma)
+        idx = (x >= lb) & (x <= ub)
+        return x[idx], np.ones(np.sum(idx))
+
+    def _quantile(self, p, center, sigma):
+        """inverse cumulative distribution function"""
+        raise NotImplementedError
+
+
+class GaussianQuantileDispersion(QuantileDispersion):
+    r"""
+    Gaussian dispersion, with 1-$\sigma$ width, sampled at equal
+    probability intervals.
+    """
+    type = "gaussian_quantile"
+    default = dict(npts=15, width=0, nsigmas=3)
+    def _quantile(self, p, center, sigma):
+        return center + sigma*ndtri(p)
+
+
+class LogNormalQuantileDispersion(QuantileDispersion):
+    r"""
+    log Gaussian dispersion, with 1-$\sigma$ width, sampled at equal
+    probability intervals.
+    """
+    type = "lognormal_quantile"
+    default = dict(npts=15, width=0, nsigmas=8)
+    def _quantile(self, p, center, sigma):
+        return center*np.exp(np.fabs(sigma/center)*ndtri(p))
+
+
+class SchulzQuantileDispersion(QuantileDispersion):
+    r"""
+    Schultz dispersion, with 1-$\sigma$ width, sampled at equal
+    probability intervals.
+    """
+    type = "schulz_quantile"
+    default = dict(npts=15, width=0, nsigmas=8)
+    def _quantile(self, p, center, sigma):
+        z = (center/sigma)**2
+        return center*gammaincinv(z, p)/z
+
+
 class ArrayDispersion(Dispersion):
     r"""
     Empirical dispersion curve.
@@ -199,9 +338,80 @@ MODELS = OrderedDict((d.type, d) for d in (
     LogNormalDispersion,
     GaussianDispersion,
     SchulzDispersion,
+    GaussHermiteDispersion,
+    LogNormalHermiteDispersion,
+    SchulzLaguerreDispersion,
+    GaussianQuantileDispersion,
+    LogNormalQuantileDispersion,
+    SchulzQuantileDispersion,
 ))
 
 
+class WeightCache(object):
+    """
+    Least-recently-used cache of normalized dispersity distributions.
+
+    *size* is the maximum number of distributions to keep.  Use *size=0*
+    to disable caching.
+
+    The number of cache *hits* and *misses* are recorded for tuning; use
+    :meth:`stats` to retrieve them along with the hit rate.  If *name* is
+    given, they are also counted as *cache.<name>.hits* and
+    *cache.<name>.misses* in :mod:`sasmodels.metrics`.
+    """
+    def __init__(self, size=256, name=None):
+        self.size = size
+        self.name = name
+        self.hits = self.misses = 0
+        self._table = OrderedDict()
+
+    def lookup(self, key, compute):
+        """
+        Return the entry for *key*, calling *compute()* to create the entry
+        if it is not already in the cache.
+        """
+        try:
+            entry = self._table.pop(key)
+        except KeyError:
+            self.misses += 1
+            if metrics.ENABLED and self.name is not None:
+                metrics.count('cache.%s.misses' % self.name)
+            entry = compute()
+        else:
+            self.hits += 1
+            if metrics.ENABLED and self.name is not None:
+                metrics.count('cache.%s.hits' % self.name)
+        if self.size > 0:
+            self._table[key] = entry
+            while len(self._table) > self.size:
+                self._table.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """
+        Empty the cache and reset the statistics.
+        """
+        self._table.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        """
+        Return a dictionary of cache *hits*, *misses*, *hit_rate*, number
+        of *entries* and maximum *size*.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits/total if total else 0.,
+            'entries': len(self._table),
+            'size': self.size,
+        }
+
+#: Cache for :func:`get_weights`.
+WEIGHT_CACHE = WeightCache(name='weights')
+
+
 def get_weights(disperser, n, width, nsigmas, value, limits, relative):
     """
     Return the set of values and weights for a polydisperse parameter.
@@ -222,14 +432,52 @@ def get_weights(disperser, n, width, nsigmas, value, limits, relative):
     of the parameter, and false if it is an absolute width.
 
     Returns *(value, weight)*, where *value* and *weight* are vectors.
+    The vectors are shared through :data:`WEIGHT_CACHE` so they are marked
+    read-only; copy them before modifying.
     """
     if disperser == "array":
         raise NotImplementedError("Don't handle arrays through get_weights;"
                                   " use values and weights directly")
+    lb, ub = limits
+    key = (disperser, n, width, nsigmas, value, lb, ub, relative)
+    return WEIGHT_CACHE.lookup(key, lambda: _compute_weights(*key))
+
+def _compute_weights(disperser, n, width, nsigmas, value, lb, ub, relative):
+    """
+    Uncached version of :func:`get_weights`.
+    """
     cls = MODELS[disperser]
     obj = cls(n, width, nsigmas)
-    v, w = obj.get_weights(value, limits[0], limits[1], relative)
-    return v, w/np.sum(w)
+    v, w = obj.get_weights(value, lb, ub, relative)
+    w = w/np.sum(w)
+    v.flags.writeable = w.flags.writeable = False
+    return v, w
+
+
+def test_weight_cache():
+    """
+    Check that repeated requests for a distribution come from the cache.
+    """
+    cache = WEIGHT_CACHE
+    old_size, cache.size = cache.size, 2
+    try:
+        cache.clear()
+        v1, w1 = get_weights('gaussian', 11, 0.1, 3, 20., (0, np.inf), True)
+        v2, w2 = get_weights('gaussian', 11, 0.1, 3, 20., (0, np.inf), True)
+        assert v1 is v2 and w1 is w2
+        assert not v1.flags.writeable and not w1.flags.writeable
+        assert abs(np.sum(w1) - 1.) < 1e-12
+        get_weights('schulz', 11, 0.1, 3, 20., (0, np.inf), True)
+        get_weights('lognormal', 11, 0.1, 3, 20., (0, np.inf), True)
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 3
+        assert stats['entries'] == 2
+        # gaussian was least recently used so it has been evicted
+        v3, _ = get_weights('gaussian', 11, 0.1, 3, 20., (0, np.inf), True)
+        assert v3 is not v1 and np.all(v3 == v1)
+    finally:
+        cache.size = old_size
+        cache.clear()
 
 
 def plot_weights(model_info, mesh):